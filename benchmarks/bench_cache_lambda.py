@@ -0,0 +1,85 @@
+"""
+Benchmarks how many DynamoDB Stream records per second the cache Lambda writes to Redis, comparing
+writing each record on its own with the pipelined batch writer. Both write the same entries, so
+only the batching differs.
+
+Runs against an in-process fakeredis server by default, which has no network latency and so
+understates the gap. Set REDIS_URL (e.g. redis://localhost:6379/0) to run against a real server.
+
+Usage:
+    python benchmarks/bench_cache_lambda.py [--records 5000] [--batch-size 100]
+"""
+
+import argparse
+import os
+import sys
+import time
+import fakeredis
+import redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'src', 'processing'))
+
+from cache_lambda_handler import group_records, write_entries  # noqa: E402
+from cache_schema import (COUNTER_RESOLUTIONS, bodies_key, buckets_key,  # noqa: E402
+                          counts_key, index_key, version_key)
+
+TEAMS = ['arsenal', 'chelsea', 'liverpool', 'tottenham']
+
+
+def make_record(i: int) -> dict:
+    """Builds a DynamoDB Stream record for a synthetic comment."""
+    return {
+        'eventID': str(i),
+        'eventName': 'INSERT',
+        'dynamodb': {
+            'Keys': {'team_name': {'S': TEAMS[i % len(TEAMS)]}},
+            'NewImage': {
+                'sentiment_score': {'N': '0.9'}, 'sentiment_id': {'S': 'positive'},
+                'upvotes': {'N': '3'}, 'author': {'S': 'author'}, 'name': {'S': f't1_{i}'},
+                'id': {'S': f'c{i}'}, 'body': {'S': 'What a goal! ' * 10},
+                'downvotes': {'N': '0'}, 'subreddit': {'S': 'soccer'},
+                'timestamp': {'N': str(1_700_000_000 + i)}
+            }
+        }
+    }
+
+
+def per_record(redis_client: redis.Redis, batch: list[dict]) -> None:
+    """Writes each record with its own round trips, as the handler did before batching."""
+    for record in batch:
+        batches, _ = group_records([record])
+        write_entries(redis_client, batches)
+
+
+def pipelined(redis_client: redis.Redis, batch: list[dict]) -> None:
+    """Writes the batch with the pipelined writer."""
+    batches, _ = group_records(batch)
+    write_entries(redis_client, batches)
+
+
+def run(name: str, writer, records: list[dict], batch_size: int) -> None:
+    """Times a writer over all records and prints the throughput."""
+    redis_client = (redis.Redis.from_url(os.environ['REDIS_URL']) if os.getenv('REDIS_URL')
+                    else fakeredis.FakeRedis())
+    redis_client.delete(*[key for team in TEAMS for key in (
+        index_key(team), bodies_key(team), version_key(team),
+        *[key for resolution in COUNTER_RESOLUTIONS
+          for key in (counts_key(team, resolution), buckets_key(team, resolution))])])
+
+    start = time.perf_counter()
+    for i in range(0, len(records), batch_size):
+        writer(redis_client, records[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    print(f'{name:>12}: {len(records) / elapsed:10.0f} records/s ({elapsed:.3f}s)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    sample = [make_record(i) for i in range(args.records)]
+    run('per-record', per_record, sample, args.batch_size)
+    run('pipelined', pipelined, sample, args.batch_size)
@@ -0,0 +1,93 @@
+"""
+Measures the Redis memory and chart read cost of the compact cache layout against the previous
+layout, where every comment was stored as a full JSON sorted set member.
+
+With REDIS_URL set, memory is reported with MEMORY USAGE. fakeredis doesn't implement that
+command, so without a real server the raw size of the stored members and values is reported.
+
+Usage:
+    python benchmarks/bench_cache_memory.py [--comments 50000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import fakeredis
+import redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'src', 'processing'))
+
+from cache_schema import decode_member, encode_member  # noqa: E402
+
+SENTIMENTS = ['positive', 'negative', 'neutral']
+
+
+def make_comment(i: int) -> dict:
+    """Builds a cached comment as written by the cache Lambda."""
+    return {
+        'sentiment_score': '0.8734', 'sentiment_id': SENTIMENTS[i % 3], 'upvotes': str(i % 50),
+        'author': f'user_{i % 997}', 'name': f't1_{i:07x}', 'id': f'{i:07x}',
+        'body': 'What a finish, that was an unbelievable strike from outside the box! ' * 2,
+        'downvotes': '0', 'subreddit': 'soccer', 'timestamp': str(1_700_000_000 + i)
+    }
+
+
+def memory_usage(redis_client: redis.Redis, key: str, payload_bytes: int) -> str:
+    """Returns MEMORY USAGE for a key, or the raw payload size when unsupported."""
+    try:
+        return f'{redis_client.memory_usage(key, samples=0) / 1e6:8.2f} MB'
+    except redis.exceptions.ResponseError:
+        return f'{payload_bytes / 1e6:8.2f} MB (payload)'
+
+
+def main(count: int) -> None:
+    """Writes both layouts and prints their memory use and chart read cost."""
+    redis_client = (redis.Redis.from_url(os.environ['REDIS_URL']) if os.getenv('REDIS_URL')
+                    else fakeredis.FakeRedis())
+    legacy_key, index, bodies = 'bench:legacy', 'bench:index', 'bench:comments'
+    redis_client.delete(legacy_key, index, bodies)
+
+    comments = [make_comment(i) for i in range(count)]
+    legacy_members = {json.dumps(c): float(c['timestamp']) for c in comments}
+    compact_members = {encode_member(c['id'], c['sentiment_id']): float(c['timestamp'])
+                       for c in comments}
+    body_values = {c['id']: json.dumps(c) for c in comments}
+    for key, mapping in ((legacy_key, legacy_members), (index, compact_members)):
+        entries = list(mapping.items())
+        for i in range(0, count, 1000):
+            redis_client.zadd(key, dict(entries[i:i + 1000]))
+    entries = list(body_values.items())
+    for i in range(0, count, 1000):
+        redis_client.hset(bodies, mapping=dict(entries[i:i + 1000]))
+
+    legacy_bytes = sum(len(m) + 8 for m in legacy_members)
+    index_bytes = sum(len(m) + 8 for m in compact_members)
+    body_bytes = sum(len(k) + len(v) for k, v in body_values.items())
+
+    print(f'{count} comments')
+    print(f'  legacy sorted set   {memory_usage(redis_client, legacy_key, legacy_bytes)}')
+    print(f'  compact index       {memory_usage(redis_client, index, index_bytes)}')
+    print(f'  comment store       {memory_usage(redis_client, bodies, body_bytes)}')
+
+    start = time.perf_counter()
+    rows = [json.loads(m) for m in redis_client.zrangebyscore(legacy_key, '-inf', '+inf')]
+    legacy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    rows = [decode_member(m) for m, _ in redis_client.zrangebyscore(index, '-inf', '+inf',
+                                                                     withscores=True)]
+    compact_seconds = time.perf_counter() - start
+    assert len(rows) == count
+
+    print('chart read of the whole window')
+    print(f'  legacy    {legacy_bytes / 1e6:8.2f} MB transferred, {legacy_seconds:.3f}s')
+    print(f'  compact   {index_bytes / 1e6:8.2f} MB transferred, {compact_seconds:.3f}s')
+    redis_client.delete(legacy_key, index, bodies)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--comments', type=int, default=50000)
+    main(parser.parse_args().comments)
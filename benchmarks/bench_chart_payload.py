@@ -0,0 +1,82 @@
+"""
+Measures the size of the figure updates the dashboard sends each refresh: the full figure, as
+every refresh used to send, against the patch sent while the team and window stay the same.
+
+The counters of one team are filled for a month in an in-process fakeredis server. For each time
+window, a refresh ten seconds after the first draw and one just after a new bucket starts are
+measured.
+
+Usage:
+    python benchmarks/bench_chart_payload.py
+"""
+
+import os
+import random
+import sys
+import time
+import fakeredis
+import plotly.io as pio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'src', 'visualization'))
+
+from components import line_plot  # noqa: E402
+from components.incremental import update_series_figure  # noqa: E402
+from data.cache_schema import COUNTER_RESOLUTIONS, SENTIMENT_CODES  # noqa: E402
+from data.source import Comment  # noqa: E402
+
+TEAM = 'bench'
+WINDOWS = {'1hour': 3600, '1day': 86400, '7days': 7 * 86400, '30days': 30 * 86400}
+NOW = int(time.time())
+
+
+def fill_counters(redis_client) -> None:
+    """Writes a month of counters at every resolution."""
+    rng = random.Random(0)
+    for resolution in COUNTER_RESOLUTIONS:
+        mapping = {}
+        for bucket in range(NOW - 31 * 86400, NOW + 3600, resolution):
+            bucket = bucket // resolution * resolution
+            for code in SENTIMENT_CODES.values():
+                mapping[f'{bucket}:{code}'] = rng.randint(1, resolution // 60)
+        redis_client.hset(f'team_counts:{TEAM}:{resolution}', mapping=mapping)
+
+
+def update(comments: Comment, end_time: int, length: int, state, plot_type: str):
+    """Returns the figure update and state of the sentiment plot for a window."""
+    bucket = comments.choose_resolution(end_time - length, end_time)
+    comments.query_cache.cache.clear()
+    df = comments.query_sentiment_series(TEAM, end_time - length, end_time, bucket=bucket,
+                                         fill_empty=True)
+    columns = ['positive', 'negative', 'neutral'] if plot_type == 'individual' else ['net_score']
+    return update_series_figure(df, state, [TEAM, length, plot_type], bucket, columns,
+                                lambda df: line_plot.build_figure(df, plot_type))
+
+
+def size(figure) -> int:
+    """Returns the size of a figure update as sent to the browser, in bytes."""
+    return len(pio.to_json(figure.to_plotly_json() if hasattr(figure, 'to_plotly_json')
+                           else figure, validate=False, engine='json'))
+
+
+def main() -> None:
+    """Prints the full figure and patch sizes of each window."""
+    # Keep the month window within the cache horizon.
+    os.environ.setdefault('CACHE_RETENTION_DAYS', '31')
+    redis_client = fakeredis.FakeRedis()
+    fill_counters(redis_client)
+    comments = Comment(redis_client=redis_client, comment_table=None, archive=None)
+
+    print('sentiment plot (individual lines) update sizes')
+    for name, length in WINDOWS.items():
+        bucket = comments.choose_resolution(NOW - length, NOW)
+        figure, state = update(comments, NOW, length, None, 'individual')
+        tick, _ = update(comments, NOW + 10, length, state, 'individual')
+        rollover = NOW // bucket * bucket + bucket + 10
+        new_bucket, _ = update(comments, rollover, length, state, 'individual')
+        print(f'  {name:7} full {size(figure):8,} B   tick {size(tick):6,} B   '
+              f'new bucket {size(new_bucket):6,} B')
+
+
+if __name__ == '__main__':
+    main()
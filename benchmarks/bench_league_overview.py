@@ -0,0 +1,137 @@
+"""
+Measures the server time of the league overview: the pipelined fetch of every team's counts, the
+twenty per-team queries it replaces, and the whole callback as served to a browser, including
+drawing and serializing the figure.
+
+The counters of all twenty teams are filled for a month in an in-process fakeredis server, which
+adds a simulated network round trip to every command or pipeline sent. Views are computed on each
+request, so every callback reads and draws.
+
+Usage:
+    python benchmarks/bench_league_overview.py [--rtt-ms 1] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import fakeredis
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'src', 'visualization'))
+
+os.environ.setdefault('DEBUG', 'TRUE')
+os.environ['VIEW_REFRESH_SECONDS'] = '0'
+# Keep the month window within the cache horizon.
+os.environ.setdefault('CACHE_RETENTION_DAYS', '31')
+
+from application import create_app  # noqa: E402
+from components import ids  # noqa: E402
+from components.league_overview import TEAMS  # noqa: E402
+from data.cache_schema import COUNTER_RESOLUTIONS, SENTIMENT_CODES  # noqa: E402
+from data.source import Comment  # noqa: E402
+
+WINDOWS = {'1hour': 3600, '1day': 86400, '7days': 7 * 86400, '30days': 30 * 86400}
+NOW = int(time.time())
+
+
+class RemoteRedis(fakeredis.FakeRedis):
+    """A fakeredis client that waits a network round trip for every command or pipeline."""
+
+    rtt = 0.0
+
+    def execute_command(self, *args, **options):
+        time.sleep(self.rtt)
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipeline = super().pipeline(transaction, shard_hint)
+        execute = pipeline.execute
+
+        def execute_after_round_trip(*args, **kwargs):
+            time.sleep(self.rtt)
+            return execute(*args, **kwargs)
+
+        pipeline.execute = execute_after_round_trip
+        return pipeline
+
+
+def fill_counters(redis_client) -> None:
+    """Writes a month of counters at every resolution, and a version, for every team."""
+    rng = random.Random(0)
+    for team_name in TEAMS:
+        for resolution in COUNTER_RESOLUTIONS:
+            mapping = {}
+            for bucket in range(NOW - 31 * 86400, NOW + 3600, resolution):
+                bucket = bucket // resolution * resolution
+                for code in SENTIMENT_CODES.values():
+                    mapping[f'{bucket}:{code}'] = rng.randint(1, resolution // 60)
+            redis_client.hset(f'team_counts:{team_name}:{resolution}', mapping=mapping)
+        redis_client.set(f'team_version:{team_name}', 1)
+
+
+def timed(function, repeat: int) -> tuple[float, float]:
+    """Returns the median and 95th percentile time of a function, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.95)]
+
+
+def overview_payload(app, window: str) -> dict:
+    """Builds the request body of the league overview callback."""
+    values = {(ids.INTERVAL_COMPONENT, 'n_intervals'): 1,
+              (ids.DASHBOARD_TABS, 'active_tab'): ids.LEAGUE_TAB,
+              (ids.TIME_WINDOW_BUTTONS, 'value'): window}
+    callback = next(callback for callback in app._callback_list
+                    if callback['output'].startswith(f'..{ids.LEAGUE_OVERVIEW}.'))
+    return {
+        'output': callback['output'],
+        'outputs': [dict(zip(('id', 'property'), part.rsplit('.', 1)))
+                    for part in callback['output'].strip('.').split('...')],
+        'inputs': [dict(item, value=values.get((item['id'], item['property'])))
+                   for item in callback['inputs']],
+        'changedPropIds': [f'{ids.INTERVAL_COMPONENT}.n_intervals'],
+        'state': [dict(item, value=None) for item in callback['state']],
+    }
+
+
+def main(rtt_ms: float, repeat: int) -> None:
+    """Prints the fetch and callback times of each window."""
+    redis_client = RemoteRedis()
+    fill_counters(redis_client)
+    redis_client.rtt = rtt_ms / 1000
+    comments = Comment(redis_client=redis_client, comment_table=None, archive=None)
+    app = create_app(comments)
+    client = app.server.test_client()
+
+    def per_team(length: int) -> None:
+        comments.query_cache.invalidate(lambda key: True)
+        for team_name in TEAMS:
+            comments.query_sentiment_series(team_name, NOW - length, NOW)
+
+    print(f'{len(TEAMS)} teams, {rtt_ms:g} ms round trip, median / p95 of {repeat} runs')
+    for name, length in WINDOWS.items():
+        fetch = timed(lambda: comments.query_league_counts(TEAMS, NOW - length, NOW), repeat)
+        separate = timed(lambda: per_team(length), repeat)
+        payload = overview_payload(app, name)
+        response = client.post('/_dash-update-component', json=payload)
+        assert response.status_code == 200, response.status_code
+        callback = timed(lambda: client.post('/_dash-update-component', json=payload), repeat)
+        print(f'  {name:7} pipelined fetch {fetch[0]:6.1f} / {fetch[1]:6.1f} ms   '
+              f'20 queries {separate[0]:6.1f} / {separate[1]:6.1f} ms   '
+              f'callback {callback[0]:6.1f} / {callback[1]:6.1f} ms   '
+              f'{len(response.data):,} B')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rtt-ms', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    main(args.rtt_ms, args.repeat)
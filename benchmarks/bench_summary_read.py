@@ -0,0 +1,80 @@
+"""
+Measures the dashboard's summary read latency with summaries stored as structured topics against
+the previous layout, where the summary text was parsed with a regex on every refresh.
+
+Runs against an in-process fakeredis server unless REDIS_URL points at a real Redis server.
+
+Usage:
+    python benchmarks/bench_summary_read.py [--summaries 200] [--reads 500]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import fakeredis
+import redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'src', 'visualization'))
+
+from data.source import Comment  # noqa: E402
+
+TEAM = 'bench'
+
+
+def make_topics(i: int) -> list[dict]:
+    """Builds the topics of a summary as the LLM returns them."""
+    return [{'rank': rank, 'title': f'Topic {rank} of summary {i}',
+             'description': 'Fans debated the midfield selection and the late substitutions, '
+                            'with many praising the pressing in the second half. ' * 2}
+            for rank in range(1, 9)]
+
+
+def time_reads(read, reads: int) -> tuple[float, float]:
+    """Returns the median and 95th percentile latency of a read, in milliseconds."""
+    latencies = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        read(TEAM)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main(summaries: int, reads: int) -> None:
+    """Writes both layouts and prints the latency of reading the newest summary."""
+    redis_client = (redis.Redis.from_url(os.environ['REDIS_URL']) if os.getenv('REDIS_URL')
+                    else fakeredis.FakeRedis())
+    text_key, topics_key = f'team_summary:{TEAM}', f'team_topics:{TEAM}'
+    redis_client.delete(text_key, topics_key)
+
+    for i in range(summaries):
+        start = 1_700_000_000 + i * 1200
+        topics = make_topics(i)
+        text = '\n'.join(f"{t['rank']}. **{t['title']}** - {t['description']}" for t in topics)
+        redis_client.zadd(text_key, {text: start})
+        entry = {'window_start': start, 'window_end': start + 1200, 'topics': topics}
+        redis_client.zadd(topics_key, {json.dumps(entry): start})
+
+    comments = Comment(redis_client=redis_client, comment_table=None, archive=None)
+    # The structured read is measured without the dashboard's query cache in front of it.
+    assert (comments._get_most_recent_summary(TEAM)['Title'].tolist() ==
+            comments.get_most_recent_text_summary(TEAM)['Title'].tolist())
+
+    print(f'newest summary of {summaries}, {reads} reads')
+    for name, read in (('text + regex', comments.get_most_recent_text_summary),
+                       ('structured', comments._get_most_recent_summary)):
+        median, p95 = time_reads(read, reads)
+        print(f'  {name:14} median {median:7.3f} ms   p95 {p95:7.3f} ms')
+    redis_client.delete(text_key, topics_key)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--summaries', type=int, default=200)
+    parser.add_argument('--reads', type=int, default=500)
+    args = parser.parse_args()
+    main(args.summaries, args.reads)
@@ -0,0 +1,162 @@
+"""
+Benchmarks the dashboard's requests per second as the number of gunicorn workers grows, with and
+without the cache shared between workers.
+
+A fake Redis server listens on localhost:6379 with a week of sentiment counts for every team, and
+gunicorn serves the dashboard with src/visualization/gunicorn.conf.py. Client processes then
+fire the chart callbacks for random teams and time windows, as browsers opening the dashboard
+would. Each chart callback computes its view unless the worker, or with the shared cache any
+worker, already has it.
+
+Usage:
+    python benchmarks/bench_workers.py [--workers 1 2 4 8] [--clients 8] [--duration 20]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import redis
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VISUALIZATION = os.path.join(ROOT, 'src', 'visualization')
+sys.path.insert(0, VISUALIZATION)
+
+os.environ['DEBUG'] = 'TRUE'
+
+import fakeredis  # noqa: E402
+from load_test_push import callback_payloads  # noqa: E402
+
+TEAMS = ['arsenal', 'aston villa', 'bournemouth', 'brentford', 'brighton', 'chelsea',
+         'crystal palace', 'everton', 'fulham', 'ipswich town', 'leicester city', 'liverpool',
+         'manchester city', 'manchester united', 'newcastle', 'nottingham forest',
+         'southampton', 'tottenham', 'west ham', 'wolves']
+WINDOWS = ['1hour', '1day', '7days']
+
+
+def fill_redis(redis_client) -> None:
+    """Writes a week of sentiment counts and a version for every team."""
+    now = int(time.time())
+    pipeline = redis_client.pipeline(transaction=False)
+    for team_name in TEAMS:
+        for resolution in (600, 3600, 21600, 86400):
+            for bucket in range((now - 7 * 86400) // resolution * resolution, now + 1, resolution):
+                for code in 'pnu':
+                    pipeline.hset(f'team_counts:{team_name}:{resolution}', f'{bucket}:{code}',
+                                  random.randint(0, 50))
+        pipeline.set(f'team_version:{team_name}', 1)
+    pipeline.execute()
+
+
+def free_port() -> int:
+    """Returns a free local port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def build_payloads() -> list[dict]:
+    """Builds the chart callback requests of every team and window."""
+    from application import create_app
+    from components import ids
+    from data.source import Comment
+
+    app = create_app(Comment(redis_client=fakeredis.FakeRedis(), comment_table=None,
+                             archive=None))
+    payloads = []
+    for team_name in TEAMS:
+        for payload in callback_payloads(app, team_name):
+            if 'summary' in payload['output']:
+                continue
+            for window in WINDOWS:
+                payloads.append({**payload, 'inputs': [
+                    dict(item, value=window) if item['id'] == ids.TIME_WINDOW_BUTTONS else item
+                    for item in payload['inputs']]})
+    return payloads
+
+
+def client(base_url: str, payloads: list[dict], deadline: float, results) -> None:
+    """Fires random callbacks until the deadline, reporting their latencies."""
+    session = requests.Session()
+    latencies = []
+    while time.time() < deadline:
+        start = time.perf_counter()
+        response = session.post(f'{base_url}/_dash-update-component',
+                                json=random.choice(payloads), timeout=60)
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+    results.put(latencies)
+
+
+def run(workers: int, shared: bool, clients: int, duration: float,
+        payloads: list[dict]) -> None:
+    """Serves the dashboard with a number of workers and prints its throughput."""
+    port = free_port()
+    env = dict(os.environ, DASHBOARD_WORKERS=str(workers), PORT=str(port), HOST='127.0.0.1',
+               SHARED_CACHE='TRUE' if shared else 'FALSE', DASHBOARD_PUSH='FALSE',
+               CACHE_RETENTION_DAYS='31')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+                               '--log-level', 'warning', 'application:application'],
+                              cwd=VISUALIZATION, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        for _ in range(600):
+            try:
+                requests.get(f'{base_url}/metrics/views', timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + duration
+        processes = [multiprocessing.Process(target=client,
+                                             args=(base_url, payloads, deadline, results))
+                     for _ in range(clients)]
+        for process in processes:
+            process.start()
+        latencies = sorted(latency for _ in processes for latency in results.get())
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f'  {workers:2d} workers  shared cache {"on " if shared else "off"}  '
+          f'{len(latencies) / duration:7.1f} req/s   '
+          f'median {statistics.median(latencies) * 1000 if latencies else 0:7.1f} ms   '
+          f'p95 {latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0:7.1f} ms')
+
+
+def main(worker_counts: list[int], clients: int, duration: float) -> None:
+    """Runs each worker count with and without the shared cache."""
+    redis_server = fakeredis.TcpFakeServer(('127.0.0.1', 6379))
+    # Connections left open by the workers shouldn't keep the benchmark from exiting.
+    redis_server.daemon_threads = True
+    threading.Thread(target=redis_server.serve_forever, daemon=True).start()
+    redis_client = redis.Redis(host='127.0.0.1', port=6379)
+    fill_redis(redis_client)
+    payloads = build_payloads()
+    print(f'{clients} clients for {duration:.0f}s on {os.cpu_count()} CPUs, '
+          f'{len(payloads)} distinct chart requests')
+    for workers in worker_counts:
+        for shared in (False, True):
+            redis_client.flushdb()
+            fill_redis(redis_client)
+            run(workers, shared, clients, duration, payloads)
+    redis_server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20)
+    args = parser.parse_args()
+    main(args.workers, args.clients, args.duration)
@@ -0,0 +1,195 @@
+"""
+Load tests the dashboard server with simulated browsers, comparing the request rate of interval
+polling against server push.
+
+The dashboard runs in-process on a local port against a fakeredis server, while a writer adds
+comments to a few of the teams. In polling mode every client fires the dashboard's four callbacks
+every poll interval, whether or not anything changed. In push mode every client holds a
+server-sent event stream for its team and fires the callbacks only when told of new data, plus a
+slow safety poll. Clients send back what the charts' stores hold, as a browser does, so callbacks
+can skip teams whose data hasn't changed.
+
+Usage:
+    python benchmarks/load_test_push.py [--clients 40] [--duration 60] [--busy-teams 2]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import requests
+
+os.environ.setdefault('DEBUG', 'TRUE')
+os.environ['DASHBOARD_PUSH'] = 'TRUE'
+os.environ.setdefault('PUSH_CHECK_SECONDS', '2')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'src', 'visualization'))
+
+import fakeredis  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+from application import create_app  # noqa: E402
+from components import ids  # noqa: E402
+from data.source import Comment  # noqa: E402
+
+TEAMS = ['arsenal', 'chelsea', 'everton', 'fulham', 'liverpool', 'tottenham', 'wolves']
+POLL_SECONDS = 10
+CONNECTED_POLL_SECONDS = 60
+
+
+def callback_payloads(app, team_name: str) -> list[dict]:
+    """Builds the request bodies of the dashboard's server-side callbacks for a team."""
+    values = {(ids.TEAM_DROPDOWN, 'value'): team_name,
+              (ids.TIME_WINDOW_BUTTONS, 'value'): '1hour',
+              (ids.PLOT_TYPE_BUTTONS, 'value'): 'individual',
+              (ids.INTERVAL_COMPONENT, 'n_intervals'): 1}
+    payloads = []
+    for callback in app._callback_list:
+        if callback.get('clientside_function'):
+            continue
+        output = callback['output']
+        if output.startswith('..'):
+            outputs = [dict(zip(('id', 'property'), part.rsplit('.', 1)))
+                       for part in output.strip('.').split('...')]
+        else:
+            outputs = dict(zip(('id', 'property'), output.rsplit('.', 1)))
+        payloads.append({
+            'output': output,
+            'outputs': outputs,
+            'inputs': [dict(item, value=values.get((item['id'], item['property'])))
+                       for item in callback['inputs']],
+            'changedPropIds': [f'{ids.INTERVAL_COMPONENT}.n_intervals'],
+            'state': [dict(item, value=None) for item in callback['state']],
+        })
+    return payloads
+
+
+class Client(threading.Thread):
+    """A simulated browser tab showing one team."""
+
+    def __init__(self, base_url: str, payloads: list[dict], team_name: str, push: bool,
+                 stop: threading.Event):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.payloads = payloads
+        self.team_name = team_name
+        self.push = push
+        self.stop = stop
+        self.session = requests.Session()
+        self.latencies: list[float] = []
+        self.refreshes = 0
+        self.skipped = 0
+        self.stores: dict[str, object] = {}
+
+    def refresh(self) -> None:
+        """Fires every callback once, as the browser does on a refresh."""
+        self.refreshes += 1
+        for payload in self.payloads:
+            for item in payload['state']:
+                item['value'] = self.stores.get(item['id'])
+            start = time.perf_counter()
+            response = self.session.post(f'{self.base_url}/_dash-update-component',
+                                         json=payload, timeout=30)
+            self.latencies.append(time.perf_counter() - start)
+            if response.status_code == 204:
+                self.skipped += 1
+                continue
+            for component_id, props in response.json().get('response', {}).items():
+                if 'data' in props:
+                    self.stores[component_id] = props['data']
+
+    def run(self) -> None:
+        # Browsers open at different moments.
+        time.sleep(random.uniform(0, POLL_SECONDS))
+        if not self.push:
+            while not self.stop.wait(POLL_SECONDS):
+                self.refresh()
+            return
+
+        events = threading.Event()
+        listener = threading.Thread(target=self.listen, args=(events,), daemon=True)
+        listener.start()
+        last_refresh = time.monotonic()
+        while not self.stop.is_set():
+            if events.wait(1) or time.monotonic() - last_refresh >= CONNECTED_POLL_SECONDS:
+                events.clear()
+                self.refresh()
+                last_refresh = time.monotonic()
+
+    def listen(self, events: threading.Event) -> None:
+        """Reads the team's event stream, flagging each change."""
+        with requests.get(f'{self.base_url}/events', params={'team': self.team_name},
+                          stream=True, timeout=(5, None)) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if self.stop.is_set():
+                    return
+                if line == 'event: change':
+                    events.set()
+
+
+def write_comments(redis_client, teams: list[str], stop: threading.Event) -> None:
+    """Adds a comment to one of the busy teams every second."""
+    i = 0
+    while not stop.wait(1):
+        team_name, now = teams[i % len(teams)], int(time.time())
+        redis_client.zadd(f'team:{team_name}', {f'w{i}:p': now})
+        for resolution in (600, 3600, 21600, 86400):
+            redis_client.hincrby(f'team_counts:{team_name}:{resolution}',
+                                 f'{now // resolution * resolution}:p', 1)
+        redis_client.incr(f'team_version:{team_name}')
+        i += 1
+
+
+def run(mode: str, clients: int, duration: float, busy_teams: int) -> None:
+    """Runs one mode and prints its request rate and latency."""
+    redis_client = fakeredis.FakeRedis()
+    for team_name in TEAMS:
+        redis_client.set(f'team_version:{team_name}', 1)
+    app = create_app(Comment(redis_client=redis_client, comment_table=None, archive=None))
+    server = make_server('127.0.0.1', 0, app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    stop = threading.Event()
+    threading.Thread(target=write_comments, args=(redis_client, TEAMS[:busy_teams], stop),
+                     daemon=True).start()
+    simulated = []
+    for i in range(clients):
+        team_name = TEAMS[i % len(TEAMS)]
+        client = Client(base_url, callback_payloads(app, team_name), team_name,
+                        mode == 'push', stop)
+        client.start()
+        simulated.append(client)
+    time.sleep(duration)
+    stop.set()
+    server.shutdown()
+
+    latencies = sorted(latency for client in simulated for latency in client.latencies)
+    requests_made = len(latencies)
+    refreshes = sum(client.refreshes for client in simulated)
+    skipped = sum(client.skipped for client in simulated)
+    print(f'  {mode:5} {requests_made / duration:7.1f} req/s   '
+          f'{requests_made / clients / (duration / 60):6.1f} req/client/min   '
+          f'{refreshes} refreshes   '
+          f'{skipped / requests_made if requests_made else 0:4.0%} unchanged   '
+          f'median {statistics.median(latencies) * 1000 if latencies else 0:6.1f} ms')
+
+
+def main(clients: int, duration: float, busy_teams: int) -> None:
+    """Runs both modes with the same load."""
+    print(f'{clients} clients over {len(TEAMS)} teams for {duration:.0f}s, '
+          f'new comments for {busy_teams} teams')
+    for mode in ('poll', 'push'):
+        run(mode, clients, duration, busy_teams)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=40)
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--busy-teams', type=int, default=2)
+    args = parser.parse_args()
+    main(args.clients, args.duration, args.busy_teams)
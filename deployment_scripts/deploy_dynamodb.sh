@@ -8,6 +8,8 @@ echo "Creating DynamoDB table..."
 TABLE_NAME=$1  
 PARTITION_KEY="team_name"         # Partition key for the table
 SORT_KEY="comment_id_timestamp"   # Sort key for the table
+TIME_INDEX_NAME="team_timestamp_index"  # GSI used to query a team's comments by time
+TIME_KEY="timestamp"              # Sort key for the time index (epoch seconds)
 READ_CAPACITY_UNITS=5             # Adjust based on your expected read load
 WRITE_CAPACITY_UNITS=5            # Adjust based on your expected write load
 
@@ -17,9 +19,17 @@ aws dynamodb create-table \
     --attribute-definitions \
         AttributeName=$PARTITION_KEY,AttributeType=S \
         AttributeName=$SORT_KEY,AttributeType=S \
+        AttributeName=$TIME_KEY,AttributeType=N \
     --key-schema \
         AttributeName=$PARTITION_KEY,KeyType=HASH \
         AttributeName=$SORT_KEY,KeyType=RANGE \
+    --global-secondary-indexes \
+        "[{\"IndexName\": \"$TIME_INDEX_NAME\",
+           \"KeySchema\": [{\"AttributeName\": \"$PARTITION_KEY\", \"KeyType\": \"HASH\"},
+                         {\"AttributeName\": \"$TIME_KEY\", \"KeyType\": \"RANGE\"}],
+           \"Projection\": {\"ProjectionType\": \"ALL\"},
+           \"ProvisionedThroughput\": {\"ReadCapacityUnits\": $READ_CAPACITY_UNITS,
+                                     \"WriteCapacityUnits\": $WRITE_CAPACITY_UNITS}}]" \
     --provisioned-throughput \
         ReadCapacityUnits=$READ_CAPACITY_UNITS,WriteCapacityUnits=$WRITE_CAPACITY_UNITS
 
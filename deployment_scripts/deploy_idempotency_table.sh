@@ -0,0 +1,30 @@
+#!/bin/bash
+
+# Deploy a new DynamoDB table used as an idempotency ledger by the processing Lambda
+
+echo "Creating DynamoDB idempotency table..."
+
+# Set variables
+TABLE_NAME=$1
+PARTITION_KEY="ledger_key"        # Partition key for the table (team#comment_id)
+TTL_ATTRIBUTE="expires_at"        # Items are expired by DynamoDB after this epoch time
+READ_CAPACITY_UNITS=5             # Adjust based on your expected read load
+WRITE_CAPACITY_UNITS=5            # Adjust based on your expected write load
+
+# Create the DynamoDB table
+aws dynamodb create-table \
+    --table-name $TABLE_NAME \
+    --attribute-definitions \
+        AttributeName=$PARTITION_KEY,AttributeType=S \
+    --key-schema \
+        AttributeName=$PARTITION_KEY,KeyType=HASH \
+    --provisioned-throughput \
+        ReadCapacityUnits=$READ_CAPACITY_UNITS,WriteCapacityUnits=$WRITE_CAPACITY_UNITS
+
+# Enable TTL once the table is active
+aws dynamodb wait table-exists --table-name $TABLE_NAME
+aws dynamodb update-time-to-live \
+    --table-name $TABLE_NAME \
+    --time-to-live-specification Enabled=true,AttributeName=$TTL_ATTRIBUTE
+
+echo "DynamoDB table '$TABLE_NAME' created successfully."
@@ -7,9 +7,9 @@ LAMBDA_FUNCTION_NAME=$1
 ROLE=$2
 ZIP_FILE="lambda_function.zip"
 
-# Step 1: Install boto3 into a directory called 'package'
+# Step 1: Install dependencies into a directory called 'package'
 mkdir -p ../src/processing/package
-pip install --target ../src/processing/package boto3
+pip install --target ../src/processing/package boto3 cachetools redis
 
 # Step 2: Package the 'package' directory into a zip file
 cd ../src/processing/package
@@ -19,6 +19,9 @@ zip -r9 ../$ZIP_FILE .
 cd ..
 zip -g $ZIP_FILE lambda_handler.py
 zip -g $ZIP_FILE comment_table.py
+zip -g $ZIP_FILE rollup_table.py
+zip -g $ZIP_FILE idempotency_ledger.py
+zip -g $ZIP_FILE lambda_resources.py
 
 # Step 4: Deploy the Lambda function
 aws lambda create-function --function-name $LAMBDA_FUNCTION_NAME --zip-file fileb://$ZIP_FILE \
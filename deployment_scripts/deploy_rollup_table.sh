@@ -0,0 +1,26 @@
+#!/bin/bash
+
+# Deploy a new DynamoDB table for per-team sentiment rollups
+
+echo "Creating DynamoDB rollup table..."
+
+# Set variables
+TABLE_NAME=$1
+PARTITION_KEY="team_name"         # Partition key for the table
+SORT_KEY="bucket_timestamp"       # Sort key for the table (bucket start, epoch seconds)
+READ_CAPACITY_UNITS=5             # Adjust based on your expected read load
+WRITE_CAPACITY_UNITS=5            # Adjust based on your expected write load
+
+# Create the DynamoDB table
+aws dynamodb create-table \
+    --table-name $TABLE_NAME \
+    --attribute-definitions \
+        AttributeName=$PARTITION_KEY,AttributeType=S \
+        AttributeName=$SORT_KEY,AttributeType=N \
+    --key-schema \
+        AttributeName=$PARTITION_KEY,KeyType=HASH \
+        AttributeName=$SORT_KEY,KeyType=RANGE \
+    --provisioned-throughput \
+        ReadCapacityUnits=$READ_CAPACITY_UNITS,WriteCapacityUnits=$WRITE_CAPACITY_UNITS
+
+echo "DynamoDB table '$TABLE_NAME' created successfully."
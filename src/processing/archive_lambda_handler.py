@@ -0,0 +1,151 @@
+"""
+Defines a Lambda function that moves comments older than a configurable age out of DynamoDB and
+Redis into a Parquet archive partitioned by team and day.
+"""
+
+from typing import Any, Optional
+import os
+import logging
+import time
+import redis
+from comment_table import Comment
+from comment_archive import CommentArchive, day_of
+from cache_schema import bodies_key, decode_member, index_key
+from cache_retention import RetentionPolicy
+from lambda_resources import REGISTRY, get_redis_client, get_resource
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+TEAMS = ['arsenal', 'aston villa', 'bournemouth', 'brentford', 'brighton', 'chelsea',
+         'crystal palace', 'everton', 'fulham', 'ipswich town', 'leicester city', 'liverpool',
+         'manchester city', 'manchester united', 'newcastle', 'nottingham forest',
+         'southampton', 'tottenham', 'west ham', 'wolves']
+
+def create_comment_table() -> Comment:
+    """Creates the DynamoDB comment table wrapper, checking that the table exists."""
+    comment_table = Comment(dyn_resource=get_resource('dynamodb'))
+    if not comment_table.exists(os.getenv('DYNAMODB_TABLE_NAME')):
+        raise RuntimeError(f"DynamoDB table {os.getenv('DYNAMODB_TABLE_NAME')} does not exist.")
+    return comment_table
+
+
+def initialize_resources(comment_table=None, archive=None, redis_client=None) -> tuple:
+    """
+    Initializes the required resources if not provided. Redis is only trimmed when
+    ELASTICACHE_ENDPOINT is set.
+    """
+    if comment_table is None:
+        comment_table = REGISTRY.get('comment_table', create_comment_table)
+    if archive is None:
+        archive = REGISTRY.get('archive', lambda: CommentArchive(
+            uri=os.getenv('ARCHIVE_URI'), endpoint_override=os.getenv('ARCHIVE_S3_ENDPOINT')))
+    if redis_client is None and os.getenv('ELASTICACHE_ENDPOINT'):
+        redis_client = get_redis_client(is_serverless=False)
+
+    return comment_table, archive, redis_client
+
+
+def archive_day(team_name: str, day: str, items: list[dict], comment_table: Comment,
+                archive: CommentArchive) -> int:
+    """
+    Writes one day of a team's comments to the archive, then removes them from DynamoDB. The
+    archive file is written first so a failure never loses comments.
+    """
+    archive.write_day(team_name, day, items)
+    return comment_table.delete_comments(items)
+
+
+def trim_cache(redis_client: redis.Redis, team_name: str, cutoff: int,
+               batch: Optional[int] = None) -> int:
+    """
+    Removes a team's cached comments older than the cutoff from the index and comment store.
+    They are read and removed `batch` at a time, CACHE_RETENTION_TRIM_BATCH by default, so that
+    a large backlog doesn't block Redis with one long command.
+    """
+    batch = batch if batch is not None else RetentionPolicy.from_env().trim_batch
+    removed = 0
+    while True:
+        members = redis_client.zrangebyscore(index_key(team_name), '-inf', f'({cutoff}',
+                                             start=0, num=batch)
+        if not members:
+            return removed
+        pipeline = redis_client.pipeline(transaction=False)
+        pipeline.zrem(index_key(team_name), *members)
+        pipeline.hdel(bodies_key(team_name), *[decode_member(member)[0] for member in members])
+        pipeline.execute()
+        removed += len(members)
+        if len(members) < batch:
+            return removed
+
+
+def archive_team(team_name: str, cutoff: int, comment_table: Comment, archive: CommentArchive,
+                 redis_client: Optional[redis.Redis] = None) -> int:
+    """
+    Archives a team's comments with timestamps before the cutoff.
+
+    Comments are read from DynamoDB in time order and flushed to the archive one day at a time,
+    so memory use is bounded by a single day of comments.
+
+    Args:
+        team_name: The team to archive.
+        cutoff: Comments older than this epoch timestamp are archived.
+        comment_table: The DynamoDB comment table.
+        archive: The Parquet archive to write to.
+        redis_client: The Redis cache to trim, if any.
+
+    Returns:
+        The number of archived comments.
+    """
+    archived = 0
+    day, items = None, []
+    for item in comment_table.query_range(team_name, 0, cutoff - 1, attributes=None):
+        item_day = day_of(item['timestamp'])
+        if items and item_day != day:
+            archived += archive_day(team_name, day, items, comment_table, archive)
+            items = []
+        day = item_day
+        items.append(item)
+    if items:
+        archived += archive_day(team_name, day, items, comment_table, archive)
+
+    if redis_client is not None:
+        removed = trim_cache(redis_client, team_name, cutoff)
+        logger.info("Removed %s cached comments for %s.", removed, team_name)
+
+    return archived
+
+
+def archive_teams(event: dict[str, Any], comment_table: Comment, archive: CommentArchive,
+                  redis_client: Optional[redis.Redis]) -> dict[str, int]:
+    """Archives the aged comments of every team in the event, or of all teams."""
+    archive_after_days = float(event.get('archive_after_days',
+                                         os.getenv('ARCHIVE_AFTER_DAYS', '30')))
+    cutoff = int(time.time() - archive_after_days * 86400)
+
+    results = {}
+    for team in event.get('teams', TEAMS):
+        try:
+            results[team] = archive_team(team, cutoff, comment_table, archive, redis_client)
+        except Exception as e:
+            logger.error("Error archiving comments for team %s: %s", team, e)
+            raise
+
+    logger.info("Archived %s comments older than %s.", sum(results.values()), cutoff)
+    return results
+
+
+def lambda_handler(event: dict[str, Any], context: dict[str, Any], comment_table=None,
+                   archive=None, redis_client=None) -> dict[str, int]:
+    """
+    Lambda function, run on a schedule, that archives comments older than ARCHIVE_AFTER_DAYS
+    days (30 by default) for every team.
+
+    Returns:
+        The number of archived comments per team.
+    """
+    with REGISTRY.invocation():
+        comment_table, archive, redis_client = initialize_resources(comment_table, archive,
+                                                                    redis_client)
+        return archive_teams(event, comment_table, archive, redis_client)
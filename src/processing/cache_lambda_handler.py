@@ -1,64 +1,24 @@
 """Defines a Lambda function and helper methods to process records from a DynamoDB stream."""
 
-from typing import Any, Tuple, Union
+from typing import Any, Optional
+from collections import Counter, defaultdict
 import os
 import logging
 import json
-from urllib.parse import ParseResult, urlencode, urlunparse
 import redis
-import botocore.session
-from botocore.model import ServiceId
-from botocore.signers import RequestSigner
-from cachetools import TTLCache, cached
+from cache_schema import (COUNTER_RESOLUTIONS, bodies_key, bucket_start, buckets_key,
+                          counter_field, counts_key, decode_member, encode_member, index_key,
+                          other_members, version_key)
+from cache_retention import (RetentionPolicy, add_trim_commands, plan_trims, queue_trim_reads,
+                             report_memory)
+from lambda_resources import REGISTRY, get_redis_client, reset_redis_client
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-class ElastiCacheIAMProvider(redis.CredentialProvider):
-    """Class which acts as a wrapper for elasticache IAM operations."""
-    def __init__(self, user, cache_name, is_serverless=True, region="us-west-1"):
-        self.user = user
-        self.cache_name = cache_name
-        self.is_serverless = is_serverless
-        self.region = region
-
-        session = botocore.session.get_session()
-        self.request_signer = RequestSigner(
-            ServiceId("elasticache"),
-            self.region,
-            "elasticache",
-            "v4",
-            session.get_credentials(),
-            session.get_component("event_emitter"),
-        )
-
-    # Generated IAM tokens are valid for 15 minutes
-    @cached(cache=TTLCache(maxsize=128, ttl=900))
-    def get_credentials(self) -> Union[Tuple[str], Tuple[str, str]]:
-        query_params = {"Action": "connect", "User": self.user}
-        if self.is_serverless:
-            query_params["ResourceType"] = "ServerlessCache"
-        url = urlunparse(
-            ParseResult(
-                scheme="https",
-                netloc=self.cache_name,
-                path="/",
-                query=urlencode(query_params),
-                params="",
-                fragment="",
-            )
-        )
-        signed_url = self.request_signer.generate_presigned_url(
-            {"method": "GET", "url": url, "body": {}, "headers": {}, "context": {}},
-            operation_name="connect",
-            expires_in=900,
-            region_name=self.region,
-        )
-        # RequestSigner only seems to work if the URL has a protocol, but
-        # Elasticache only accepts the URL without a protocol
-        # So strip it off the signed URL before returning
-        return (self.user, signed_url.removeprefix("https://"))
+# Maximum number of members sent in a single ZADD command; override with CACHE_CHUNK_SIZE.
+DEFAULT_CHUNK_SIZE = 500
 
 
 def _prepare_item(data:dict) -> dict:
@@ -83,39 +43,233 @@ def _prepare_item(data:dict) -> dict:
         'timestamp': data['timestamp']['N']
     }
 
-def process_record(record: dict[str, Any], redis_client: redis.Redis) -> None:
-    """Processes a single DynamoDB Stream record."""
-    try:
-        logger.info("Processing DynamoDB Stream Event: %s", record['eventID'])
-        new_data = record['dynamodb']['NewImage']
-        prepared_data = _prepare_item(new_data)
-        team_name = record['dynamodb']['Keys']['team_name']['S']
-        timestamp = record['dynamodb']['NewImage']['timestamp']['N']
 
-        logger.info("Team_name: %s, timestamp: %s, data: %s", team_name, timestamp,
-                     json.dumps(prepared_data))
-        
-        redis_client.zadd(f'team:{team_name}', {json.dumps(prepared_data):timestamp})
+class TeamBatch:
+    """The cache writes for one team within an invocation."""
+
+    def __init__(self):
+        self.members: dict[str, float] = {}  # Index member -> timestamp
+        self.bodies: dict[str, str] = {}  # Comment id -> full comment JSON
+
+    def drop_before(self, cutoff: float) -> None:
+        """Drops comments older than the cutoff, which would be trimmed straight away."""
+        for member, timestamp in list(self.members.items()):
+            if timestamp < cutoff:
+                del self.members[member]
+                self.bodies.pop(decode_member(member)[0], None)
+
+
+def prepare_cache_entry(record: dict[str, Any]) -> Optional[tuple[str, str, str, float, str]]:
+    """
+    Prepares the cache entry for a single DynamoDB Stream record.
+
+    Args:
+        record: A DynamoDB Stream record.
+
+    Returns:
+        The team name, comment id, index member, timestamp and full comment JSON, or None if
+        the record should not be cached.
+    """
+    if record['eventName'] == 'REMOVE':
+        # Deletions come from the archive job, which trims the cache itself.
+        return None
+    item = _prepare_item(record['dynamodb']['NewImage'])
+    team_name = record['dynamodb']['Keys']['team_name']['S']
+    return (team_name, item['id'], encode_member(item['id'], item['sentiment_id']),
+            float(item['timestamp']), json.dumps(item))
+
+
+def group_records(records: list[dict[str, Any]]) -> tuple[dict[str, TeamBatch], int]:
+    """
+    Prepares the cache entries for a batch of stream records, merging the writes for each team.
+    A record that can't be prepared is logged and skipped without failing the rest of the
+    batch.
 
-        logger.info("Added comment to Redis cache.")
+    Args:
+        records: DynamoDB Stream records.
+
+    Returns:
+        The writes for each team, and the number of records that failed.
+    """
+    batches = defaultdict(TeamBatch)
+    failed = 0
+    for record in records:
+        try:
+            entry = prepare_cache_entry(record)
+        except Exception as e:
+            logger.error("Skipping record %s that couldn't be prepared: %s",
+                         record.get('eventID'), e)
+            failed += 1
+            continue
+        if entry is not None:
+            team_name, comment_id, member, timestamp, body = entry
+            # A later record for the same comment replaces its sentiment.
+            for other in other_members(member):
+                batches[team_name].members.pop(other, None)
+            batches[team_name].members[member] = timestamp
+            batches[team_name].bodies[comment_id] = body
+            logger.debug("Prepared %s for %s.", record['eventID'], team_name)
+    return batches, failed
+
+
+def _chunks(mapping: dict, chunk_size: int):
+    """Yields a mapping in sub-mappings of at most chunk_size entries."""
+    entries = list(mapping.items())
+    for i in range(0, len(entries), chunk_size):
+        yield dict(entries[i:i + chunk_size])
+
+
+def count_new_members(batch: TeamBatch, scores: list[Optional[float]]) -> Counter:
+    """
+    Counts the comments of a batch that are not in the index yet, per resolution, bucket and
+    sentiment.
+
+    Args:
+        batch: The writes for a team.
+        scores: The current index scores of the batch's members, in order; None for members
+            that are not in the index.
+
+    Returns:
+        The number of new comments per resolution and counts hash field.
+    """
+    counts = Counter()
+    for (member, timestamp), score in zip(batch.members.items(), scores):
+        if score is None:
+            code = member.rpartition(':')[2]
+            for resolution in COUNTER_RESOLUTIONS:
+                field = counter_field(bucket_start(timestamp, resolution), code)
+                counts[resolution, field] += 1
+    return counts
 
+
+def count_replaced_members(replaced: dict[str, float]) -> Counter:
+    """
+    Counts the comments whose index members are being replaced with another sentiment, as
+    negative counts per resolution and counts hash field of the old sentiment.
+
+    Args:
+        replaced: The index members being replaced and their timestamps.
+
+    Returns:
+        The number of comments to subtract per resolution and counts hash field.
+    """
+    counts = Counter()
+    for member, timestamp in replaced.items():
+        code = member.rpartition(':')[2]
+        for resolution in COUNTER_RESOLUTIONS:
+            counts[resolution, counter_field(bucket_start(timestamp, resolution), code)] -= 1
+    return counts
+
+
+def write_entries(redis_client: redis.Redis, batches: dict[str, TeamBatch],
+                  chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  policy: Optional[RetentionPolicy] = None) -> int:
+    """
+    Adds the prepared entries to Redis. Each team's index members are sent with one ZADD, and
+    its full comments with one HSET, per `chunk_size` entries.
+
+    The first round trip checks which members are already in the index, which comments are
+    indexed with another sentiment and, with a retention policy, what to trim. The second writes
+    the entries, removes the members a sentiment change replaces, adjusts the sentiment counts
+    for new and changed comments at each resolution with HINCRBY, indexes the buckets counted
+    in, bumps the version of each team whose counts changed, and trims. Comments seen before,
+    such as those of a retried batch, are not counted twice and don't change the version.
+
+    Args:
+        redis_client: The Redis client.
+        batches: The writes for each team.
+        chunk_size: The maximum number of entries sent in one command.
+        policy: The retention policy to apply, if any.
+
+    Returns:
+        The number of comments written.
+    """
+    if policy is not None:
+        cutoff = policy.cutoff()
+        for batch in batches.values():
+            batch.drop_before(cutoff)
+    batches = {team_name: batch for team_name, batch in batches.items() if batch.members}
+
+    planning = redis_client.pipeline(transaction=False)
+    for team_name, batch in batches.items():
+        for members in _chunks(batch.members, chunk_size):
+            planning.zmscore(index_key(team_name), list(members))
+            planning.zmscore(index_key(team_name),
+                             [other for member in members for other in other_members(member)])
+    if policy is not None:
+        queue_trim_reads(planning, list(batches), policy)
+    replies = iter(planning.execute() if planning.command_stack else [])
+
+    pipeline = redis_client.pipeline(transaction=False)
+    written = 0
+    for team_name, batch in batches.items():
+        scores = []
+        replaced = {}
+        for members in _chunks(batch.members, chunk_size):
+            others = [other for member in members for other in other_members(member)]
+            pipeline.zadd(index_key(team_name), members)
+            scores.extend(next(replies))
+            replaced.update((other, score) for other, score in zip(others, next(replies))
+                            if score is not None)
+        if replaced:
+            pipeline.zrem(index_key(team_name), *replaced)
+        for bodies in _chunks(batch.bodies, chunk_size):
+            pipeline.hset(bodies_key(team_name), mapping=bodies)
+        counts = count_new_members(batch, scores)
+        counts.update(count_replaced_members(replaced))
+        counts = {key: count for key, count in counts.items() if count}
+        new_buckets = defaultdict(dict)
+        for (resolution, field), count in counts.items():
+            pipeline.hincrby(counts_key(team_name, resolution), field, count)
+            bucket = int(field.partition(':')[0])
+            new_buckets[resolution][bucket] = bucket
+        for resolution, buckets in new_buckets.items():
+            pipeline.zadd(buckets_key(team_name, resolution), buckets)
+        if counts:
+            pipeline.incr(version_key(team_name))
+        written += len(batch.members)
+
+    if policy is not None:
+        new_comments = {team_name: len(batch.members) for team_name, batch in batches.items()}
+        trims, buckets = plan_trims(list(replies), new_comments, policy)
+        for team_name in batches:
+            add_trim_commands(pipeline, team_name, trims.get(team_name, []), policy,
+                              buckets.get(team_name))
+    if pipeline.command_stack:
+        pipeline.execute()
+    return written
+
+
+def process_batch(records: list[dict[str, Any]], redis_client: redis.Redis) -> dict[str, int]:
+    """Prepares and writes a batch of stream records to the Redis cache."""
+    chunk_size = int(os.getenv('CACHE_CHUNK_SIZE', str(DEFAULT_CHUNK_SIZE)))
+    batches, failed = group_records(records)
+    try:
+        written = write_entries(redis_client, batches, chunk_size, RetentionPolicy.from_env())
+        if os.getenv('CACHE_REPORT_MEMORY') == 'TRUE':
+            report_memory(redis_client, list(batches))
+    except (redis.exceptions.AuthenticationError, redis.exceptions.ConnectionError) as e:
+        logger.error("Lost the Redis connection, reconnecting on next invocation: %s", e)
+        reset_redis_client(is_serverless=False)
+        raise
     except Exception as e:
-        logger.error("An error occured while processing the record: %s", e)
+        logger.error("An error occured while writing to the Redis cache: %s", e)
         raise
 
-def lambda_handler(event: dict[str, Any], context:dict[str, Any]):
-    """Lambda function that adds records from a dynamoDB stream to 
-    redis cache."""
+    logger.info("Added %s comments across %s teams to Redis cache, %s records failed.",
+                written, len(batches), failed)
+    return {'written': written, 'failed': failed}
 
-    username = os.getenv('ELASTICACHE_USERNAME')
-    cache_name = os.getenv('CACHE_NAME')
-    elasticache_endpoint = os.getenv('ELASTICACHE_ENDPOINT')
-    creds_provider = ElastiCacheIAMProvider(user=username, cache_name=cache_name,
-                                             is_serverless=False)
 
-    redis_client = redis.Redis(host=elasticache_endpoint, port=6379,
-                                credential_provider=creds_provider, ssl=True, ssl_cert_reqs="none")
+def lambda_handler(event: dict[str, Any], context:dict[str, Any],
+                   redis_client: Optional[redis.Redis] = None) -> dict[str, int]:
+    """Lambda function that adds records from a dynamoDB stream to
+    redis cache.
+
+    Returns:
+        The number of comments written and of records that failed to be prepared."""
 
-    logger.info("ping result: %s", redis_client.ping())
-    for record in event['Records']:
-        process_record(record, redis_client)
+    with REGISTRY.invocation():
+        if redis_client is None:
+            redis_client = get_redis_client(is_serverless=False)
+        return process_batch(event['Records'], redis_client)
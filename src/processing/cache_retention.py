@@ -0,0 +1,162 @@
+"""
+Defines the retention policy for the Redis cache. Old comments are trimmed incrementally by the
+cache Lambda: every invocation removes at most a bounded number of expired or excess members from
+the teams it writes to, as part of the same pipeline as its writes. Sentiment counts for buckets
+past the horizon are removed in the same way, a bounded number of buckets at a time.
+"""
+
+import os
+import logging
+import time
+from typing import Optional
+import redis
+from cache_schema import (COUNTER_RESOLUTIONS, SENTIMENT_CODES, bodies_key, buckets_key,
+                          counter_field, counts_key, decode_member, index_key, summary_key,
+                          topics_key)
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class RetentionPolicy:
+    """
+    Limits on what the cache keeps for each team.
+
+    Args:
+        horizon_seconds: Comments older than this are removed.
+        max_comments: The maximum number of comments kept per team; the oldest are removed first.
+        trim_batch: The maximum number of comments removed per team per invocation, which bounds
+            the extra work any single invocation does.
+        max_summaries: The number of most recent summaries kept per team.
+    """
+
+    def __init__(self, horizon_seconds: int = 30 * 86400, max_comments: int = 250000,
+                 trim_batch: int = 1000, max_summaries: int = 200):
+        self.horizon_seconds = horizon_seconds
+        self.max_comments = max_comments
+        self.trim_batch = trim_batch
+        self.max_summaries = max_summaries
+
+    @classmethod
+    def from_env(cls) -> 'RetentionPolicy':
+        """Builds a policy from CACHE_RETENTION_* environment variables, using defaults if unset."""
+        defaults = cls()
+        return cls(
+            horizon_seconds=int(float(os.getenv('CACHE_RETENTION_DAYS',
+                                                defaults.horizon_seconds / 86400)) * 86400),
+            max_comments=int(os.getenv('CACHE_RETENTION_MAX_COMMENTS', defaults.max_comments)),
+            trim_batch=int(os.getenv('CACHE_RETENTION_TRIM_BATCH', defaults.trim_batch)),
+            max_summaries=int(os.getenv('CACHE_RETENTION_MAX_SUMMARIES', defaults.max_summaries))
+        )
+
+    def cutoff(self, now: Optional[float] = None) -> float:
+        """Returns the timestamp before which comments are expired."""
+        return (time.time() if now is None else now) - self.horizon_seconds
+
+
+def queue_trim_reads(pipeline: redis.client.Pipeline, teams: list[str],
+                     policy: RetentionPolicy, now: Optional[float] = None) -> None:
+    """
+    Queues the reads plan_trims needs: the oldest `trim_batch` members and the size of each
+    team's index, and the starts of up to `trim_batch` buckets wholly past the horizon at each
+    counter resolution. Sharing a pipeline with other reads saves a round trip.
+    """
+    cutoff = policy.cutoff(now)
+    for team_name in teams:
+        pipeline.zrange(index_key(team_name), 0, policy.trim_batch - 1, withscores=True)
+        pipeline.zcard(index_key(team_name))
+        for resolution in COUNTER_RESOLUTIONS:
+            pipeline.zrangebyscore(buckets_key(team_name, resolution), '-inf',
+                                   cutoff - resolution, start=0, num=policy.trim_batch)
+
+
+def plan_trims(results: list, new_comments: dict[str, int], policy: RetentionPolicy,
+               now: Optional[float] = None
+               ) -> tuple[dict[str, list[tuple[bytes, float]]], dict[str, dict[int, list[int]]]]:
+    """
+    Finds the index members and counter buckets to remove for each team.
+
+    Members older than the horizon are removed, along with as many further old members as
+    needed to keep the index under `max_comments` once the new comments have been added.
+    Counter buckets are removed once they lie wholly past the horizon, whether or not any of
+    their comments are trimmed in this pass; counts are kept for comments that are only trimmed
+    to respect `max_comments`.
+
+    Args:
+        results: The replies to the commands queued by queue_trim_reads, in order.
+        new_comments: The number of comments about to be added, per team, in the order the
+            teams were passed to queue_trim_reads.
+        policy: The retention policy.
+        now: The current time, in epoch seconds.
+
+    Returns:
+        The index members to remove and their timestamps, per team, and the counter bucket
+        starts to remove, per team and resolution.
+    """
+    cutoff = policy.cutoff(now)
+    trims, buckets = {}, {}
+    replies = iter(results)
+    for team_name in new_comments:
+        oldest, size = next(replies), next(replies)
+        expired = sum(1 for _, score in oldest if score < cutoff)
+        excess = size + new_comments[team_name] - policy.max_comments
+        remove = min(max(expired, excess), len(oldest))
+        if remove > 0:
+            trims[team_name] = oldest[:remove]
+        expired_buckets = {resolution: [int(bucket) for bucket in next(replies)]
+                           for resolution in COUNTER_RESOLUTIONS}
+        if any(expired_buckets.values()):
+            buckets[team_name] = expired_buckets
+    return trims, buckets
+
+
+def add_trim_commands(pipeline: redis.client.Pipeline, team_name: str,
+                      trimmed: list[tuple[bytes, float]], policy: RetentionPolicy,
+                      expired_buckets: Optional[dict[int, list[int]]] = None) -> None:
+    """
+    Queues the commands removing a team's trimmed comments from the index and comment store,
+    the sentiment counts of its expired buckets, and its summaries beyond the most recent
+    `max_summaries`.
+    """
+    if trimmed:
+        members = [member for member, _ in trimmed]
+        pipeline.zrem(index_key(team_name), *members)
+        pipeline.hdel(bodies_key(team_name), *[decode_member(member)[0] for member in members])
+    for resolution, buckets in (expired_buckets or {}).items():
+        if buckets:
+            pipeline.hdel(counts_key(team_name, resolution),
+                          *[counter_field(bucket, code) for bucket in buckets
+                            for code in SENTIMENT_CODES.values()])
+            pipeline.zrem(buckets_key(team_name, resolution), *buckets)
+    pipeline.zremrangebyrank(summary_key(team_name), 0, -(policy.max_summaries + 1))
+    pipeline.zremrangebyrank(topics_key(team_name), 0, -(policy.max_summaries + 1))
+
+
+def report_memory(redis_client: redis.Redis, teams: list[str]) -> dict[str, Optional[int]]:
+    """
+    Reports the memory used by each team's cache keys, with one pipelined round trip.
+
+    Args:
+        redis_client: The Redis client.
+        teams: The teams to report on.
+
+    Returns:
+        Bytes used per key, or None where the server doesn't support MEMORY USAGE.
+    """
+    keys = [key for team_name in teams
+            for key in (index_key(team_name), bodies_key(team_name), summary_key(team_name),
+                        topics_key(team_name),
+                        *[key for resolution in COUNTER_RESOLUTIONS
+                          for key in (counts_key(team_name, resolution),
+                                      buckets_key(team_name, resolution))])]
+    pipeline = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipeline.memory_usage(key, samples=0)
+    results = pipeline.execute(raise_on_error=False)
+
+    usage = {key: (None if isinstance(result, Exception) else result)
+             for key, result in zip(keys, results)}
+    for key, used in usage.items():
+        logger.info("Memory used by %s: %s bytes", key, used)
+    return usage
@@ -0,0 +1,115 @@
+"""
+Defines the layout of the Redis cache written by the Lambda functions and read by the dashboard.
+
+Each team has a compact sorted set index, `team:{team}`, scored by comment timestamp, whose
+members are `{comment id}:{sentiment code}`. A comment has one member, so when its sentiment
+changes the member with the old code is replaced. The full comments are kept separately in a hash,
+`team_comments:{team}`, keyed by comment id, and are only fetched when a comment's text is needed.
+
+Sentiment counts are kept per team and resolution in a hash, `team_counts:{team}:{seconds}`,
+with one field per bucket and sentiment, `{bucket start}:{sentiment code}`, so that charts can be
+drawn without reading the comments themselves. Each resolution is maintained at ingest, so long
+windows can be read pre-downsampled. The bucket starts each hash holds are indexed in a sorted
+set, `team_buckets:{team}:{seconds}`, so that expired buckets can be found without scanning it.
+
+Summaries are parsed into their ranked topics when they are written, and kept per team as JSON
+members of a sorted set, `team_topics:{team}`, scored by the start of the window they cover.
+
+Every write that adds comments or a summary for a team increments the team's version counter,
+`team_version:{team}`, so readers can tell whether anything changed with a single GET.
+
+The dashboard mirrors these helpers in src/visualization/data/cache_schema.py.
+"""
+
+import json
+from typing import Optional, Union
+
+SENTIMENT_CODES = {'positive': 'p', 'negative': 'n', 'neutral': 'u'}
+SENTIMENT_LABELS = {code: label for label, code in SENTIMENT_CODES.items()}
+
+# Widths of the buckets sentiment counts are kept in, finest first: 10 minutes, 1 hour, 6 hours
+# and 1 day.
+COUNTER_RESOLUTIONS = (600, 3600, 21600, 86400)
+
+
+def index_key(team_name: str) -> str:
+    """Returns the key of a team's sorted set index."""
+    return f'team:{team_name}'
+
+
+def bodies_key(team_name: str) -> str:
+    """Returns the key of the hash holding a team's full comments."""
+    return f'team_comments:{team_name}'
+
+
+def counts_key(team_name: str, resolution: int) -> str:
+    """Returns the key of the hash holding a team's sentiment counts at a resolution."""
+    return f'team_counts:{team_name}:{resolution}'
+
+
+def buckets_key(team_name: str, resolution: int) -> str:
+    """Returns the key of the sorted set of bucket starts in a team's counts at a resolution."""
+    return f'team_buckets:{team_name}:{resolution}'
+
+
+def bucket_start(timestamp: float, bucket_seconds: int) -> int:
+    """Returns the start of the bucket a timestamp falls in."""
+    return int(timestamp // bucket_seconds * bucket_seconds)
+
+
+def counter_field(bucket: int, code: str) -> str:
+    """Returns the counts hash field for a bucket and sentiment code."""
+    return f'{bucket}:{code}'
+
+
+def summary_key(team_name: str) -> str:
+    """Returns the key of a team's sorted set of summaries."""
+    return f'team_summary:{team_name}'
+
+
+def topics_key(team_name: str) -> str:
+    """Returns the key of a team's sorted set of structured summaries, scored by window start."""
+    return f'team_topics:{team_name}'
+
+
+def version_key(team_name: str) -> str:
+    """Returns the key of the counter incremented on every write of a team's data."""
+    return f'team_version:{team_name}'
+
+
+def summary_state_key(team_name: str) -> str:
+    """Returns the key of the hash recording what a team's last summary covered."""
+    return f'summary_state:{team_name}'
+
+
+def encode_member(comment_id: str, sentiment_id: str) -> str:
+    """Returns the index member for a comment."""
+    return f'{comment_id}:{SENTIMENT_CODES.get(sentiment_id, SENTIMENT_CODES["neutral"])}'
+
+
+def other_members(member: str) -> list[str]:
+    """Returns the index members the same comment would have with the other sentiment codes."""
+    comment_id, _, code = member.rpartition(':')
+    return [f'{comment_id}:{other}' for other in SENTIMENT_CODES.values() if other != code]
+
+
+def decode_member(member: Union[bytes, str]) -> tuple[str, str, Optional[dict]]:
+    """
+    Decodes an index member.
+
+    Members written before the compact layout are full JSON comments; those are still decoded
+    so that older cache entries stay readable until they are trimmed.
+
+    Args:
+        member: A member of a team's sorted set index.
+
+    Returns:
+        The comment id, the sentiment label and, for legacy members only, the full comment.
+    """
+    if isinstance(member, bytes):
+        member = member.decode('utf-8')
+    if member.startswith('{'):
+        comment = json.loads(member)
+        return comment['id'], comment['sentiment_id'], comment
+    comment_id, _, code = member.rpartition(':')
+    return comment_id, SENTIMENT_LABELS.get(code, 'neutral'), None
@@ -0,0 +1,133 @@
+"""
+Defines an archive of aged Reddit comments stored as compressed Parquet files, partitioned by team
+and day, on local or S3-compatible storage.
+"""
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+from urllib.parse import quote
+import pyarrow as pa
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Columns stored for each comment. The team and day are encoded in the partition path.
+ARCHIVE_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('name', pa.string()),
+    ('author', pa.string()),
+    ('body', pa.string()),
+    ('upvotes', pa.int64()),
+    ('downvotes', pa.int64()),
+    ('timestamp', pa.int64()),
+    ('subreddit', pa.string()),
+    ('sentiment_id', pa.dictionary(pa.int8(), pa.string())),
+    ('sentiment_score', pa.float64()),
+])
+
+
+def resolve_filesystem(uri: str,
+                       endpoint_override: Optional[str] = None) -> tuple[pafs.FileSystem, str]:
+    """
+    Resolves an archive URI, such as '/data/archive' or 's3://bucket/archive', into a pyarrow
+    filesystem and a base path.
+
+    Args:
+        uri: The archive location.
+        endpoint_override: Endpoint of an S3-compatible service (e.g. MinIO) to use instead
+            of AWS.
+
+    Returns:
+        The filesystem and the base path of the archive within it.
+    """
+    if uri.startswith('s3://'):
+        filesystem = pafs.S3FileSystem(endpoint_override=endpoint_override,
+                                       region=os.getenv('AWS_REGION'))
+        return filesystem, uri.removeprefix('s3://').rstrip('/')
+    filesystem, path = pafs.FileSystem.from_uri(os.path.abspath(uri) if '://' not in uri else uri)
+    return filesystem, path.rstrip('/')
+
+
+def partition_path(base_path: str, team_name: str, day: str) -> str:
+    """Returns the hive-style directory holding a team's comments for a day (YYYY-MM-DD)."""
+    return f"{base_path}/team={quote(team_name, safe='')}/date={day}"
+
+
+def day_of(timestamp: int) -> str:
+    """Returns the UTC day (YYYY-MM-DD) an epoch timestamp falls on."""
+    return datetime.fromtimestamp(int(timestamp), tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class CommentArchive:
+    """
+    Encapsulates a Parquet archive of comments. Each write adds a new file to the partition, so
+    repeated archival runs for the same day never rewrite existing files.
+    """
+
+    def __init__(self, uri: str, endpoint_override: Optional[str] = None,
+                 compression: str = 'zstd'):
+        """
+        Args:
+            uri: The archive location, a local path or an s3:// URI.
+            endpoint_override: Endpoint of an S3-compatible service to use instead of AWS.
+            compression: The Parquet compression codec.
+        """
+        self.filesystem, self.base_path = resolve_filesystem(uri, endpoint_override)
+        self.compression = compression
+
+    def write_day(self, team_name: str, day: str, comments: Iterable[dict]) -> Optional[str]:
+        """
+        Writes a team's comments for a single day to a new Parquet file.
+
+        Args:
+            team_name: The team the comments belong to.
+            day: The UTC day of the comments, as YYYY-MM-DD.
+            comments: DynamoDB comment items.
+
+        Returns:
+            The path of the written file, or None if there were no comments.
+        """
+        rows = [self._prepare_row(comment) for comment in comments]
+        if not rows:
+            return None
+
+        table = pa.Table.from_pylist(rows, schema=ARCHIVE_SCHEMA).sort_by('timestamp')
+        directory = partition_path(self.base_path, team_name, day)
+        path = f'{directory}/part-{uuid.uuid4().hex}.parquet'
+        try:
+            self.filesystem.create_dir(directory, recursive=True)
+            pq.write_table(table, path, filesystem=self.filesystem,
+                           compression=self.compression)
+        except Exception as e:
+            logger.error("Couldn't write archive file %s: %s", path, e)
+            raise
+
+        logger.info("Archived %s comments for %s on %s to %s", len(rows), team_name, day, path)
+        return path
+
+    @staticmethod
+    def _prepare_row(comment: dict) -> dict:
+        """
+        Prepares an archive row from a DynamoDB comment item.
+
+        Args:
+            comment: A DynamoDB comment item.
+
+        Returns:
+            A dictionary matching ARCHIVE_SCHEMA.
+        """
+        return {
+            'id': comment['id'],
+            'name': comment.get('name'),
+            'author': comment.get('author'),
+            'body': comment.get('body'),
+            'upvotes': int(comment.get('upvotes', 0)),
+            'downvotes': int(comment.get('downvotes', 0)),
+            'timestamp': int(comment['timestamp']),
+            'subreddit': comment.get('subreddit'),
+            'sentiment_id': comment.get('sentiment_id'),
+            'sentiment_score': float(comment.get('sentiment_score', 0)),
+        }
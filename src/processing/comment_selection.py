@@ -0,0 +1,152 @@
+"""
+Selects the comments sent to the LLM for a summary. Near-duplicate comments are dropped using
+MinHash signatures of word shingles, the rest are ranked by upvotes and by how much they add to
+what has already been selected, and comments are packed in rank order until a token budget is
+spent. This bounds the size, and so the cost, of each summary request however busy a team is.
+"""
+
+import hashlib
+import heapq
+import math
+import re
+from collections import defaultdict
+from typing import Any, Iterable
+
+
+# Rough number of characters per token for English text with the OpenAI tokenizers.
+CHARS_PER_TOKEN = 4
+
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 32
+NUM_BANDS = 8
+# A Mersenne prime larger than any 32 bit shingle hash, for the MinHash permutations.
+_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [(int.from_bytes(hashlib.blake2b(f'a{i}'.encode(), digest_size=8).digest(),
+                                 'big') % _PRIME or 1,
+                  int.from_bytes(hashlib.blake2b(f'b{i}'.encode(), digest_size=8).digest(),
+                                 'big') % _PRIME)
+                 for i in range(NUM_PERMUTATIONS)]
+_WORD = re.compile(r'\w+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens in a text without calling a tokenizer."""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Shortens a text to roughly max_tokens tokens, cutting at a word boundary."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0] + '...'
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    """Returns the word shingles of a text, or the whole normalized text if it's shorter."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(shingle_set: set[str]) -> tuple[int, ...]:
+    """Returns the MinHash signature of a set of shingles."""
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), 'big')
+              for shingle in shingle_set]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def jaccard(first: set, second: set) -> float:
+    """Returns the Jaccard similarity of two sets."""
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+def drop_near_duplicates(texts: list[str], threshold: float = 0.7) -> list[int]:
+    """
+    Finds the texts that are not near-duplicates of an earlier text.
+
+    Candidate pairs are found by locality sensitive hashing of MinHash signatures, so that texts
+    are only compared with the few that share a band, then confirmed with their exact Jaccard
+    similarity.
+
+    Args:
+        texts: The texts to deduplicate, with the ones to prefer first.
+        threshold: The shingle Jaccard similarity at which two texts are duplicates.
+
+    Returns:
+        The indices of the texts kept, in order.
+    """
+    rows = NUM_PERMUTATIONS // NUM_BANDS
+    buckets = defaultdict(list)
+    shingle_sets = []
+    kept = []
+    for i, text in enumerate(texts):
+        shingle_set = shingles(text)
+        shingle_sets.append(shingle_set)
+        signature = minhash(shingle_set)
+        bands = [(band, signature[band * rows:(band + 1) * rows]) for band in range(NUM_BANDS)]
+        candidates = {j for band in bands for j in buckets[band]}
+        if any(jaccard(shingle_set, shingle_sets[j]) >= threshold for j in candidates):
+            continue
+        kept.append(i)
+        for band in bands:
+            buckets[band].append(i)
+    return kept
+
+
+def select_comments(comments: Iterable[dict[str, Any]], token_budget: int = 8000,
+                    max_comment_tokens: int = 300,
+                    similarity_threshold: float = 0.7) -> tuple[list[str], dict[str, int]]:
+    """
+    Selects the comment bodies to summarize.
+
+    Near-duplicates are dropped first, keeping the most upvoted copy. The remaining comments are
+    then picked greedily by upvotes weighted by novelty, the share of a comment's words that
+    aren't in any comment picked so far, so that a thread repeating one point doesn't crowd out
+    the others. Comments are added while they fit in the token budget.
+
+    Args:
+        comments: Comments with a body and, optionally, upvotes.
+        token_budget: The estimated number of tokens the selected bodies may add up to.
+        max_comment_tokens: Longer comments are truncated to this many tokens.
+        similarity_threshold: The shingle Jaccard similarity at which comments are duplicates.
+
+    Returns:
+        The selected bodies, best first, and the number of comments considered, dropped as
+        duplicates, dropped for the budget and kept, along with the tokens used.
+    """
+    comments = sorted((comment for comment in comments if comment.get('body', '').strip()),
+                      key=lambda comment: -int(comment.get('upvotes') or 0))
+    bodies = [truncate_to_tokens(comment['body'].strip(), max_comment_tokens)
+              for comment in comments]
+    unique = drop_near_duplicates(bodies, similarity_threshold)
+
+    words = {i: set(_WORD.findall(bodies[i].lower())) for i in unique}
+    weights = {i: math.log2(2 + max(int(comments[i].get('upvotes') or 0), 0)) for i in unique}
+    # Novelty only goes down as comments are picked, so a stale score is an upper bound and the
+    # heap can be updated lazily.
+    heap = [(-weights[i], i) for i in unique]
+    heapq.heapify(heap)
+    covered = set()
+    selected, tokens, over_budget = [], 0, 0
+    while heap:
+        _, i = heapq.heappop(heap)
+        novelty = len(words[i] - covered) / len(words[i]) if words[i] else 0.0
+        score = -weights[i] * novelty
+        if heap and score > heap[0][0] + 1e-9:
+            heapq.heappush(heap, (score, i))
+            continue
+        cost = estimate_tokens(bodies[i])
+        if tokens + cost > token_budget:
+            over_budget += 1
+            continue
+        selected.append(bodies[i])
+        covered |= words[i]
+        tokens += cost
+
+    stats = {'considered': len(comments), 'duplicates': len(comments) - len(unique),
+             'over_budget': over_budget, 'kept': len(selected), 'tokens': tokens}
+    return selected, stats
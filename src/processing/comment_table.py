@@ -2,11 +2,21 @@
 Defines a DynamoDB table containing Reddit comment data and methods to interact with that table.
 """
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from typing import Iterable, Iterator, Optional, Sequence
+from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 
+# Global secondary index keyed on (team_name, timestamp) so a team's comments can be read in
+# time order. See deployment_scripts/deploy_dynamodb.sh.
+TIME_INDEX_NAME = 'team_timestamp_index'
+
+# Attributes needed to chart sentiment over time.
+DEFAULT_RANGE_ATTRIBUTES = ('id', 'timestamp', 'sentiment_id', 'sentiment_score')
+
 class Comment:
     """
     Encapsulates a DynamoDB table of comment data.
@@ -64,6 +74,109 @@ class Comment:
                          err.response['Error']['Message'])
             raise
 
+    def delete_comments(self, items: Iterable[dict]) -> int:
+        """
+        Deletes comment records from the table.
+
+        Args:
+            items: Comment items, each containing at least the table's key attributes.
+
+        Returns:
+            The number of deleted records.
+        """
+        deleted = 0
+        try:
+            with self.table.batch_writer() as batch:
+                for item in items:
+                    batch.delete_item(Key={'team_name': item['team_name'],
+                                           'comment_id_timestamp': item['comment_id_timestamp']})
+                    deleted += 1
+        except ClientError as err:
+            logger.error("Couldn't delete comments from table: %s, %s",
+                         err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+        return deleted
+
+    def query_range(self, team_name: str, start_time: int, end_time: int,
+                    attributes: Optional[Sequence[str]] = DEFAULT_RANGE_ATTRIBUTES,
+                    segments: int = 1, page_size: Optional[int] = None) -> Iterator[dict]:
+        """
+        Yields the comments for a team whose timestamps fall in [start_time, end_time], oldest
+        first. Pages are followed until the window is exhausted.
+
+        Args:
+            team_name: The name of the team to query.
+            start_time: The start of the time window, in epoch seconds (inclusive).
+            end_time: The end of the time window, in epoch seconds (inclusive).
+            attributes: The attributes to return for each comment, or None for all of them.
+            segments: The number of equal time slices to split the window into. Slices are
+                read in parallel but yielded in time order.
+            page_size: The maximum number of items to read per request.
+
+        Yields:
+            A dictionary for each comment in the window.
+        """
+        slices = self._split_range(int(start_time), int(end_time), segments)
+        if len(slices) <= 1:
+            for lower, upper in slices:
+                yield from self._query_slice(team_name, lower, upper, attributes, page_size)
+            return
+
+        def read_slice(bounds: tuple[int, int]) -> list[dict]:
+            return list(self._query_slice(team_name, *bounds, attributes, page_size))
+
+        with ThreadPoolExecutor(max_workers=len(slices)) as executor:
+            for items in executor.map(read_slice, slices):
+                yield from items
+
+    def _query_slice(self, team_name: str, lower: int, upper: int,
+                     attributes: Optional[Sequence[str]],
+                     page_size: Optional[int]) -> Iterator[dict]:
+        """
+        Yields the comments for a single time slice, following pagination.
+
+        The low-level client is used rather than the Table resource because resources are not
+        safe to share between threads.
+        """
+        params = {
+            'TableName': self.table.name,
+            'IndexName': TIME_INDEX_NAME,
+            'KeyConditionExpression': (Key('team_name').eq(team_name) &
+                                       Key('timestamp').between(lower, upper)),
+        }
+        if attributes:
+            # Attribute names such as 'timestamp' and 'name' are reserved words in DynamoDB.
+            names = {f'#a{i}': attribute for i, attribute in enumerate(attributes)}
+            params['ProjectionExpression'] = ', '.join(names)
+            params['ExpressionAttributeNames'] = names
+        if page_size:
+            params['Limit'] = page_size
+
+        client = self.table.meta.client
+        try:
+            while True:
+                response = client.query(**params)
+                yield from response['Items']
+                if 'LastEvaluatedKey' not in response:
+                    break
+                params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except ClientError as err:
+            logger.error("Couldn't query comments for %s: %s, %s", team_name,
+                         err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+
+    @staticmethod
+    def _split_range(start_time: int, end_time: int, segments: int) -> list[tuple[int, int]]:
+        """
+        Splits an inclusive time window into at most `segments` contiguous inclusive slices.
+        """
+        if end_time < start_time:
+            return []
+        segments = max(1, min(segments, end_time - start_time + 1))
+        step = (end_time - start_time + 1) // segments
+        bounds = [start_time + i * step for i in range(segments)] + [end_time + 1]
+        return [(bounds[i], bounds[i + 1] - 1) for i in range(segments)]
+
     def _prepare_item(self, data: dict) -> dict:
         """
         Prepares a DynamoDB item from the provided data.
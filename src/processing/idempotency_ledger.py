@@ -0,0 +1,199 @@
+"""
+Defines a DynamoDB ledger of processed comments, used to make Kinesis record processing
+idempotent when Lambda retries a batch.
+"""
+import logging
+import time
+from typing import Optional
+from cachetools import TTLCache
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = 'IN_PROGRESS'
+COMPLETED = 'COMPLETED'
+
+
+class IdempotencyLedger:
+    """
+    Encapsulates a DynamoDB table with one item per (team, comment id) that has been claimed for
+    processing. Claims are made with conditional writes, so only one invocation runs inference
+    for a comment. Items expire through the table's TTL attribute.
+
+    Completed keys are also remembered in memory, so retries that land on the same warm
+    container are skipped without a round trip to DynamoDB. The expiry of each claim held is
+    remembered too, so that a claim that expired and was taken over by another attempt is
+    neither completed nor released by the attempt that lost it.
+    """
+
+    def __init__(self,
+                 dyn_resource,
+                 in_progress_seconds: int = 300,
+                 ttl_seconds: int = 86400,
+                 local_cache_size: int = 10000):
+        """
+        Args:
+            dyn_resource: A Boto3 DynamoDB resource.
+            in_progress_seconds: How long a claim blocks other invocations before it is treated
+                as abandoned (e.g. the claiming invocation timed out).
+            ttl_seconds: How long ledger items are kept before DynamoDB expires them.
+            local_cache_size: The number of completed keys remembered in memory.
+        """
+
+        self.dyn_resource = dyn_resource
+        self.in_progress_seconds = in_progress_seconds
+        self.ttl_seconds = ttl_seconds
+        self.table = None # Table variable is set during call to exists.
+        self._completed = TTLCache(maxsize=local_cache_size, ttl=ttl_seconds)
+        self._claims: dict[str, int] = {}  # The expiry of each claim held, until it's resolved.
+
+
+    def exists(self, table_name: str) -> bool:
+        """
+        Determines whether or not a table exists. If the table exists, stores it as instance
+        variable defining table to be used.
+
+        Args:
+            table_name: The name of the table to check.
+
+        Returns:
+            True when the table exists, False otherwise.
+        """
+
+        try:
+            table = self.dyn_resource.Table(table_name)
+            table.load()
+            self.table = table
+            return True
+        except ClientError as err:
+            error_code = err.response["Error"]["Code"]
+            if error_code == "ResourceNotFoundException":
+                return False
+            logger.error("Couldn't check for existence of table: %s, %s", error_code,
+                            err.response['Error']['Message'])
+            raise
+
+    @staticmethod
+    def ledger_key(team_name: str, comment_id: str) -> str:
+        """Returns the ledger key for a comment. Comments are processed once per team."""
+        return f'{team_name}#{comment_id}'
+
+    def claim(self, team_name: str, comment_id: str) -> bool:
+        """
+        Claims a comment for processing.
+
+        Args:
+            team_name: The team the comment was streamed for.
+            comment_id: The Reddit comment id.
+
+        Returns:
+            True if the caller should process the comment, False if it has already been
+            processed.
+
+        Raises:
+            RuntimeError: If another attempt holds a live claim on the comment. Its outcome
+                isn't known yet, so the batch should fail and be retried once the claim is
+                completed or has expired, rather than skip a comment that may never be stored.
+        """
+        key = self.ledger_key(team_name, comment_id)
+        if key in self._completed:
+            return False
+
+        now = int(time.time())
+        try:
+            self.table.put_item(
+                Item={
+                    'ledger_key': key,
+                    'status': IN_PROGRESS,
+                    'in_progress_expiry': now + self.in_progress_seconds,
+                    'expires_at': now + self.ttl_seconds
+                },
+                ConditionExpression=('attribute_not_exists(ledger_key) OR '
+                                     '(#status = :in_progress AND in_progress_expiry < :now)'),
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':in_progress': IN_PROGRESS, ':now': now},
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+            self._claims[key] = now + self.in_progress_seconds
+            return True
+        except ClientError as err:
+            if err.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                if err.response.get('Item', {}).get('status', {}).get('S') == COMPLETED:
+                    self._completed[key] = True
+                    return False
+                logger.error("Comment %s is being processed by another attempt.", key)
+                raise RuntimeError(f"Comment {key} is being processed by another attempt.")
+            logger.error("Couldn't claim %s in ledger: %s, %s", key,
+                         err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+
+    def _claim_condition(self, key: str) -> dict:
+        """
+        Returns the condition that a comment is still claimed by this ledger, and not by an
+        attempt that took the claim over after it expired.
+        """
+        condition = {
+            'ConditionExpression': '#status = :in_progress',
+            'ExpressionAttributeNames': {'#status': 'status'},
+            'ExpressionAttributeValues': {':in_progress': IN_PROGRESS}
+        }
+        if key in self._claims:
+            condition['ConditionExpression'] += ' AND in_progress_expiry = :claim_expiry'
+            condition['ExpressionAttributeValues'][':claim_expiry'] = self._claims[key]
+        return condition
+
+    def complete(self, team_name: str, comment_id: str,
+                 transact_items: Optional[list[dict]] = None) -> None:
+        """
+        Marks a claimed comment as processed. Other writes the comment's processing makes, such
+        as adding to the sentiment rollups, can be made in the same transaction, so that they
+        are made exactly once: if the claim is no longer held by this ledger, none is made.
+
+        Args:
+            team_name: The team the comment was streamed for.
+            comment_id: The Reddit comment id.
+            transact_items: Items of a DynamoDB transaction to write along with the
+                completion.
+        """
+        key = self.ledger_key(team_name, comment_id)
+        update = {
+            'Key': {'ledger_key': key},
+            'UpdateExpression': 'SET #status = :completed, expires_at = :expires_at',
+            'ExpressionAttributeNames': {'#status': 'status'},
+            'ExpressionAttributeValues': {':completed': COMPLETED,
+                                          ':expires_at': int(time.time()) + self.ttl_seconds}
+        }
+        try:
+            if transact_items:
+                condition = self._claim_condition(key)
+                update['ConditionExpression'] = condition['ConditionExpression']
+                update['ExpressionAttributeValues'].update(condition['ExpressionAttributeValues'])
+                self.table.meta.client.transact_write_items(
+                    TransactItems=transact_items + [{'Update': {'TableName': self.table.name,
+                                                                **update}}])
+            else:
+                self.table.update_item(**update)
+        except ClientError as err:
+            logger.error("Couldn't complete %s in ledger: %s, %s", key,
+                         err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+        self._claims.pop(key, None)
+        self._completed[key] = True
+
+    def release(self, team_name: str, comment_id: str) -> None:
+        """
+        Removes an in-progress claim after a failure, so a retry can process the comment.
+
+        Args:
+            team_name: The team the comment was streamed for.
+            comment_id: The Reddit comment id.
+        """
+        key = self.ledger_key(team_name, comment_id)
+        try:
+            self.table.delete_item(Key={'ledger_key': key}, **self._claim_condition(key))
+        except ClientError as err:
+            if err.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.error("Couldn't release %s in ledger: %s, %s", key,
+                             err.response['Error']['Code'], err.response['Error']['Message'])
+                raise
+        self._claims.pop(key, None)
@@ -5,30 +5,57 @@ import json
 import os
 from typing import Any, Optional
 import base64
-import boto3
 from comment_table import Comment
+from rollup_table import SentimentRollup
+from idempotency_ledger import IdempotencyLedger
+from lambda_resources import REGISTRY, get_client, get_resource
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-def initialize_resources(sagemaker_runtime=None, comment_table=None, endpoint_name=None) -> tuple:
-    """Initializes the required AWS resources if not provided."""
+
+def _load_table(table, env_var: str):
+    """Points a table wrapper at the table named by an environment variable."""
+    if not table.exists(os.getenv(env_var)):
+        raise RuntimeError(f"DynamoDB table {os.getenv(env_var)} does not exist.")
+    return table
+
+def initialize_resources(sagemaker_runtime=None, comment_table=None, endpoint_name=None,
+                         rollup_table=None, ledger=None) -> tuple:
+    """
+    Initializes the required AWS resources if not provided. The rollup table and idempotency
+    ledger are optional and are only created when ROLLUP_TABLE_NAME and IDEMPOTENCY_TABLE_NAME
+    are set.
+
+    Resources are created once per container and reused by warm invocations, which also keeps
+    the ledger's in-memory record of completed comments between invocations.
+    """
     if sagemaker_runtime is None:
-        sagemaker_runtime = boto3.client('sagemaker-runtime', region_name=os.getenv('AWS_REGION'))
+        sagemaker_runtime = get_client('sagemaker-runtime', region_name=os.getenv('AWS_REGION'))
     if comment_table is None:
-        dyn_resource = boto3.resource('dynamodb')
-        comment_table = Comment(dyn_resource=dyn_resource)
-        if not comment_table.exists(os.getenv('DYNAMODB_TABLE_NAME')):
-            raise RuntimeError(f"DynamoDB table {os.getenv('DYNAMODB_TABLE_NAME')} does not exist.")
+        comment_table = REGISTRY.get('comment_table', lambda: _load_table(
+            Comment(dyn_resource=get_resource('dynamodb')), 'DYNAMODB_TABLE_NAME'))
     if endpoint_name is None:
         endpoint_name = os.getenv('SAGEMAKER_ENDPOINT_NAME')
+    if rollup_table is None and os.getenv('ROLLUP_TABLE_NAME'):
+        rollup_table = REGISTRY.get('rollup_table', lambda: _load_table(
+            SentimentRollup(dyn_resource=get_resource('dynamodb')), 'ROLLUP_TABLE_NAME'))
+    if ledger is None and os.getenv('IDEMPOTENCY_TABLE_NAME'):
+        ledger = REGISTRY.get('ledger', lambda: _load_table(
+            IdempotencyLedger(dyn_resource=get_resource('dynamodb')), 'IDEMPOTENCY_TABLE_NAME'))
 
-    return sagemaker_runtime, comment_table, endpoint_name
+    return sagemaker_runtime, comment_table, endpoint_name, rollup_table, ledger
 
 
 def process_record(record: dict[str, Any], sagemaker_runtime, comment_table,
-                    endpoint_name: str) -> None:
-    """Processes a single Kinesis record."""
+                    endpoint_name: str, rollup_table=None, ledger=None) -> bool:
+    """
+    Processes a single Kinesis record.
+
+    Returns:
+        True if the record was processed, False if the ledger shows it was already handled.
+    """
+    claimed = False
     try:
         logger.info("Processing Kinesis Event - EventID: %s", record['eventID'])
 
@@ -38,6 +65,14 @@ def process_record(record: dict[str, Any], sagemaker_runtime, comment_table,
         # Load the decoded JSON data
         record_data = json.loads(decoded_data)
 
+        # Skip comments handled by an earlier attempt at this batch
+        if ledger is not None:
+            if not ledger.claim(record_data['team'], record_data['id']):
+                logger.info("Skipping already processed comment %s for %s.", record_data['id'],
+                            record_data['team'])
+                return False
+            claimed = True
+
         # Analyze and store body sentiment
         response = sagemaker_runtime.invoke_endpoint(
             EndpointName=endpoint_name,
@@ -52,22 +87,57 @@ def process_record(record: dict[str, Any], sagemaker_runtime, comment_table,
 
         comment_table.add_comment(data=record_data)
 
+        if claimed:
+            # The rollup is added to in the same transaction that completes the claim, so a
+            # comment is counted once even if its claim expires and a retry takes it over.
+            rollup_items = None
+            if rollup_table is not None:
+                rollup_items = [rollup_table.increment_item(team_name=record_data['team'],
+                                                            timestamp=record_data['timestamp'],
+                                                            sentiment_id=record_data['label'])]
+            ledger.complete(record_data['team'], record_data['id'], rollup_items)
+        elif rollup_table is not None:
+            rollup_table.increment(team_name=record_data['team'],
+                                   timestamp=record_data['timestamp'],
+                                   sentiment_id=record_data['label'])
+        return True
+
     except Exception as e:
         logger.error("An error occurred while processing the record: %s", e)
+        if claimed:
+            try:
+                ledger.release(record_data['team'], record_data['id'])
+            except Exception as release_error:
+                logger.error("Couldn't release ledger claim: %s", release_error)
         raise
 
 def lambda_handler(event: dict[str, Any], context: dict[str, Any], sagemaker_runtime=None,
-                    comment_table=None, endpoint_name: Optional[str] = None) -> None:
+                    comment_table=None, endpoint_name: Optional[str] = None,
+                    rollup_table=None, ledger=None) -> dict[str, int]:
     """
     Lambda function that calls a SageMaker endpoint and adds records to DynamoDB
-    when new records are added to a Kinesis stream.
+    when new records are added to a Kinesis stream. When a rollup table is configured the
+    per-team sentiment counters are updated as well, and when an idempotency ledger is
+    configured records handled by an earlier attempt are skipped before inference.
+
+    Returns:
+        The number of records processed and skipped.
     """
-    # Initialize AWS services
-    sagemaker_runtime, comment_table, endpoint_name = initialize_resources(
-        sagemaker_runtime, comment_table, endpoint_name
-    )
-
-    # Process each record in the event
-    for record in event['Records']:
-        process_record(record, sagemaker_runtime, comment_table, endpoint_name)
-    logger.info("Successfully processed %s records.", len(event['Records']))
+    with REGISTRY.invocation():
+        # Initialize AWS services
+        sagemaker_runtime, comment_table, endpoint_name, rollup_table, ledger = (
+            initialize_resources(sagemaker_runtime, comment_table, endpoint_name, rollup_table,
+                                 ledger)
+        )
+
+        # Process each record in the event
+        processed = skipped = 0
+        for record in event['Records']:
+            if process_record(record, sagemaker_runtime, comment_table, endpoint_name,
+                              rollup_table, ledger):
+                processed += 1
+            else:
+                skipped += 1
+    logger.info("Successfully processed %s records, skipped %s already processed records.",
+                processed, skipped)
+    return {'processed': processed, 'skipped': skipped}
@@ -0,0 +1,192 @@
+"""
+Defines a registry of clients shared by the Lambda functions. Resources are created once per
+container and reused by warm invocations instead of being rebuilt on every event.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Callable, Hashable, Iterator, Optional, Tuple, Union
+import os
+import logging
+import threading
+import time
+from urllib.parse import ParseResult, urlencode, urlunparse
+import boto3
+import redis
+import botocore.session
+from botocore.model import ServiceId
+from botocore.signers import RequestSigner
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Generated IAM tokens are valid for 15 minutes. They are refreshed this many seconds before they
+# expire, so new connections never authenticate with a token that is about to lapse.
+TOKEN_TTL_SECONDS = 900
+TOKEN_REFRESH_MARGIN_SECONDS = 120
+
+
+class ElastiCacheIAMProvider(redis.CredentialProvider):
+    """Class which acts as a wrapper for elasticache IAM operations."""
+    def __init__(self, user, cache_name, is_serverless=True, region="us-west-1",
+                 refresh_margin=TOKEN_REFRESH_MARGIN_SECONDS):
+        self.user = user
+        self.cache_name = cache_name
+        self.is_serverless = is_serverless
+        self.region = region
+        self.refresh_margin = refresh_margin
+
+        session = REGISTRY.get('botocore_session', botocore.session.get_session)
+        self.request_signer = RequestSigner(
+            ServiceId("elasticache"),
+            self.region,
+            "elasticache",
+            "v4",
+            session.get_credentials(),
+            session.get_component("event_emitter"),
+        )
+        self._credentials = None
+        self._issued_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_credentials(self) -> Union[Tuple[str], Tuple[str, str]]:
+        """Returns the cached IAM token, generating a new one when it is close to expiring."""
+        with self._lock:
+            age = time.monotonic() - self._issued_at
+            if self._credentials is None or age >= TOKEN_TTL_SECONDS - self.refresh_margin:
+                self._credentials = self._generate_credentials()
+                self._issued_at = time.monotonic()
+                logger.info("Generated ElastiCache IAM token for %s.", self.user)
+            return self._credentials
+
+    def _generate_credentials(self) -> Tuple[str, str]:
+        """Signs a new IAM authentication token."""
+        query_params = {"Action": "connect", "User": self.user}
+        if self.is_serverless:
+            query_params["ResourceType"] = "ServerlessCache"
+        url = urlunparse(
+            ParseResult(
+                scheme="https",
+                netloc=self.cache_name,
+                path="/",
+                query=urlencode(query_params),
+                params="",
+                fragment="",
+            )
+        )
+        signed_url = self.request_signer.generate_presigned_url(
+            {"method": "GET", "url": url, "body": {}, "headers": {}, "context": {}},
+            operation_name="connect",
+            expires_in=TOKEN_TTL_SECONDS,
+            region_name=self.region,
+        )
+        # RequestSigner only seems to work if the URL has a protocol, but
+        # Elasticache only accepts the URL without a protocol
+        # So strip it off the signed URL before returning
+        return (self.user, signed_url.removeprefix("https://"))
+
+
+class ResourceRegistry:
+    """
+    Holds resources for the lifetime of a Lambda container and times their creation, so cold
+    and warm starts can be told apart in the logs.
+    """
+
+    def __init__(self):
+        self._resources: dict[Hashable, Any] = {}
+        self._lock = threading.RLock()
+        self.invocations = 0
+        self.last_timings: dict[str, Any] = {}
+        self._init_seconds = 0.0
+
+    def get(self, name: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Returns the named resource, creating it with `factory` the first time it is requested.
+
+        Args:
+            name: The key of the resource.
+            factory: A callable that creates the resource.
+
+        Returns:
+            The shared resource.
+        """
+        try:
+            return self._resources[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._resources:
+                start = time.perf_counter()
+                self._resources[name] = factory()
+                elapsed = time.perf_counter() - start
+                self._init_seconds += elapsed
+                logger.info("Created %s in %.1f ms.", name, elapsed * 1000)
+            return self._resources[name]
+
+    def reset(self, name: Optional[Hashable] = None) -> None:
+        """
+        Drops a resource, or all resources, so they are recreated on next use. Used when a
+        connection is found to be broken.
+        """
+        with self._lock:
+            if name is None:
+                self._resources.clear()
+            else:
+                self._resources.pop(name, None)
+
+    @contextmanager
+    def invocation(self) -> Iterator[None]:
+        """Times a Lambda invocation and logs whether it ran on a cold or a warm container."""
+        cold_start = self.invocations == 0
+        self.invocations += 1
+        self._init_seconds = 0.0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.last_timings = {
+                'cold_start': cold_start,
+                'init_ms': round(self._init_seconds * 1000, 1),
+                'total_ms': round((time.perf_counter() - start) * 1000, 1),
+            }
+            logger.info("%s start: invocation took %s ms, %s ms spent creating resources.",
+                        'Cold' if cold_start else 'Warm', self.last_timings['total_ms'],
+                        self.last_timings['init_ms'])
+
+
+REGISTRY = ResourceRegistry()
+
+
+def get_client(service_name: str, **kwargs) -> Any:
+    """Returns a shared Boto3 client for the given service."""
+    key = ('client', service_name, tuple(sorted(kwargs.items())))
+    return REGISTRY.get(key, lambda: boto3.client(service_name, **kwargs))
+
+
+def get_resource(service_name: str, **kwargs) -> Any:
+    """Returns a shared Boto3 resource for the given service."""
+    key = ('resource', service_name, tuple(sorted(kwargs.items())))
+    return REGISTRY.get(key, lambda: boto3.resource(service_name, **kwargs))
+
+
+def get_redis_client(is_serverless: bool) -> redis.Redis:
+    """
+    Returns a shared Redis client for the ElastiCache cluster configured in the environment.
+    The connection is checked with a ping once, when it is created.
+    """
+    def create_redis_client() -> redis.Redis:
+        creds_provider = ElastiCacheIAMProvider(user=os.getenv('ELASTICACHE_USERNAME'),
+                                                cache_name=os.getenv('CACHE_NAME'),
+                                                is_serverless=is_serverless)
+        redis_client = redis.Redis(host=os.getenv('ELASTICACHE_ENDPOINT'), port=6379,
+                                   credential_provider=creds_provider, ssl=True,
+                                   ssl_cert_reqs="none", health_check_interval=30)
+        logger.info("ping result: %s", redis_client.ping())
+        return redis_client
+
+    return REGISTRY.get(('redis', is_serverless), create_redis_client)
+
+
+def reset_redis_client(is_serverless: bool) -> None:
+    """Drops the shared Redis client so the next invocation reconnects."""
+    REGISTRY.reset(('redis', is_serverless))
@@ -0,0 +1,169 @@
+"""
+Dispatches LLM calls from the summarizer without overrunning the provider's rate limits. Calls
+wait on token buckets for requests and tokens per minute, failed calls that are worth retrying
+are retried with jittered exponential backoff that honours any Retry-After the provider sends,
+and work stops in time for the Lambda to return before its deadline.
+"""
+
+import asyncio
+import os
+import logging
+import random
+import time
+from typing import Any, Optional
+from comment_selection import estimate_tokens
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors.
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Errors without a status that are worth retrying, by class name so the provider SDK needn't be
+# imported here.
+RETRYABLE_ERRORS = {'APIConnectionError', 'APITimeoutError', 'RateLimitError',
+                    'InternalServerError'}
+
+
+class TokenBucket:
+    """
+    An asyncio token bucket. Up to `capacity` tokens can be spent at once, and tokens are
+    refilled at `rate` per second. Waiters are served in order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Waits until `amount` tokens are available, then spends them."""
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class Deadline:
+    """
+    The time by which work must stop, taken from a Lambda context's remaining time less a
+    safety margin. Without a context there is no deadline.
+    """
+
+    def __init__(self, context: Any = None, margin_seconds: float = 10.0):
+        get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+        self.expires_at = (time.monotonic() + get_remaining() / 1000 - margin_seconds
+                           if get_remaining is not None else None)
+
+    def remaining(self) -> Optional[float]:
+        """Returns the seconds left, or None if there is no deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Returns whether a failed LLM call is worth retrying."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return (isinstance(error, (asyncio.TimeoutError, ConnectionError)) or
+            type(error).__name__ in RETRYABLE_ERRORS)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Returns the delay the provider asked for in a Retry-After header, if any."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms') is not None:
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after') is not None:
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class LLMDispatcher:
+    """
+    Makes rate limited, retried LLM calls.
+
+    Args:
+        requests_per_minute: The sustained rate of calls.
+        tokens_per_minute: The sustained rate of prompt tokens, estimated locally.
+        max_attempts: The number of times a call is tried before its error is raised.
+        base_delay: The backoff before the first retry, in seconds; it doubles with each
+            attempt, and a random delay up to it is used.
+        max_delay: The longest backoff, in seconds.
+        max_concurrency: The maximum number of calls in flight at once.
+        deadline: Retries that would end after this deadline aren't attempted.
+    """
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 200000,
+                 max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 30.0,
+                 max_concurrency: int = 8, deadline: Optional[Deadline] = None):
+        self.requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60))
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 6)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.deadline = deadline if deadline is not None else Deadline()
+
+    @classmethod
+    def from_env(cls, deadline: Optional[Deadline] = None) -> 'LLMDispatcher':
+        """Builds a dispatcher from LLM_* environment variables, using defaults if unset."""
+        return cls(
+            requests_per_minute=float(os.getenv('LLM_REQUESTS_PER_MINUTE', '500')),
+            tokens_per_minute=float(os.getenv('LLM_TOKENS_PER_MINUTE', '200000')),
+            max_attempts=int(os.getenv('LLM_MAX_ATTEMPTS', '5')),
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '8')),
+            deadline=deadline
+        )
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """Returns the delay before retrying after a failed attempt, counting from 0."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = retry_after_seconds(error)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    async def invoke(self, chain, inputs: dict[str, Any]) -> str:
+        """
+        Invokes a chain once the rate limits allow, retrying errors that are worth retrying.
+
+        Args:
+            chain: The chain to invoke.
+            inputs: The chain's inputs.
+
+        Returns:
+            The chain's output.
+        """
+        cost = sum(estimate_tokens(str(value)) for value in inputs.values())
+        for attempt in range(self.max_attempts):
+            await self.requests.acquire()
+            await self.tokens.acquire(cost)
+            try:
+                async with self.semaphore:
+                    return await chain.ainvoke(inputs)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_attempts - 1:
+                    raise
+                delay = self.backoff(attempt, e)
+                remaining = self.deadline.remaining()
+                if remaining is not None and delay >= remaining:
+                    raise
+                logger.warning("LLM call failed (%s), retrying in %.1fs.", e, delay)
+                await asyncio.sleep(delay)
+        raise RuntimeError('No attempts were made.')
@@ -0,0 +1,145 @@
+"""
+Summarizes large groups of comments with a map-reduce over an LLM chain. The comments are split
+into chunks that each fit a token budget, the chunks are summarized concurrently, and the partial
+summaries are merged, in as many rounds as needed, into one final ranked topic list.
+"""
+
+import asyncio
+import os
+import logging
+from typing import Any, Awaitable, Callable, Optional
+from comment_selection import estimate_tokens
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class MapReducePolicy:
+    """
+    Limits on a map-reduce summary.
+
+    Args:
+        chunk_tokens: The estimated number of tokens of comments sent in one map call, and of
+            partial summaries merged in one reduce call. Inputs that fit in one chunk are
+            summarized with a single call.
+        max_chunks: The maximum number of map calls. Comments are expected best first, so the
+            comments beyond the last chunk are dropped.
+        max_depth: The maximum number of intermediate rounds merging partial summaries before
+            the final reduce, however large they still are.
+        max_concurrency: The maximum number of LLM calls in flight at once.
+    """
+
+    def __init__(self, chunk_tokens: int = 4000, max_chunks: int = 16, max_depth: int = 2,
+                 max_concurrency: int = 4):
+        self.chunk_tokens = chunk_tokens
+        self.max_chunks = max_chunks
+        self.max_depth = max_depth
+        self.max_concurrency = max_concurrency
+
+    @classmethod
+    def from_env(cls) -> 'MapReducePolicy':
+        """Builds a policy from SUMMARY_* environment variables, using defaults if unset."""
+        defaults = cls()
+        return cls(
+            chunk_tokens=int(os.getenv('SUMMARY_CHUNK_TOKENS', defaults.chunk_tokens)),
+            max_chunks=int(os.getenv('SUMMARY_MAX_CHUNKS', defaults.max_chunks)),
+            max_depth=int(os.getenv('SUMMARY_MAX_DEPTH', defaults.max_depth)),
+            max_concurrency=int(os.getenv('SUMMARY_MAX_CONCURRENCY', defaults.max_concurrency))
+        )
+
+    @property
+    def token_budget(self) -> int:
+        """The estimated number of tokens of comments that can be summarized."""
+        return self.chunk_tokens * self.max_chunks
+
+
+def chunk_texts(texts: list[str], chunk_tokens: int) -> list[list[str]]:
+    """
+    Splits texts, in order, into chunks whose estimated token counts fit chunk_tokens. A text
+    larger than chunk_tokens on its own gets a chunk to itself.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+Invoker = Callable[[Any, dict[str, Any]], Awaitable[str]]
+
+
+async def _ainvoke(chain, inputs: dict[str, Any]) -> str:
+    """Invokes a chain directly."""
+    return await chain.ainvoke(inputs)
+
+
+async def _run_batch(chain, inputs: list[dict[str, Any]], policy: MapReducePolicy,
+                     invoke: Invoker) -> list[str]:
+    """Invokes a chain on each input concurrently, dropping the calls that fail."""
+    semaphore = asyncio.Semaphore(policy.max_concurrency)
+
+    async def run(chain_input: dict[str, Any]) -> str:
+        async with semaphore:
+            return await invoke(chain, chain_input)
+
+    results = await asyncio.gather(*[run(chain_input) for chain_input in inputs],
+                                   return_exceptions=True)
+    summaries = []
+    for result in results:
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, Exception):
+            logger.error("Dropping a partial summary that failed: %s", result)
+        else:
+            summaries.append(result.strip())
+    if not summaries:
+        raise RuntimeError(f'All {len(inputs)} partial summaries failed.')
+    return summaries
+
+
+async def map_reduce_summarize(texts: list[str], map_chain, reduce_chain,
+                               policy: MapReducePolicy, invoke: Optional[Invoker] = None) -> str:
+    """
+    Summarizes texts with a map-reduce.
+
+    Args:
+        texts: The comments to summarize, best first.
+        map_chain: The chain summarizing a chunk of comments, taking a `comment` input.
+        reduce_chain: The chain merging partial summaries, taking a `summaries` input.
+        policy: The limits on the map-reduce.
+        invoke: Makes each call, given a chain and its inputs, such as a rate limited
+            dispatcher. The chain is invoked directly if not given.
+
+    Returns:
+        The final summary, or an empty string if there are no texts to summarize.
+    """
+    if not texts:
+        return ''
+    invoke = invoke if invoke is not None else _ainvoke
+    chunks = chunk_texts(texts, policy.chunk_tokens)
+    if len(chunks) == 1:
+        return (await invoke(map_chain, {'comment': '\n'.join(chunks[0])})).strip()
+    if len(chunks) > policy.max_chunks:
+        logger.info("Dropping %s of %s chunks beyond the limit.", len(chunks) - policy.max_chunks,
+                    len(chunks))
+        chunks = chunks[:policy.max_chunks]
+
+    summaries = await _run_batch(map_chain, [{'comment': '\n'.join(chunk)} for chunk in chunks],
+                                 policy, invoke)
+    depth = 0
+    while (depth < policy.max_depth and len(summaries) > 1 and
+           sum(estimate_tokens(summary) for summary in summaries) > policy.chunk_tokens):
+        groups = chunk_texts(summaries, policy.chunk_tokens)
+        summaries = await _run_batch(reduce_chain, [{'summaries': '\n\n'.join(group)}
+                                                    for group in groups], policy, invoke)
+        depth += 1
+    logger.info("Merging %s partial summaries from %s chunks after %s intermediate rounds.",
+                len(summaries), len(chunks), depth)
+    return (await invoke(reduce_chain, {'summaries': '\n\n'.join(summaries)})).strip()
@@ -0,0 +1,162 @@
+"""
+Defines a DynamoDB table of per-team sentiment counts in fixed time buckets and methods to
+interact with that table.
+"""
+import logging
+from typing import Optional
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# Width of each rollup bucket in seconds; matches the 10 minute buckets charted by the dashboard.
+BUCKET_SECONDS = 600
+
+SENTIMENTS = ('positive', 'negative', 'neutral')
+
+
+class SentimentRollup:
+    """
+    Encapsulates a DynamoDB table holding one item per (team, time bucket), with a counter
+    attribute per sentiment label plus a total comment count.
+    """
+
+    def __init__(self,
+                 dyn_resource,
+                 bucket_seconds: int = BUCKET_SECONDS):
+        """
+        Args:
+            dyn_resource: A Boto3 DynamoDB resource.
+            bucket_seconds: Width of each rollup bucket in seconds.
+        """
+
+        self.dyn_resource = dyn_resource
+        self.bucket_seconds = bucket_seconds
+        self.table = None # Table variable is set during call to exists.
+
+
+    def exists(self, table_name: str) -> bool:
+        """
+        Determines whether or not a table exists. If the table exists, stores it as instance
+        variable defining table to be used.
+
+        Args:
+            table_name: The name of the table to check.
+
+        Returns:
+            True when the table exists, False otherwise.
+        """
+
+        try:
+            table = self.dyn_resource.Table(table_name)
+            table.load()
+            self.table = table
+            return True
+        except ClientError as err:
+            error_code = err.response["Error"]["Code"]
+            if error_code == "ResourceNotFoundException":
+                return False
+            logger.error("Couldn't check for existence of table: %s, %s", error_code,
+                            err.response['Error']['Message'])
+            raise
+
+    def bucket_for(self, timestamp: float) -> int:
+        """Returns the start of the bucket containing the given epoch timestamp."""
+        timestamp = int(timestamp)
+        return timestamp - timestamp % self.bucket_seconds
+
+    def _increment_params(self, team_name: str, timestamp: float, sentiment_id: str,
+                          count: int) -> dict:
+        """Returns the parameters of the update that adds to a comment's counters."""
+        return {
+            'Key': {'team_name': team_name, 'bucket_timestamp': self.bucket_for(timestamp)},
+            'UpdateExpression': 'ADD #sentiment :count, #total :count',
+            'ExpressionAttributeNames': {'#sentiment': sentiment_id, '#total': 'comment_count'},
+            'ExpressionAttributeValues': {':count': count}
+        }
+
+    def increment(self, team_name: str, timestamp: float, sentiment_id: str,
+                  count: int = 1) -> None:
+        """
+        Atomically adds to the counters for the bucket containing a comment. The item is
+        created on first write, so concurrent writers never overwrite each other's counts.
+
+        Args:
+            team_name: The team the comment belongs to.
+            timestamp: The comment timestamp, in epoch seconds.
+            sentiment_id: The sentiment label of the comment.
+            count: The amount to add to the counters.
+        """
+        try:
+            self.table.update_item(**self._increment_params(team_name, timestamp, sentiment_id,
+                                                            count))
+        except ClientError as err:
+            logger.error("Couldn't update rollup for %s: %s, %s", team_name,
+                         err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+
+    def increment_item(self, team_name: str, timestamp: float, sentiment_id: str,
+                       count: int = 1) -> dict:
+        """
+        Returns the update made by increment as an item of a DynamoDB transaction, so that the
+        counters can be added to together with other writes. Values are plain Python, as taken
+        by the client of a Boto3 resource.
+
+        Args:
+            team_name: The team the comment belongs to.
+            timestamp: The comment timestamp, in epoch seconds.
+            sentiment_id: The sentiment label of the comment.
+            count: The amount to add to the counters.
+
+        Returns:
+            The Update item, for transact_write_items.
+        """
+        return {'Update': {'TableName': self.table.name,
+                           **self._increment_params(team_name, timestamp, sentiment_id, count)}}
+
+    def query_rollups(self, team_name: str, start_time: float, end_time: float,
+                      page_size: Optional[int] = None) -> list[dict]:
+        """
+        Returns the rollups for a team whose buckets overlap [start_time, end_time], oldest
+        first.
+
+        Args:
+            team_name: The name of the team to query.
+            start_time: The start of the time window, in epoch seconds.
+            end_time: The end of the time window, in epoch seconds.
+            page_size: The maximum number of items to read per request.
+
+        Returns:
+            A list of dictionaries with the bucket start, a count for every sentiment label and
+            the total comment count.
+        """
+        params = {
+            'KeyConditionExpression': (Key('team_name').eq(team_name) &
+                                       Key('bucket_timestamp').between(
+                                           self.bucket_for(start_time), int(end_time)))
+        }
+        if page_size:
+            params['Limit'] = page_size
+
+        rollups = []
+        try:
+            while True:
+                response = self.table.query(**params)
+                rollups.extend(self._parse_item(item) for item in response['Items'])
+                if 'LastEvaluatedKey' not in response:
+                    break
+                params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except ClientError as err:
+            logger.error("Couldn't query rollups for %s: %s, %s", team_name,
+                         err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+        return rollups
+
+    @staticmethod
+    def _parse_item(item: dict) -> dict:
+        """Converts a rollup item into plain integers, filling in missing counters."""
+        rollup = {'bucket_timestamp': int(item['bucket_timestamp']),
+                  'comment_count': int(item.get('comment_count', 0))}
+        for sentiment in SENTIMENTS:
+            rollup[sentiment] = int(item.get(sentiment, 0))
+        return rollup
@@ -1,25 +1,32 @@
 """Defines a Lambda function and helper methods to process records from a DynamoDB stream."""
 
-from typing import Any, Tuple, Union
+from typing import Any, Optional
+import asyncio
 import os
 import logging
 import json
-from datetime import datetime, timedelta, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import ParseResult, urlencode, urlunparse
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
 import redis
-import botocore.session
-from botocore.model import ServiceId
-from botocore.signers import RequestSigner
-from cachetools import TTLCache, cached
 from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from cache_schema import bodies_key, decode_member, index_key, topics_key, version_key
+from comment_selection import select_comments
+from lambda_resources import REGISTRY, get_redis_client
+from llm_dispatch import Deadline, LLMDispatcher
+from map_reduce import MapReducePolicy, map_reduce_summarize
+from summary_policy import SummaryPolicy, SummaryState
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# A topic in a summary: `1. **Broad topic** - Elaboration on specific details.`
+TOPIC_PATTERN = re.compile(r"(\d+)\. \*\*(.*?)\*\* - (.*?)(?=\n\d+\. |\Z)", re.DOTALL)
+
 if not logger.handlers:
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
@@ -27,56 +34,19 @@ if not logger.handlers:
     console_handler.setFormatter(formatter)
     logger.addHandler(console_handler)
 
-class ElastiCacheIAMProvider(redis.CredentialProvider):
-    """Class which acts as a wrapper for elasticache IAM operations."""
-    def __init__(self, user, cache_name, is_serverless=True, region="us-west-1"):
-        self.user = user
-        self.cache_name = cache_name
-        self.is_serverless = is_serverless
-        self.region = region
-
-        session = botocore.session.get_session()
-        self.request_signer = RequestSigner(
-            ServiceId("elasticache"),
-            self.region,
-            "elasticache",
-            "v4",
-            session.get_credentials(),
-            session.get_component("event_emitter"),
-        )
-
-    # Generated IAM tokens are valid for 15 minutes
-    @cached(cache=TTLCache(maxsize=128, ttl=900))
-    def get_credentials(self) -> Union[Tuple[str], Tuple[str, str]]:
-        query_params = {"Action": "connect", "User": self.user}
-        if self.is_serverless:
-            query_params["ResourceType"] = "ServerlessCache"
-        url = urlunparse(
-            ParseResult(
-                scheme="https",
-                netloc=self.cache_name,
-                path="/",
-                query=urlencode(query_params),
-                params="",
-                fragment="",
-            )
-        )
-        signed_url = self.request_signer.generate_presigned_url(
-            {"method": "GET", "url": url, "body": {}, "headers": {}, "context": {}},
-            operation_name="connect",
-            expires_in=900,
-            region_name=self.region,
-        )
-        # RequestSigner only seems to work if the URL has a protocol, but
-        # Elasticache only accepts the URL without a protocol
-        # So strip it off the signed URL before returning
-        return (self.user, signed_url.removeprefix("https://"))
-
-
-def create_llm_chain():
-    """Creates a langchain Chain operation to interact with an LLM and parse the response"""
-    llm = ChatOpenAI(organization=os.getenv('OPENAI_ORGANIZATION'),
-                     model='gpt-4o-mini')
+def create_llm():
+    """Creates the chat model used for summaries."""
+    # Retries are made by the dispatcher, which also honours the rate limits.
+    return ChatOpenAI(organization=os.getenv('OPENAI_ORGANIZATION'), model='gpt-4o-mini',
+                      max_retries=0)
+
+
+def create_llm_chain(llm=None):
+    """Creates a langchain Chain operation to interact with an LLM and parse the response.
+
+    Args:
+        llm: The chat model to use, such as a fake model in tests. Created if not given."""
+    llm = llm if llm is not None else create_llm()
 
     parser = StrOutputParser()
 
@@ -89,73 +59,189 @@ def create_llm_chain():
     return prompt_template | llm | parser
 
 
-def get_comments_for_summarization(redis_client: redis.Redis, start_time: datetime,
-                                    end_time:datetime, team_name:str) -> list[str]:
-    """Retrieve comments from Redis for the specified team within the specified time window."""
+def create_reduce_chain(llm=None):
+    """Creates a langchain Chain operation that merges partial summaries into one.
+
+    Args:
+        llm: The chat model to use, such as a fake model in tests. Created if not given."""
+    llm = llm if llm is not None else create_llm()
+
+    parser = StrOutputParser()
+
+    prompt_template = ChatPromptTemplate.from_messages([
+    ("system", "The following are summaries of the topics in several groups of comments from \
+     Premier League fans. Merge them into a single ordered list going from most common to least \
+      common topic, combining topics that are the same, in the form : **Broad topic** - \
+      Elaboration on specific details."),
+    ("user", "{summaries}")])
+
+    return prompt_template | llm | parser
+
+
+def get_new_members(redis_client: redis.Redis, team_name: str, start_time: float,
+                    end_time: float) -> list[tuple[bytes, float]]:
+    """Retrieve a team's index members, with their timestamps, that are newer than start_time
+    and no newer than end_time."""
+    return redis_client.zrangebyscore(index_key(team_name), f'({start_time}', end_time,
+                                      withscores=True)
+
+
+def get_comments_for_summarization(redis_client: redis.Redis, team_name: str,
+                                   members: list[bytes]) -> list[dict[str, Any]]:
+    """Retrieve the full comments for the given index members of a team.
+
+    Comments are fetched from the comment store in a single HMGET."""
     try:
-        records = redis_client.zrangebyscore(f'team:{team_name}',
-                                            int(start_time.timestamp()), int(end_time.timestamp()))
+        comments, comment_ids = [], []
+        for member in members:
+            comment_id, _, legacy_comment = decode_member(member)
+            if legacy_comment is not None:
+                comments.append(legacy_comment)
+            else:
+                comment_ids.append(comment_id)
+        if comment_ids:
+            for comment in redis_client.hmget(bodies_key(team_name), comment_ids):
+                if comment is not None:
+                    comments.append(json.loads(comment))
     except Exception as e:
         logger.info('error in get comments function: %s', e)
-        
-    return [json.loads(record)['body'] for record in records]
+        raise
+
+    return comments
 
 
 
-def summarize_comments(comments: list[str], chain) -> str:
-    """Summarizes comments by invoking LangChain chain."""
+async def summarize_comments(comments: list[str], chain, reduce_chain=None,
+                             map_reduce_policy: Optional[MapReducePolicy] = None,
+                             dispatcher: Optional[LLMDispatcher] = None) -> str:
+    """Summarizes comments by invoking LangChain chain through the dispatcher. With a reduce
+    chain, comments that don't fit in one chunk are summarized with a map-reduce instead of a
+    single call."""
+    dispatcher = dispatcher if dispatcher is not None else LLMDispatcher.from_env()
+    if reduce_chain is not None:
+        return await map_reduce_summarize(comments, chain, reduce_chain,
+                                          map_reduce_policy or MapReducePolicy.from_env(),
+                                          invoke=dispatcher.invoke)
     comment_text = ' '.join(comments)
-    summary = chain.invoke({"comment": comment_text}).strip()
+    summary = (await dispatcher.invoke(chain, {"comment": comment_text})).strip()
     return summary
 
 
 
-def store_summary(summary:str, start_time:datetime, team_name:str,
-                   redis_client:redis.Redis):
-    """Store the summary in Redis"""
-
-    redis_client.zadd(f'team_summary:{team_name}', {summary:int(start_time.timestamp())})
+def parse_topics(summary: str) -> list[dict[str, Any]]:
+    """Parse the ranked topics out of a summary in the form
+    `1. **Broad topic** - Elaboration on specific details.`"""
+    return [{'rank': int(rank), 'title': title.strip(), 'description': description.strip()}
+            for rank, title, description in TOPIC_PATTERN.findall(summary)]
 
 
 
-def process_team_comments(team_name: str, start_time: datetime, end_time: datetime,
-                          redis_client: redis.Redis, chain) -> None:
-    """Fetch, summarize, and store comments for a specific team."""
+def store_summary(summary:str, start_time:datetime, team_name:str,
+                   redis_client:redis.Redis, end_time: Optional[datetime] = None,
+                   state: Optional[SummaryState] = None):
+    """Parse the summary into topics and store them in Redis, so readers don't have to parse
+    it. The summary text is kept as well if no topics could be parsed from it, and the team's
+    version is bumped so that dashboards pick up the new summary. The team's new state is
+    written in the same pipeline, so a summary is never stored without it."""
+    entry = {'window_start': int(start_time.timestamp()),
+             'window_end': int(end_time.timestamp()) if end_time is not None else None,
+             'topics': parse_topics(summary)}
+    if not entry['topics']:
+        logger.warning('No topics found in the summary for team %s.', team_name)
+        entry['summary'] = summary
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.zadd(topics_key(team_name), {json.dumps(entry): entry['window_start']})
+    pipeline.incr(version_key(team_name))
+    if state is not None:
+        state.save(pipeline, team_name)
+    pipeline.execute()
+
+
+
+async def process_team_comments(team_name: str, end_time: datetime, redis_client: redis.Redis,
+                                chain, policy: SummaryPolicy, dispatcher: LLMDispatcher,
+                                reduce_chain=None,
+                                map_reduce_policy: Optional[MapReducePolicy] = None
+                                ) -> tuple[str, dict[str, int]]:
+    """Fetch, summarize, and store the new comments for a specific team, unless the policy
+    finds too little new activity, in which case the existing summary is kept. Near-duplicate
+    comments are dropped and the rest are packed into the SUMMARY_TOKEN_BUDGET, which defaults
+    to what the map-reduce policy can summarize when a reduce chain is given.
+
+    Redis calls and comment selection run in worker threads so the event loop stays free for
+    the LLM calls of other teams.
+
+    A summary finished after the dispatcher's deadline is dropped rather than stored, as the
+    invocation may be stopped before its write completes.
+
+    Returns:
+        'summarized', 'skipped', 'failed' or 'cancelled', and the comment selection stats."""
     try:
+        # Find the comments since the last summary
+        state = await asyncio.to_thread(SummaryState.load, redis_client, team_name)
+        start = policy.window_start(state, end_time.timestamp())
+        window = await asyncio.to_thread(get_new_members, redis_client, team_name, start,
+                                         end_time.timestamp())
+        members = policy.new_members(window, state)
+        sentiments = [decode_member(member)[1] for member, _ in members]
+        summarize, reason = policy.should_summarize(sentiments, state)
+        if not summarize:
+            logger.info('Keeping summary for team %s: %s.', team_name, reason)
+            return 'skipped', {}
+
         # Fetch comments
-        logger.info('Getting comments for team: %s', team_name)
-        comments = get_comments_for_summarization(redis_client, start_time, end_time, team_name)
-        if comments:
-            # Summarize comments
-            logger.info('Summarizing comments for team: %s', team_name)
-            summary = summarize_comments(comments, chain)
-            # Store summary in Redis
-            store_summary(summary, start_time, team_name, redis_client)
-            logger.info('Processed and stored summary for team: %s', team_name)
-        else:
-            logger.info("No comments found for team %s during this time window.", team_name)
+        logger.info('Getting comments for team %s: %s.', team_name, reason)
+        comments = await asyncio.to_thread(get_comments_for_summarization, redis_client,
+                                           team_name, [member for member, _ in members])
+        default_budget = map_reduce_policy.token_budget if reduce_chain is not None else 8000
+        comments, stats = await asyncio.to_thread(
+            select_comments, comments,
+            token_budget=int(os.getenv('SUMMARY_TOKEN_BUDGET', default_budget)))
+        logger.info('Selected %s of %s comments for team %s (~%s tokens); dropped %s '
+                    'near-duplicates and %s over budget.', stats['kept'], stats['considered'],
+                    team_name, stats['tokens'], stats['duplicates'], stats['over_budget'])
+        if not comments:
+            logger.info('Keeping summary for team %s: no comments left to summarize.', team_name)
+            return 'skipped', stats
+        # Summarize comments
+        logger.info('Summarizing comments for team: %s', team_name)
+        summary = await summarize_comments(comments, chain, reduce_chain, map_reduce_policy,
+                                           dispatcher)
+        # A write started now could outlive the task, which is cancelled at the deadline.
+        if dispatcher.deadline.remaining() == 0:
+            logger.warning('Dropping summary for team %s finished after the deadline.',
+                           team_name)
+            return 'cancelled', {}
+        # Store summary in Redis, moving the watermark past the summarized comments
+        await asyncio.to_thread(store_summary, summary,
+                                datetime.fromtimestamp(start, timezone.utc), team_name,
+                                redis_client, end_time,
+                                policy.next_state(window, sentiments, state))
+        logger.info('Processed and stored summary for team: %s', team_name)
+        return 'summarized', stats
     except Exception as e:
         logger.error("Error processing team %s: %s", team_name, e)
-
-
-
-def lambda_handler(event: dict[str, Any], context: dict[str, Any]):
-    """Lambda function that processes comments for multiple teams in parallel."""
-
-    username = os.getenv('ELASTICACHE_USERNAME')
-    cache_name = os.getenv('CACHE_NAME')
-    elasticache_endpoint = os.getenv('ELASTICACHE_ENDPOINT')
-    creds_provider = ElastiCacheIAMProvider(user=username, cache_name=cache_name,
-                                             is_serverless=True)
-
-    redis_client = redis.Redis(host=elasticache_endpoint, port=6379,
-                               credential_provider=creds_provider, ssl=True, ssl_cert_reqs="none")
-    
-    logger.info("ping result: %s", redis_client.ping())
-
-    # Define the time window
+        return 'failed', {}
+
+
+
+async def summarize_teams_async(redis_client: redis.Redis, chain,
+                                policy: Optional[SummaryPolicy] = None, reduce_chain=None,
+                                map_reduce_policy: Optional[MapReducePolicy] = None,
+                                deadline: Optional[Deadline] = None) -> dict[str, Any]:
+    """Summarizes the new comments for every team with enough new activity, concurrently. LLM
+    calls go through a rate limited dispatcher. Teams still in progress when the deadline comes
+    are cancelled; the summaries already completed have been stored by then.
+
+    Returns:
+        The number of teams summarized, skipped, failed and cancelled, the number of comments
+        kept and dropped by the selection stage, and each team's latency in milliseconds."""
+    policy = policy if policy is not None else SummaryPolicy.from_env()
+    if reduce_chain is not None and map_reduce_policy is None:
+        map_reduce_policy = MapReducePolicy.from_env()
+    deadline = deadline if deadline is not None else Deadline()
+    dispatcher = LLMDispatcher.from_env(deadline)
     end_time = datetime.now(timezone.utc)
-    start_time = end_time - timedelta(minutes=20)
 
     # List of teams
     teams = ['arsenal', 'aston villa', 'bournemouth', 'brentford', 'brighton', 'chelsea',
@@ -163,21 +249,59 @@ def lambda_handler(event: dict[str, Any], context: dict[str, Any]):
             'manchester city', 'manchester united', 'newcastle', 'nottingham forest',
             'southampton', 'tottenham', 'west ham', 'wolves']
 
-    # Create the LangChain chain for summarization
-    chain = create_llm_chain()
-
-    # Process each team's comments in parallel using ThreadPoolExecutor
-    with ThreadPoolExecutor(max_workers=len(teams)) as executor:
-        futures = []
-        for team in teams:
-            futures.append(executor.submit(process_team_comments, team, start_time,
-                                            end_time, redis_client, chain))
-
-        # Wait for all futures to complete
-        for future in as_completed(futures):
-            try:
-                future.result()  # Raises an exception if the thread encountered one
-            except Exception as e:
-                logger.error("Error in thread execution: %s", e)
-
-    logger.info("Successfully processed comments for all teams.")
+    outcomes = Counter({'summarized': 0, 'skipped': 0, 'failed': 0, 'cancelled': 0,
+                        'comments_kept': 0, 'comments_dropped': 0})
+    latency_ms = {}
+
+    async def run_team(team: str) -> None:
+        started = time.perf_counter()
+        outcome, stats = await process_team_comments(team, end_time, redis_client, chain, policy,
+                                                     dispatcher, reduce_chain,
+                                                     map_reduce_policy)
+        latency_ms[team] = round((time.perf_counter() - started) * 1000)
+        outcomes[outcome] += 1
+        outcomes['comments_kept'] += stats.get('kept', 0)
+        outcomes['comments_dropped'] += stats.get('duplicates', 0) + stats.get('over_budget', 0)
+
+    # Process each team's comments concurrently, stopping at the deadline
+    tasks = {asyncio.create_task(run_team(team)): team for team in teams}
+    _, pending = await asyncio.wait(tasks, timeout=deadline.remaining())
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        outcomes['cancelled'] += len(pending)
+        logger.warning("Stopped before the deadline; cancelled teams: %s",
+                       ', '.join(sorted(tasks[task] for task in pending)))
+
+    logger.info("Summarized %s teams, skipped %s without enough new activity, %s failed, %s "
+                "cancelled. Kept %s comments and dropped %s.", outcomes['summarized'],
+                outcomes['skipped'], outcomes['failed'], outcomes['cancelled'],
+                outcomes['comments_kept'], outcomes['comments_dropped'])
+    logger.info("Latency per team (ms): %s", latency_ms)
+    return {**outcomes, 'latency_ms': latency_ms}
+
+
+def summarize_teams(redis_client: redis.Redis, chain, policy: Optional[SummaryPolicy] = None,
+                    reduce_chain=None, map_reduce_policy: Optional[MapReducePolicy] = None,
+                    deadline: Optional[Deadline] = None) -> dict[str, Any]:
+    """Runs summarize_teams_async to completion."""
+    return asyncio.run(summarize_teams_async(redis_client, chain, policy, reduce_chain,
+                                             map_reduce_policy, deadline))
+
+
+def lambda_handler(event: dict[str, Any], context: dict[str, Any]) -> dict[str, Any]:
+    """Lambda function that processes comments for multiple teams concurrently, stopping in
+    time to return before the invocation's deadline.
+
+    Returns:
+        The number of teams summarized, skipped, failed and cancelled, of comments kept and
+        dropped, and each team's latency."""
+    with REGISTRY.invocation():
+        reduce_chain = None
+        if os.getenv('SUMMARY_MAP_REDUCE') == 'TRUE':
+            reduce_chain = REGISTRY.get('reduce_chain', create_reduce_chain)
+        deadline = Deadline(context, float(os.getenv('SUMMARY_DEADLINE_MARGIN_SECONDS', '10')))
+        return summarize_teams(get_redis_client(is_serverless=True),
+                               REGISTRY.get('llm_chain', create_llm_chain),
+                               reduce_chain=reduce_chain, deadline=deadline)
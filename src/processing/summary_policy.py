@@ -0,0 +1,183 @@
+"""
+Defines when a team's summary is refreshed. Each team has a watermark, the timestamp of the newest
+comment covered by its last summary, kept in Redis along with the sentiment mix of the comments
+that summary covered. A new summary is only requested when enough comments have arrived since the
+watermark, or when their sentiment has drifted from the last summary's; otherwise the existing
+summary is kept and no LLM call is made.
+
+Comments are indexed by when they were posted, so one cached late can land behind the watermark.
+The window is therefore read from a grace period before the watermark, and the state also keeps
+the members the last summary covered in that period, so that they aren't counted again.
+"""
+
+import os
+import logging
+from typing import Optional
+import redis
+from cache_schema import SENTIMENT_CODES, summary_state_key
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# The prefix of the state fields holding the members covered near the watermark
+COVERED_PREFIX = 'covered:'
+
+
+class SummaryState:
+    """
+    What a team's last summary covered.
+
+    Args:
+        watermark: The timestamp of the newest comment covered by the last summary.
+        shares: The share of each sentiment among the comments the last summary covered.
+        covered: The index members the last summary covered within the grace period before
+            the watermark, with their timestamps.
+    """
+
+    def __init__(self, watermark: Optional[float] = None,
+                 shares: Optional[dict[str, float]] = None,
+                 covered: Optional[dict[str, float]] = None):
+        self.watermark = watermark
+        self.shares = shares or {}
+        self.covered = covered or {}
+
+    @classmethod
+    def load(cls, redis_client: redis.Redis, team_name: str) -> 'SummaryState':
+        """Reads a team's state, which is empty if the team hasn't been summarized yet."""
+        fields = {key.decode('utf-8') if isinstance(key, bytes) else key: float(value)
+                  for key, value in redis_client.hgetall(summary_state_key(team_name)).items()}
+        watermark = fields.pop('watermark', None)
+        covered = {key[len(COVERED_PREFIX):]: fields.pop(key) for key in list(fields)
+                   if key.startswith(COVERED_PREFIX)}
+        return cls(watermark, {label: fields.get(label, 0.0) for label in SENTIMENT_CODES}
+                   if fields else None, covered)
+
+    def save(self, redis_client: redis.Redis, team_name: str) -> None:
+        """Writes a team's state, replacing the previous one."""
+        redis_client.delete(summary_state_key(team_name))
+        redis_client.hset(summary_state_key(team_name),
+                          mapping={'watermark': self.watermark, **self.shares,
+                                   **{COVERED_PREFIX + member: timestamp
+                                      for member, timestamp in self.covered.items()}})
+
+
+def _member_name(member) -> str:
+    """Returns an index member as a string, as it is stored in a team's state."""
+    return member.decode('utf-8') if isinstance(member, bytes) else member
+
+
+def sentiment_shares(sentiments: list[str]) -> dict[str, float]:
+    """Returns the share of each sentiment in a list of sentiment labels."""
+    if not sentiments:
+        return {}
+    return {label: sentiments.count(label) / len(sentiments) for label in SENTIMENT_CODES}
+
+
+def sentiment_drift(shares: dict[str, float], previous: dict[str, float]) -> float:
+    """
+    Returns the total variation distance between two sentiment mixes: 0 when they are the same,
+    and 1 when they have no sentiment in common.
+    """
+    return sum(abs(shares.get(label, 0.0) - previous.get(label, 0.0))
+               for label in SENTIMENT_CODES) / 2
+
+
+class SummaryPolicy:
+    """
+    Decides whether a team has enough new activity to be summarized again.
+
+    Args:
+        min_new_comments: A team with at least this many new comments is summarized.
+        drift_threshold: A team whose new comments' sentiment mix is at least this far from
+            the last summary's, by total variation distance, is summarized.
+        min_drift_comments: The number of new comments needed before drift is considered, so
+            that a couple of comments can't trigger a summary on their own.
+        initial_window_seconds: How far back a team that has no summary yet is read.
+        max_window_seconds: The longest window summarized, however old the watermark is.
+        late_grace_seconds: How far before the watermark the window starts, so that comments
+            cached late are still summarized.
+    """
+
+    def __init__(self, min_new_comments: int = 25, drift_threshold: float = 0.2,
+                 min_drift_comments: int = 5, initial_window_seconds: int = 1200,
+                 max_window_seconds: int = 6 * 3600, late_grace_seconds: int = 600):
+        self.min_new_comments = min_new_comments
+        self.drift_threshold = drift_threshold
+        self.min_drift_comments = min_drift_comments
+        self.initial_window_seconds = initial_window_seconds
+        self.max_window_seconds = max_window_seconds
+        self.late_grace_seconds = late_grace_seconds
+
+    @classmethod
+    def from_env(cls) -> 'SummaryPolicy':
+        """Builds a policy from SUMMARY_* environment variables, using defaults if unset."""
+        defaults = cls()
+        return cls(
+            min_new_comments=int(os.getenv('SUMMARY_MIN_NEW_COMMENTS',
+                                           defaults.min_new_comments)),
+            drift_threshold=float(os.getenv('SUMMARY_DRIFT_THRESHOLD',
+                                            defaults.drift_threshold)),
+            min_drift_comments=int(os.getenv('SUMMARY_MIN_DRIFT_COMMENTS',
+                                             defaults.min_drift_comments)),
+            initial_window_seconds=int(os.getenv('SUMMARY_INITIAL_WINDOW_SECONDS',
+                                                 defaults.initial_window_seconds)),
+            max_window_seconds=int(os.getenv('SUMMARY_MAX_WINDOW_SECONDS',
+                                             defaults.max_window_seconds)),
+            late_grace_seconds=int(os.getenv('SUMMARY_LATE_GRACE_SECONDS',
+                                             defaults.late_grace_seconds))
+        )
+
+    def window_start(self, state: SummaryState, end_time: float) -> float:
+        """Returns the start of the window of new comments for a team, exclusive. The window
+        overlaps the last summary's by the grace period; see new_members."""
+        if state.watermark is None:
+            return end_time - self.initial_window_seconds
+        return max(state.watermark - self.late_grace_seconds,
+                   end_time - self.max_window_seconds)
+
+    def new_members(self, members: list[tuple[bytes, float]],
+                    state: SummaryState) -> list[tuple[bytes, float]]:
+        """Returns the members of a window that the last summary didn't cover."""
+        return [(member, timestamp) for member, timestamp in members
+                if _member_name(member) not in state.covered]
+
+    def next_state(self, members: list[tuple[bytes, float]], sentiments: list[str],
+                   state: SummaryState) -> SummaryState:
+        """
+        Returns a team's state once the new members of a window have been summarized.
+
+        Args:
+            members: Every member of the window, including those covered before.
+            sentiments: The sentiment labels of the new members.
+            state: The team's state as of its last summary.
+        """
+        timestamps = [timestamp for _, timestamp in members]
+        if state.watermark is not None:
+            timestamps.append(state.watermark)
+        watermark = max(timestamps)
+        return SummaryState(watermark, sentiment_shares(sentiments),
+                            {_member_name(member): timestamp for member, timestamp in members
+                             if timestamp > watermark - self.late_grace_seconds})
+
+    def should_summarize(self, sentiments: list[str], state: SummaryState) -> tuple[bool, str]:
+        """
+        Decides whether to summarize a team.
+
+        Args:
+            sentiments: The sentiment labels of the team's new comments.
+            state: The team's state as of its last summary.
+
+        Returns:
+            Whether to summarize, and the reason for the decision.
+        """
+        if len(sentiments) >= self.min_new_comments:
+            return True, f'{len(sentiments)} new comments'
+        if len(sentiments) < self.min_drift_comments:
+            return False, f'only {len(sentiments)} new comments'
+        if not state.shares:
+            return True, 'no previous summary'
+        drift = sentiment_drift(sentiment_shares(sentiments), state.shares)
+        if drift >= self.drift_threshold:
+            return True, f'sentiment drift of {drift:.2f}'
+        return False, f'{len(sentiments)} new comments with sentiment drift of {drift:.2f}'
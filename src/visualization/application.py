@@ -4,11 +4,15 @@ Defines a Dash application including the layout, server config, and data source.
 
 import os
 import logging
+from typing import Optional
 import dotenv
+import flask
 from dash import Dash
 import dash_bootstrap_components as dbc
 from components.layout import create_layout
+from data.change_feed import ChangeFeed
 from data.source import Comment
+from data.view_refresher import ViewRefresher
 import boto3
 
 dotenv.load_dotenv()
@@ -17,17 +21,67 @@ dotenv.load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_app() -> Dash:
+def create_app(comment_table: Optional[Comment] = None) -> Dash:
     """
     Creates a Dash application with the given layout and data source.
 
+    Args:
+        comment_table: The data source. Created from the environment if not given.
+
     Returns:
         Dash: A configured Dash application.
     """
-    comment_table = Comment()
+    comment_table = comment_table if comment_table is not None else Comment()
+    # Chart views are recomputed in the background, so requests are served from memory.
+    views = ViewRefresher.from_env()
     _app = Dash(external_stylesheets=[dbc.themes.LITERA])
     _app.title = 'Realtime Soccer Sentiment'
-    _app.layout = create_layout(app=_app, data=comment_table)
+    # With DASHBOARD_PUSH, browsers are told about new data over server-sent events and only
+    # poll while the event stream is down.
+    push = os.getenv('DASHBOARD_PUSH') == 'TRUE'
+    _app.layout = create_layout(app=_app, data=comment_table, views=views, push=push)
+    # Lets the server configuration reach the data source, e.g. to reconnect after a fork.
+    _app.server.extensions['comment_table'] = comment_table
+
+    @_app.server.route('/metrics/query-cache')
+    def query_cache_metrics():
+        """Reports the hit rate of the shared query cache."""
+        return flask.jsonify(comment_table.query_cache.stats())
+
+    @_app.server.route('/metrics/shared-cache')
+    def shared_cache_metrics():
+        """Reports the hit rate of the cache shared between server processes in this one."""
+        if comment_table.shared_cache is None:
+            return flask.jsonify({})
+        return flask.jsonify(comment_table.shared_cache.stats())
+
+    @_app.server.route('/metrics/views')
+    def view_metrics():
+        """Reports the number and age of the precomputed views."""
+        return flask.jsonify(views.stats())
+
+    if push:
+        def refresh_team(team_name: str) -> None:
+            """Drops a changed team's cached queries and recomputes its views."""
+            comment_table.query_cache.invalidate(lambda key: key[1] == team_name)
+            views.refresh(lambda key: key[1] == team_name)
+
+        changes = ChangeFeed.from_env(comment_table.get_change_markers, on_change=refresh_team)
+
+        @_app.server.route('/events')
+        def events():
+            """Streams change events for a team as server-sent events."""
+            team_name = flask.request.args.get('team', '')
+            return flask.Response(flask.stream_with_context(changes.stream(team_name)),
+                                  mimetype='text/event-stream',
+                                  headers={'Cache-Control': 'no-cache',
+                                           'X-Accel-Buffering': 'no'})
+
+        @_app.server.route('/metrics/push')
+        def push_metrics():
+            """Reports the number of event stream subscribers and notifications sent."""
+            return flask.jsonify(changes.stats())
+
     return _app
 
 app = create_app()
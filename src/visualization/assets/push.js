@@ -0,0 +1,41 @@
+/*
+ * Subscribes the dashboard to server-sent change events for the selected team. Each event updates
+ * the push signal store, which the chart callbacks listen to. While the event stream is connected
+ * the refresh interval is slowed to a safety net; if the stream drops, polling resumes at its
+ * normal rate until it reconnects.
+ */
+const POLL_INTERVAL_MS = 10000;
+const CONNECTED_POLL_INTERVAL_MS = 60000;
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    push: {
+        subscribe: function(team) {
+            const push = window.dashboardPush = window.dashboardPush || {};
+            if (push.source) {
+                push.source.close();
+                push.source = null;
+            }
+            if (!team || !window.EventSource) {
+                return window.dash_clientside.no_update;
+            }
+            const setPollInterval = function(interval) {
+                window.dash_clientside.set_props('interval-component', {interval: interval});
+            };
+            const source = new EventSource('/events?team=' + encodeURIComponent(team));
+            source.onopen = function() {
+                setPollInterval(CONNECTED_POLL_INTERVAL_MS);
+            };
+            source.addEventListener('change', function(event) {
+                window.dash_clientside.set_props('push-signal', {
+                    data: {team: event.data, id: event.lastEventId, received: Date.now()}
+                });
+            });
+            source.onerror = function() {
+                // EventSource reconnects by itself; poll in the meantime.
+                setPollInterval(POLL_INTERVAL_MS);
+            };
+            push.source = source;
+            return team;
+        }
+    }
+});
@@ -8,3 +8,13 @@ LINE_PLOT_COMMENT_COUNT = 'line-plot-comment_count'
 TIME_WINDOW_BUTTONS = 'time-window-buttons'
 PLOT_TYPE_BUTTONS = 'plot-type-buttons'
 SUMMARY_ACCORDION = 'summary-accordion'
+LINE_PLOT_STORE = 'line-plot-store'
+PIE_CHART_STORE = 'pie-chart-store'
+LINE_PLOT_COMMENT_COUNT_STORE = 'line-plot-comment_count-store'
+PUSH_SIGNAL = 'push-signal'
+PUSH_SUBSCRIPTION = 'push-subscription'
+DASHBOARD_TABS = 'dashboard-tabs'
+TEAM_TAB = 'team-tab'
+LEAGUE_TAB = 'league-tab'
+LEAGUE_OVERVIEW = 'league-overview'
+LEAGUE_OVERVIEW_STORE = 'league-overview-store'
@@ -0,0 +1,198 @@
+"""
+Updates chart figures incrementally. Each chart keeps a note of the points its browser already
+has in a dcc.Store; on a refresh of the same team and window only the points that changed or
+were added are sent as a Patch, and points that slid out of the window are removed. The figure
+is drawn in full when the team, window or plot type changes.
+
+Each view is stamped with the team's version and the bucket its window ends in, on the clock
+the chart's buckets follow. When the browser already has a view with the current stamp, nothing
+has changed and the callback sends nothing, and server processes sharing results compute each
+stamp's view once.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional, Sequence, Union
+import pandas as pd
+import plotly.graph_objects as go
+from dash import Patch
+from data.source import Comment
+
+# The newest buckets are still filling, and late comments can land in the one before, so these
+# are resent on every refresh.
+REVISED_POINTS = 2
+
+Figure = Union[go.Figure, Patch]
+
+# Plotly Express reads the shared default template while drawing, which fails when two threads
+# draw at once, so figures are drawn one at a time.
+FIGURE_LOCK = threading.Lock()
+
+
+def window_stamp(data: Comment, team_name: Optional[str], time_window: str,
+                 now: Optional[float] = None, tz: str = 'US/Pacific') -> Optional[list]:
+    """
+    Returns what a chart of a team's sentiment series over a sliding time window depends on
+    besides its selection: the team's version, which changes with every write of its data, and
+    the last bucket of the series, counted on the clock its buckets are aligned to, which
+    changes as the window slides.
+
+    Args:
+        data: Comment object encapsulating database interaction methods.
+        team_name: The team selected from the dropdown.
+        time_window: The time window selected, such as '1hour'.
+        now: The end of the window. Defaults to the current time.
+        tz: The time zone the series' buckets are aligned to.
+
+    Returns:
+        The stamp, or None if the team has no version, in which case its changes can't be told.
+    """
+    if not team_name:
+        return None
+    versions = team_versions(data, [team_name])
+    if versions is None:
+        return None
+    end_time = time.time() if now is None else now
+    start_time = end_time - pd.to_timedelta(time_window).total_seconds()
+    return versions + [data.last_series_bucket(start_time, end_time, tz=tz)]
+
+
+def teams_stamp(data: Comment, team_names: list[str], time_window: str,
+                now: Optional[float] = None) -> Optional[list]:
+    """
+    Returns the stamp of a chart of several teams' counts over a sliding time window: each
+    team's version, read in one round trip, followed by the UTC bucket the window ends in at the
+    finest resolution fitting the window. The counts are read in UTC buckets at least as coarse,
+    so the stamp changes whenever their last bucket does.
+
+    Args:
+        data: Comment object encapsulating database interaction methods.
+        team_names: The teams the chart shows.
+        time_window: The time window selected, such as '1hour'.
+        now: The end of the window. Defaults to the current time.
+
+    Returns:
+        The stamp, or None if any of the teams has no version.
+    """
+    versions = team_versions(data, team_names)
+    if versions is None:
+        return None
+    bucket = data.choose_resolution(0, pd.to_timedelta(time_window).total_seconds())
+    return versions + [int((time.time() if now is None else now) // bucket)]
+
+
+def team_versions(data: Comment, team_names: list[str]) -> Optional[list]:
+    """Returns the teams' versions, read in one round trip, or None if any has no version."""
+    versions = list(data.get_versions(team_names).values())
+    if any(version is None for version in versions):
+        return None
+    return versions
+
+
+def shared_view(data: Comment, key: tuple, stamp: Optional[list],
+                compute: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+    """
+    Computes a view once for all server processes while its stamp stays the same. Views of
+    teams without a version are computed by each process, as their changes can't be told.
+
+    Args:
+        data: Comment object encapsulating database interaction methods.
+        key: The key of the view, such as its chart, team and time window.
+        stamp: The stamp of the data the view is computed from.
+        compute: Computes the view.
+
+    Returns:
+        The view.
+    """
+    if stamp is None:
+        return compute()
+    return data.shared(('view',) + key + tuple(stamp), compute)
+
+
+def is_current(view: dict[str, Any], data: Comment, team_name: Optional[str],
+               time_window: str) -> bool:
+    """Returns whether a view was computed from the data a fresh computation would read."""
+    return view['stamp'] is not None and view['stamp'] == window_stamp(data, team_name,
+                                                                       time_window)
+
+
+def is_unchanged(state: Optional[dict[str, Any]], key: list, stamp: Optional[list]) -> bool:
+    """Returns whether the browser already has the chart of a selection at the given stamp."""
+    return (bool(state) and stamp is not None and state.get('key') == key and
+            state.get('stamp') == stamp)
+
+
+def update_series_figure(df: pd.DataFrame, state: Optional[dict[str, Any]], key: list,
+                         bucket: int, columns: Sequence[str],
+                         build: Callable[[pd.DataFrame], go.Figure],
+                         stamp: Optional[list] = None) -> tuple[Figure, dict[str, Any]]:
+    """
+    Returns the update for a line chart drawn from a sentiment series.
+
+    Args:
+        df: The series, with a row for every bucket of the window.
+        state: What the browser has, as last returned, or None.
+        key: The team, window and plot type the chart is drawn for.
+        bucket: The width of the series' buckets, in seconds.
+        columns: The column plotted by each trace, in trace order.
+        build: Draws the full figure.
+        stamp: The stamp of the series, kept in the state.
+
+    Returns:
+        The full figure or a Patch of it, and the new state to store.
+    """
+    first = int(df['timestamp'].iloc[0]) if len(df) else None
+    last = int(df['timestamp'].iloc[-1]) if len(df) else None
+    new_state = {'key': key, 'stamp': stamp, 'bucket': bucket, 'first': first, 'last': last}
+    if (not state or state.get('key') != key or state.get('bucket') != bucket or
+            first is None or state.get('first') is None or first < state['first']):
+        return build(df), new_state
+
+    # Buckets aligned to local time are an hour longer or shorter across a change of daylight
+    # saving time, so positions are rounded.
+    dropped = round((first - state['first']) / bucket)
+    kept = round((state['last'] - state['first']) / bucket) + 1 - dropped
+    # Server processes that don't share views can answer with a series older than the one the
+    # browser has. Patching it would move the state back, and the next patch from a newer
+    # process would append points the figure already has, so it is drawn in full instead.
+    if kept <= 0 or dropped > kept or kept > len(df) or state['last'] > last:
+        return build(df), new_state
+
+    patch = Patch()
+    revised = range(max(0, kept - REVISED_POINTS), min(kept, len(df)))
+    added = df.iloc[kept:]
+    for trace, column in enumerate(columns):
+        for _ in range(dropped):
+            del patch['data'][trace]['x'][0]
+            del patch['data'][trace]['y'][0]
+        for position in revised:
+            patch['data'][trace]['y'][position] = int(df[column].iloc[position])
+        if len(added):
+            patch['data'][trace]['x'].extend(added['date'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+                                             .tolist())
+            patch['data'][trace]['y'].extend(added[column].tolist())
+    return patch, new_state
+
+
+def update_values_figure(values: list, state: Optional[dict[str, Any]], key: list,
+                         build: Callable[[], go.Figure],
+                         stamp: Optional[list] = None) -> tuple[Figure, dict[str, Any]]:
+    """
+    Returns the update for a single trace chart, such as a pie, whose labels stay fixed.
+
+    Args:
+        values: The trace's values.
+        state: What the browser has, as last returned, or None.
+        key: The team and window the chart is drawn for.
+        build: Draws the full figure.
+        stamp: The stamp of the values, kept in the state.
+
+    Returns:
+        The full figure or a Patch of its values, and the new state to store.
+    """
+    new_state = {'key': key, 'stamp': stamp}
+    if not state or state.get('key') != key:
+        return build(), new_state
+    patch = Patch()
+    patch['data'][0]['values'] = values
+    return patch, new_state
@@ -3,8 +3,10 @@
 from dash import Dash, html, dcc
 import dash_bootstrap_components as dbc
 from data.source import Comment
+from data.view_refresher import ViewRefresher
 from . import (line_plot, ids, team_dropdown, pie_chart, line_plot_comment_count,
-               time_window_buttons, plot_type_buttons, summary_accordion)
+               time_window_buttons, plot_type_buttons, summary_accordion, push_updates,
+               league_overview)
 
 
 
@@ -51,12 +53,13 @@ def generate_control_card(app: Dash, data: Comment) -> html.Div:
         style={'margin-bottom': '20px'}
     )
 
-def generate_line_plot(app: Dash, data: Comment) -> html.Div:
+def generate_line_plot(app: Dash, data: Comment, views: ViewRefresher) -> html.Div:
     """
     Generates a Div component containing a line plot of comment sentiment over time.
     Args:
         app: Dash appplication
         data: Comment object encapsulating database interaction methods
+        views: The precomputed views
     Returns:
         html Div: A Div containing the line plot
     """
@@ -69,11 +72,11 @@ def generate_line_plot(app: Dash, data: Comment) -> html.Div:
                                 style={'font-weight': 'bold'}),
                         html.Hr(),
                         dbc.Row([
-                            dbc.Col(dbc.Spinner(line_plot.render(app, data)),
+                            dbc.Col(dbc.Spinner(line_plot.render(app, data, views)),
                                     width=9
                             ),
                             dbc.Col(
-                                dbc.Spinner(pie_chart.render(app, data)),
+                                dbc.Spinner(pie_chart.render(app, data, views)),
                                 width=3,
 
                             )
@@ -86,13 +89,14 @@ def generate_line_plot(app: Dash, data: Comment) -> html.Div:
     )
 
 
-def generate_line_plot_comment_count(app: Dash, data: Comment) -> html.Div:
+def generate_line_plot_comment_count(app: Dash, data: Comment, views: ViewRefresher) -> html.Div:
     """
     Generates a Div component containing a line plot showing comment volume over time.
 
     Args:
         app: Dash appplication
         data: Comment object encapsulating database interaction methods
+        views: The precomputed views
     Returns:
         html Div: A Div containing the comment volume line plot
     """
@@ -104,14 +108,14 @@ def generate_line_plot_comment_count(app: Dash, data: Comment) -> html.Div:
                         html.H5('Comment Volume Over Time', className='card-title',
                                 style={'font-weight': 'bold'}),
                         html.Hr(),
-                        dbc.Spinner(line_plot_comment_count.render(app, data))
+                        dbc.Spinner(line_plot_comment_count.render(app, data, views))
                     ],
                 ),
             )
         ]
     )
 
-def generate_summary_accordion(app: Dash, data: Comment) -> html.Div:
+def generate_summary_accordion(app: Dash, data: Comment, views: ViewRefresher) -> html.Div:
     """
     Generates a Div component containing an accordion with summarized topics and associated
     details from recent comments.
@@ -119,6 +123,7 @@ def generate_summary_accordion(app: Dash, data: Comment) -> html.Div:
     Args:
         app: Dash appplication
         data: Comment object encapsulating database interaction methods
+        views: The precomputed views
     Returns:
         html Div: A Div containing the accordion.
     """
@@ -130,7 +135,7 @@ def generate_summary_accordion(app: Dash, data: Comment) -> html.Div:
                         html.H5('Recent Topics of Discussion', className='card-title',
                                 style={'font-weight': 'bold'}),
                         html.Hr(),
-                        dbc.Spinner(summary_accordion.render(app, data))
+                        dbc.Spinner(summary_accordion.render(app, data, views))
                     ],
                 ),
                 style={'height': '100%'}
@@ -140,13 +145,43 @@ def generate_summary_accordion(app: Dash, data: Comment) -> html.Div:
     )
 
 
-def create_layout(app: Dash, data: Comment) -> html.Div:
+def generate_league_overview(app: Dash, data: Comment, views: ViewRefresher) -> html.Div:
+    """
+    Generates a Div component containing an overview of sentiment and volume for every team.
+
+    Args:
+        app: Dash appplication
+        data: Comment object encapsulating database interaction methods
+        views: The precomputed views
+    Returns:
+        html Div: A Div containing the league overview.
+    """
+    return html.Div(
+        children=[
+            dbc.Card(
+                dbc.CardBody(
+                    [
+                        html.H5('League Overview', className='card-title',
+                                style={'font-weight': 'bold'}),
+                        html.Hr(),
+                        dbc.Spinner(league_overview.render(app, data, views))
+                    ],
+                ),
+            )
+        ]
+    )
+
+
+def create_layout(app: Dash, data: Comment, views: ViewRefresher,
+                  push: bool = False) -> html.Div:
     """
     Generates a Div component containing the layout for a dashboard.
 
     Args:
         app: Dash appplication
         data: Comment object encapsulating database interaction methods
+        views: The precomputed views
+        push: Whether the server pushes updates, with the refresh interval as a fallback
     Returns:
         html Div: The main div containing the dashboard layout
     """
@@ -183,28 +218,38 @@ def create_layout(app: Dash, data: Comment) -> html.Div:
                                              interval=1*10000,
                                              n_intervals=0
                                              ),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(
-                                            generate_line_plot(app, data),
-                                            )
-                                    ]
-                                ),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(
-                                            generate_line_plot_comment_count(app, data),
-                                            xs=12, md=6,  # Half the width on medium+ screens
-                                            style={'padding': '10px'}
+                                push_updates.render(app, push),
+                                dbc.Tabs(id=ids.DASHBOARD_TABS, active_tab=ids.TEAM_TAB, children=[
+                                    dbc.Tab(label='Team', tab_id=ids.TEAM_TAB, children=[
+                                        dbc.Row(
+                                            [
+                                                dbc.Col(
+                                                    generate_line_plot(app, data, views),
+                                                    )
+                                            ]
                                         ),
-                                        dbc.Col(
-                                            generate_summary_accordion(app, data),
-                                            xs=12, md=6,  # Half the width on medium+ screens
-                                            style={'padding': '10px'}
+                                        dbc.Row(
+                                            [
+                                                dbc.Col(
+                                                    generate_line_plot_comment_count(app, data,
+                                                                                     views),
+                                                    xs=12, md=6,  # Half the width on medium+
+                                                    style={'padding': '10px'}
+                                                ),
+                                                dbc.Col(
+                                                    generate_summary_accordion(app, data, views),
+                                                    xs=12, md=6,  # Half the width on medium+
+                                                    style={'padding': '10px'}
+                                                )
+                                            ],
+                                            style={'align-items': 'stretch'}
                                         )
-                                    ],
-                                    style={'align-items': 'stretch'}
-                                )
+                                    ]),
+                                    # All teams at once, read in one round trip.
+                                    dbc.Tab(label='League', tab_id=ids.LEAGUE_TAB, children=[
+                                        generate_league_overview(app, data, views)
+                                    ]),
+                                ]),
                             ],
                             xs=12, md=8,  # Full width on small screens, 2/3 width on medium+
                             style={'backgroundColor': '#e9ecef', 'padding': '20px', 'flex': '1',
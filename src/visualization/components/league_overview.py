@@ -0,0 +1,148 @@
+"""
+Defines an overview of comment sentiment and volume for every team in the league.
+"""
+
+import datetime
+import logging
+import time
+from typing import Any, Optional
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from dash import Dash, dcc, html
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+import pandas as pd
+from data.source import Comment
+from data.view_refresher import ViewRefresher
+from . import ids
+from .incremental import FIGURE_LOCK, is_unchanged, shared_view, teams_stamp
+from .team_dropdown import TEAM_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+TEAMS = [option['value'] for option in TEAM_OPTIONS]
+TEAM_LABELS = {option['value']: option['label'] for option in TEAM_OPTIONS}
+COLORS = {'positive': '#98df8a', 'neutral': '#b0b0b0', 'negative': '#e37777'}
+
+
+def build_figure(df: pd.DataFrame) -> go.Figure:
+    """
+    Draws each team's comment volume next to its sentiment shares, with the teams ordered by
+    net sentiment, most positive first.
+
+    Args:
+        df: The league's counts, as returned by Comment.query_league_counts.
+
+    Returns:
+        go.Figure: The overview figure.
+    """
+    df = df.assign(share=df['net_score'] / df['count'].where(df['count'] > 0))
+    df = df.sort_values(['share', 'count'], ascending=True, na_position='first')
+    labels = [TEAM_LABELS.get(team, team) for team in df['team']]
+    totals = df['count'].where(df['count'] > 0, 1)
+
+    fig = make_subplots(rows=1, cols=2, shared_yaxes=True, column_widths=[0.35, 0.65],
+                        horizontal_spacing=0.02,
+                        subplot_titles=('Comment Count', 'Sentiment Share'))
+    fig.add_trace(go.Bar(x=df['count'], y=labels, orientation='h', marker_color='#6c8ebf',
+                         name='comments', showlegend=False), row=1, col=1)
+    for sentiment in ('positive', 'neutral', 'negative'):
+        fig.add_trace(go.Bar(x=df[sentiment] / totals, y=labels, orientation='h',
+                             name=sentiment, marker_color=COLORS[sentiment],
+                             customdata=df[sentiment],
+                             hovertemplate='%{y}: %{customdata} (%{x:.0%})<extra></extra>'),
+                      row=1, col=2)
+    fig.update_layout(barmode='stack', template='simple_white', height=600,
+                      margin=dict(l=10, r=10, t=30, b=10),
+                      legend=dict(orientation='h', y=-0.05))
+    fig.update_xaxes(tickformat='.0%', range=[0, 1], row=1, col=2)
+    return fig
+
+
+def compute_view(data: Comment, selected_time_window: str) -> dict[str, Any]:
+    """
+    Computes the league's counts and overview figure for the current time window.
+
+    Args:
+        data: Comment object encapsulating database interaction methods.
+        selected_time_window: The time window selected for the plot.
+
+    Returns:
+        A dict with the counts (df), the figure (figure) and the stamp of the data they were
+        computed from (stamp).
+    """
+    # Read before the counts, so that writes made while they're read aren't missed.
+    stamp = teams_stamp(data, TEAMS, selected_time_window)
+
+    def compute() -> dict[str, Any]:
+        start_time = time.mktime((datetime.datetime.now() -
+                                  pd.to_timedelta(selected_time_window)).timetuple())
+        end_time = time.mktime(datetime.datetime.now().timetuple())
+
+        df = data.query_league_counts(TEAMS, start_time, end_time)
+        with FIGURE_LOCK:
+            figure = build_figure(df)
+        return {'df': df, 'figure': figure, 'stamp': stamp}
+
+    return shared_view(data, ('league_overview', selected_time_window), stamp, compute)
+
+
+def render(app: Dash, data: Comment, views: ViewRefresher) -> html.Div:
+    """
+    Generates a Graph object containing the league overview, along with a store of what the
+    browser has.
+
+    Args:
+        app: Dash application.
+        data: Comment object encapsulating database interaction methods.
+        views: The precomputed views.
+
+    Returns:
+        html.Div: Div containing the overview and its store.
+    """
+    initial_figure = go.Figure()
+
+    @app.callback(
+        Output(ids.LEAGUE_OVERVIEW, 'figure'),
+        Output(ids.LEAGUE_OVERVIEW_STORE, 'data'),
+        Input(ids.INTERVAL_COMPONENT, 'n_intervals'),
+        Input(ids.DASHBOARD_TABS, 'active_tab'),
+        Input(ids.TIME_WINDOW_BUTTONS, 'value'),
+        State(ids.LEAGUE_OVERVIEW_STORE, 'data')
+    )
+    def update_plot(n: int, active_tab: Optional[str], selected_time_window: str,
+                    state: Optional[dict[str, Any]]) -> tuple[go.Figure, dict[str, Any]]:
+        """
+        Updates the overview for the selected time window while its tab is shown. Nothing is
+        sent while no team's data has changed.
+
+        Args:
+            n: Interval count (unused).
+            active_tab: The tab shown.
+            selected_time_window: The time window selected for the plot.
+            state: What the browser has.
+
+        Returns:
+            The overview figure and the new store contents.
+        """
+        if active_tab != ids.LEAGUE_TAB:
+            raise PreventUpdate
+        try:
+            key = [selected_time_window]
+            if is_unchanged(state, key, teams_stamp(data, TEAMS, selected_time_window)):
+                raise PreventUpdate
+            view = views.get(('league_overview', None, selected_time_window),
+                             lambda: compute_view(data, selected_time_window),
+                             lambda view: (view['stamp'] is not None and
+                                           view['stamp'] == teams_stamp(data, TEAMS,
+                                                                        selected_time_window)))
+            return view['figure'], {'key': key, 'stamp': view['stamp']}
+
+        except PreventUpdate:
+            raise
+        except Exception as e:
+            logger.error("Error updating league overview: %s", e)
+            return go.Figure(), None
+
+    return html.Div([dcc.Graph(id=ids.LEAGUE_OVERVIEW, figure=initial_figure),
+                     dcc.Store(id=ids.LEAGUE_OVERVIEW_STORE)])
@@ -5,115 +5,168 @@ Defines a line plot component showing comment sentiment over time.
 import datetime
 import time
 import logging
-from typing import Optional
+from typing import Any, Optional
 import plotly.graph_objects as go
 import plotly.express as px
-from dash import Dash, dcc
-from dash.dependencies import Input, Output
+from dash import Dash, dcc, html
+from dash.exceptions import PreventUpdate
+from dash.dependencies import Input, Output, State
 import pandas as pd
 from data.source import Comment
+from data.view_refresher import ViewRefresher
 from . import ids
+from .incremental import (FIGURE_LOCK, Figure, is_current, is_unchanged, shared_view,
+                          update_series_figure, window_stamp)
 
 logger = logging.getLogger(__name__)
 
-def render(app: Dash, data: Comment) -> dcc.Graph:
+
+def build_figure(df: pd.DataFrame, selected_plot_type: str) -> go.Figure:
+    """
+    Draws the line plot of a sentiment series in full.
+
+    Args:
+        df: The sentiment series, as returned by Comment.query_sentiment_series.
+        selected_plot_type: The type of plot selected (individual lines or aggregated score).
+
+    Returns:
+        go.Figure: The line plot figure.
+    """
+    if selected_plot_type == 'individual':
+        fig = px.line(
+            df,
+            x='date',
+            y=['positive', 'negative', 'neutral'],
+            labels={'variable': 'sentiment_id', 'value': 'count'},
+            template='simple_white',
+            color_discrete_map={
+                'positive': '#98df8a',
+                'negative': '#e37777',
+                'neutral': '#b0b0b0'
+            },
+            markers=True
+        )
+
+        fig.update_yaxes(title_text='Comment Count', showgrid=True, gridwidth=1,
+                         gridcolor='LightGrey')
+        fig.update_xaxes(title='Date and Time')
+
+    else:
+        fig = px.line(
+            df,
+            x='date',
+            y='net_score',
+            template='simple_white',
+            markers=True
+        )
+
+        fig.update_yaxes(title_text='Sentiment Score', showgrid=True, gridwidth=1,
+                         gridcolor='LightGrey')
+        fig.update_xaxes(title='Date and Time')
+        fig.add_hline(y=0, line_width=3, line_dash='dash', line_color='red')
+
+    fig.update_layout(margin=dict(l=10, r=10, t=10, b=10))
+    return fig
+
+
+def compute_view(data: Comment, selected_team: Optional[str], selected_time_window: str,
+                 selected_plot_type: str) -> dict[str, Any]:
+    """
+    Computes the sentiment series and full figure of a selection for the current time window.
+
+    Args:
+        data: Comment object encapsulating database interaction methods.
+        selected_team: The team selected from the dropdown.
+        selected_time_window: The time window selected for the plot.
+        selected_plot_type: The type of plot selected (individual lines or aggregated score).
+
+    Returns:
+        A dict with the series (df), its bucket width (bucket), the full figure (figure) and the
+        stamp of the data it was computed from (stamp).
+    """
+    # Read before the series, so that writes made while it's read aren't missed.
+    stamp = window_stamp(data, selected_team, selected_time_window)
+
+    def compute() -> dict[str, Any]:
+        start_time = time.mktime((datetime.datetime.now() - pd.to_timedelta(selected_time_window)).timetuple())
+        end_time = time.mktime(datetime.datetime.now().timetuple())
+        bucket = data.choose_resolution(start_time, end_time)
+
+        df = data.query_sentiment_series(team_name=selected_team, start_time=start_time,
+                                         end_time=end_time, bucket=bucket, fill_empty=True)
+        with FIGURE_LOCK:
+            figure = build_figure(df, selected_plot_type)
+        return {'df': df, 'bucket': bucket, 'figure': figure, 'stamp': stamp}
+
+    return shared_view(data, ('line_plot', selected_team, selected_time_window,
+                              selected_plot_type), stamp, compute)
+
+
+def render(app: Dash, data: Comment, views: ViewRefresher) -> html.Div:
     """
-    Generates a Graph object containing a line plot of comment sentiment over time.
+    Generates a Graph object containing a line plot of comment sentiment over time, along with
+    a store of the points the browser has.
 
     Args:
         app: Dash application
         data: Comment object encapsulating database interaction methods.
+        views: The precomputed views.
 
     Returns:
-        dcc.Graph: Graph object containing line plot information.
+        html.Div: Div containing the line plot and its store.
     """
     initial_figure = go.Figure()
 
     @app.callback(
         Output(ids.LINE_PLOT, 'figure'),
+        Output(ids.LINE_PLOT_STORE, 'data'),
         Input(ids.INTERVAL_COMPONENT, 'n_intervals'),
+        Input(ids.PUSH_SIGNAL, 'data'),
         Input(ids.TEAM_DROPDOWN, 'value'),
         Input(ids.TIME_WINDOW_BUTTONS, 'value'),
-        Input(ids.PLOT_TYPE_BUTTONS, 'value')
+        Input(ids.PLOT_TYPE_BUTTONS, 'value'),
+        State(ids.LINE_PLOT_STORE, 'data')
     )
-    def update_plot(n: int, selected_team: Optional[str], selected_time_window: str,
-                     selected_plot_type: str) -> go.Figure:
+    def update_plot(n: int, pushed: Optional[dict[str, Any]], selected_team: Optional[str],
+                    selected_time_window: str, selected_plot_type: str,
+                    state: Optional[dict[str, Any]]) -> tuple[Figure, dict[str, Any]]:
         """
-        Updates the line plot based on the selected team, time window, and plot type.
+        Updates the line plot based on the selected team, time window, and plot type. Only the
+        changed points are sent while the selection stays the same, and nothing while its data
+        is unchanged.
 
         Args:
             n: Interval count (unused).
+            pushed: The latest change pushed by the server (unused).
             selected_team: The team selected from the dropdown.
             selected_time_window: The time window selected for the plot.
             selected_plot_type: The type of plot selected (individual lines or aggregated score).
+            state: The points the browser has.
 
         Returns:
-            go.Figure: Updated line plot figure.
+            The updated line plot figure or a patch of it, and the new store contents.
         """
         try:
-            start_time = time.mktime((datetime.datetime.now() - pd.to_timedelta(selected_time_window)).timetuple())
-            end_time = time.mktime(datetime.datetime.now().timetuple())
-
-            df = data.query_comments(team_name=selected_team, start_time=start_time, end_time=end_time)
-
-            # Convert timestamps and filter based on the selected time window
-            df['date'] = (
-                pd.to_datetime(df['timestamp'].dropna().astype(int), unit='s')
-                .dt.tz_localize('UTC')
-                .dt.tz_convert('US/Pacific')
-                .dt.floor('10Min')
-                .dt.tz_localize(None)
-            )
-
-            if selected_plot_type == 'individual':
-                df_count = (df.groupby(['date', 'sentiment_id'], as_index=False)['id']
-                            .count().rename(columns={'id': 'count'}))
-
-                fig = px.line(
-                    df_count,
-                    x='date',
-                    y='count',
-                    color='sentiment_id',
-                    template='simple_white',
-                    color_discrete_map={
-                        'positive': '#98df8a',
-                        'negative': '#e37777',
-                        'neutral': '#b0b0b0'
-                    },
-                    markers=True
-                )
-
-                fig.update_yaxes(title_text='Comment Count', showgrid=True, gridwidth=1,
-                                 gridcolor='LightGrey')
-                fig.update_xaxes(title='Date and Time')
-
-            else:
-                df['sentiment_score'] = df['sentiment_id'].map({
-                    'positive': 1,
-                    'negative': -1,
-                    'neutral': 0
-                })
-
-                df_count = df.groupby(['date'], as_index=False)['sentiment_score'].sum()
-
-                fig = px.line(
-                    df_count,
-                    x='date',
-                    y='sentiment_score',
-                    template='simple_white',
-                    markers=True
-                )
-
-                fig.update_yaxes(title_text='Sentiment Score', showgrid=True, gridwidth=1,
-                                 gridcolor='LightGrey')
-                fig.update_xaxes(title='Date and Time')
-                fig.add_hline(y=0, line_width=3, line_dash='dash', line_color='red')
-
-            fig.update_layout(margin=dict(l=10, r=10, t=10, b=10))
-            return fig
-
+            key = [selected_team, selected_time_window, selected_plot_type]
+            if is_unchanged(state, key, window_stamp(data, selected_team, selected_time_window)):
+                raise PreventUpdate
+            view = views.get(('line_plot', selected_team, selected_time_window,
+                              selected_plot_type),
+                             lambda: compute_view(data, selected_team, selected_time_window,
+                                                  selected_plot_type),
+                             lambda view: is_current(view, data, selected_team,
+                                                     selected_time_window))
+
+            columns = (['positive', 'negative', 'neutral'] if selected_plot_type == 'individual'
+                       else ['net_score'])
+            return update_series_figure(view['df'], state, key, view['bucket'], columns,
+                                        lambda df: view['figure'], view['stamp'])
+
+        except PreventUpdate:
+            raise
         except Exception as e:
             logger.error("Error updating sentiment plot: %s", e)
-            return go.Figure()
+            return go.Figure(), None
 
-    return dcc.Graph(id=ids.LINE_PLOT, figure=initial_figure)
+    return html.Div([dcc.Graph(id=ids.LINE_PLOT, figure=initial_figure),
+                     dcc.Store(id=ids.LINE_PLOT_STORE)])
@@ -5,76 +5,146 @@ Defines a pie chart showing sentiment distribution.
 import logging
 import time
 import datetime
-from typing import Optional
+from typing import Any, Optional
 import plotly.graph_objects as go
 import plotly.express as px
-from dash import Dash, dcc
-from dash.dependencies import Input, Output
+from dash import Dash, dcc, html
+from dash.exceptions import PreventUpdate
+from dash.dependencies import Input, Output, State
 import pandas as pd
 from data.source import Comment
+from data.view_refresher import ViewRefresher
 from . import ids
+from .incremental import (FIGURE_LOCK, Figure, is_current, is_unchanged, shared_view,
+                          update_values_figure, window_stamp)
+
+SENTIMENTS = ['positive', 'negative', 'neutral']
 
 logger = logging.getLogger(__name__)
 
-def render(app: Dash, data: Comment) -> dcc.Graph:
+def build_figure(proportions: list[float]) -> go.Figure:
+    """
+    Draws the pie chart in full.
+
+    Args:
+        proportions: The share of positive, negative and neutral comments.
+
+    Returns:
+        go.Figure: The pie chart figure.
+    """
+    df_plot = pd.DataFrame({'sentiment_id': SENTIMENTS, 'proportion': proportions})
+
+    fig = px.pie(
+        df_plot,
+        values='proportion',
+        names='sentiment_id',
+        template='simple_white',
+        color='sentiment_id',
+        color_discrete_map={
+            'positive': '#98df8a',
+            'negative': '#e37777',
+            'neutral': '#b0b0b0'
+        }
+    )
+
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(showlegend=False, margin=dict(l=10, r=10, t=10, b=10))
+
+    return fig
+
+
+def compute_view(data: Comment, selected_team: Optional[str],
+                 selected_time_window: str) -> dict[str, Any]:
+    """
+    Computes the sentiment shares and full figure of a selection for the current time window.
+
+    Args:
+        data: Comment object encapsulating database interaction methods.
+        selected_team: The team selected from the dropdown.
+        selected_time_window: The time window selected for the plot.
+
+    Returns:
+        A dict with the shares (proportions), the full figure (figure) and the stamp of the data
+        they were computed from (stamp).
     """
-    Generates a Graph object containing a pie chart of comment sentiment distribution.
+    # Read before the series, so that writes made while it's read aren't missed.
+    stamp = window_stamp(data, selected_team, selected_time_window)
+
+    def compute() -> dict[str, Any]:
+        start_time = time.mktime((datetime.datetime.now() - pd.to_timedelta(selected_time_window)).timetuple())
+        end_time = time.mktime(datetime.datetime.now().timetuple())
+
+        df = data.query_sentiment_series(team_name=selected_team, start_time=start_time,
+                                         end_time=end_time)
+
+        totals = df[SENTIMENTS].sum()
+        total = int(totals.sum())
+        proportions = [int(count) / total if total else 0 for count in totals]
+        with FIGURE_LOCK:
+            figure = build_figure(proportions)
+        return {'proportions': proportions, 'figure': figure, 'stamp': stamp}
+
+    return shared_view(data, ('pie_chart', selected_team, selected_time_window), stamp, compute)
+
+
+def render(app: Dash, data: Comment, views: ViewRefresher) -> html.Div:
+    """
+    Generates a Graph object containing a pie chart of comment sentiment distribution, along
+    with a store of what the browser has.
 
     Args:
         app: Dash application.
         data: Comment object encapsulating database interaction methods.
+        views: The precomputed views.
 
     Returns:
-        dcc.Graph: Graph object containing pie chart information.
+        html.Div: Div containing the pie chart and its store.
     """
     initial_figure = go.Figure()
 
     @app.callback(
         Output(ids.PIE_CHART, 'figure'),
+        Output(ids.PIE_CHART_STORE, 'data'),
         Input(ids.INTERVAL_COMPONENT, 'n_intervals'),
+        Input(ids.PUSH_SIGNAL, 'data'),
         Input(ids.TEAM_DROPDOWN, 'value'),
-        Input(ids.TIME_WINDOW_BUTTONS, 'value')
+        Input(ids.TIME_WINDOW_BUTTONS, 'value'),
+        State(ids.PIE_CHART_STORE, 'data')
     )
-    def update_plot(n: int, selected_team: Optional[str], selected_time_window: str) -> go.Figure:
+    def update_plot(n: int, pushed: Optional[dict[str, Any]], selected_team: Optional[str],
+                    selected_time_window: str,
+                    state: Optional[dict[str, Any]]) -> tuple[Figure, dict[str, Any]]:
         """
-        Updates the pie chart based on the selected team.
+        Updates the pie chart based on the selected team. Only the values are sent while the
+        selection stays the same, and nothing while its data is unchanged.
 
         Args:
             n: Interval count (unused).
+            pushed: The latest change pushed by the server (unused).
             selected_team: The team selected from the dropdown.
+            selected_time_window: The time window selected for the plot.
+            state: What the browser has.
 
         Returns:
-            go.Figure: Updated pie chart figure.
+            The updated pie chart figure or a patch of it, and the new store contents.
         """
         try:
-            start_time = time.mktime((datetime.datetime.now() - pd.to_timedelta(selected_time_window)).timetuple())
-            end_time = time.mktime(datetime.datetime.now().timetuple())
-
-            df = data.query_comments(team_name=selected_team, start_time=start_time, end_time=end_time)
-
-            df_plot = pd.DataFrame(df['sentiment_id'].value_counts(normalize=True)).reset_index()
-            df_plot.columns = ['sentiment_id', 'proportion']
-
-            fig = px.pie(
-                df_plot,
-                values='proportion',
-                names='sentiment_id',
-                template='simple_white',
-                color='sentiment_id',
-                color_discrete_map={
-                    'positive': '#98df8a',
-                    'negative': '#e37777',
-                    'neutral': '#b0b0b0'
-                }
-            )
-
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            fig.update_layout(showlegend=False, margin=dict(l=10, r=10, t=10, b=10))
+            key = [selected_team, selected_time_window]
+            if is_unchanged(state, key, window_stamp(data, selected_team, selected_time_window)):
+                raise PreventUpdate
+            view = views.get(('pie_chart', selected_team, selected_time_window),
+                             lambda: compute_view(data, selected_team, selected_time_window),
+                             lambda view: is_current(view, data, selected_team,
+                                                     selected_time_window))
 
-            return fig
+            return update_values_figure(view['proportions'], state, key,
+                                        lambda: view['figure'], view['stamp'])
 
+        except PreventUpdate:
+            raise
         except Exception as e:
             logger.error("Error updating pie chart: %s", e)
-            return go.Figure()
+            return go.Figure(), None
 
-    return dcc.Graph(id=ids.PIE_CHART, figure=initial_figure)
+    return html.Div([dcc.Graph(id=ids.PIE_CHART, figure=initial_figure),
+                     dcc.Store(id=ids.PIE_CHART_STORE)])
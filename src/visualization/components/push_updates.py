@@ -0,0 +1,30 @@
+"""
+Defines the stores and client-side subscription used to push updates to the dashboard.
+"""
+
+from dash import ClientsideFunction, Dash, dcc, html
+from dash.dependencies import Input, Output
+from . import ids
+
+
+def render(app: Dash, enabled: bool) -> html.Div:
+    """
+    Renders the push signal store that chart callbacks listen to and, when push updates are
+    enabled, subscribes the browser to server-sent change events for the selected team (see
+    assets/push.js). Polling with the refresh interval remains the fallback.
+
+    Args:
+        app: Dash application.
+        enabled: Whether push updates are enabled.
+
+    Returns:
+        html.Div: A Div containing the push stores.
+    """
+    if enabled:
+        app.clientside_callback(
+            ClientsideFunction(namespace='push', function_name='subscribe'),
+            Output(ids.PUSH_SUBSCRIPTION, 'data'),
+            Input(ids.TEAM_DROPDOWN, 'value')
+        )
+
+    return html.Div([dcc.Store(id=ids.PUSH_SIGNAL), dcc.Store(id=ids.PUSH_SUBSCRIPTION)])
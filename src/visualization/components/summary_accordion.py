@@ -3,23 +3,63 @@ Defines a group of summary topics and associated details.
 """
 
 import logging
-from typing import Optional
+from typing import Any, Optional
 from dash import Dash, dcc, html
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
 import pandas as pd
 from data.source import Comment
+from data.view_refresher import ViewRefresher
 from . import ids
 
 logger = logging.getLogger(__name__)
 
-def render(app: Dash, data: Comment) -> html.Div:
+def build_accordion(topics: list[dict[str, str]]) -> dbc.Accordion:
+    """Builds the accordion of a summary's topics, each with a title and description."""
+    if not topics:
+        return dbc.Accordion([dbc.AccordionItem("No data available", title="No Topics")])
+    accordion_items = [
+        dbc.AccordionItem(topic['description'], title=topic['title'])
+        for topic in topics
+    ]
+    return dbc.Accordion(accordion_items, start_collapsed=True, flush=True)
+
+
+def compute_view(data: Comment, selected_team: Optional[str]) -> dict[str, Any]:
+    """
+    Builds the accordion of a team's most recent summary. Only its topics are shared between
+    server processes; the accordion is built by each.
+
+    Args:
+        data: Comment object encapsulating database interaction methods.
+        selected_team: The team selected from the dropdown.
+
+    Returns:
+        A dict with the accordion of summary topics (accordion) and the team's version when it
+        was built (version).
+    """
+    version = data.get_version(selected_team)
+
+    def compute() -> list[dict[str, str]]:
+        df = data.get_most_recent_summary(team_name=selected_team)
+        return [{'title': item['Title'], 'description': item['Description']}
+                for _, item in df.iterrows()]
+
+    if version is None:
+        topics = compute()
+    else:
+        topics = data.shared(('view', 'summary_accordion', selected_team, version), compute)
+    return {'accordion': build_accordion(topics), 'version': version}
+
+
+def render(app: Dash, data: Comment, views: ViewRefresher) -> html.Div:
     """
     Renders the Accordion component for summary topics and associated details.    
 
     Args:
         app: Dash application
         data: Comment object encapsulating database interaction methods.
+        views: The precomputed views.
 
     Returns:
         dcc.Graph: Graph object containing line plot information.
@@ -28,31 +68,28 @@ def render(app: Dash, data: Comment) -> html.Div:
     @app.callback(
         Output(ids.SUMMARY_ACCORDION, 'children'),
         Input(ids.INTERVAL_COMPONENT, 'n_intervals'),
+        Input(ids.PUSH_SIGNAL, 'data'),
         Input(ids.TEAM_DROPDOWN, 'value'),
     )
-    def update_plot(n: int, selected_team: Optional[str]) -> html.Div:
+    def update_plot(n: int, pushed: Optional[dict[str, Any]],
+                    selected_team: Optional[str]) -> html.Div:
         """
         Updates the accordion based on the chosen team.
 
         Args:
             n: Interval count (unused).
+            pushed: The latest change pushed by the server (unused).
             selected_team: The team selected from the dropdown.
 
         Returns:
             html.Div: The updated Div component
         """
         try:
-
-            df = data.get_most_recent_summary(team_name=selected_team)
-
-            if df.empty:
-                return dbc.Accordion([dbc.AccordionItem("No data available", title="No Topics")])
-
-            accordion_items = [
-                dbc.AccordionItem(item['Description'], title=item['Title']) 
-                for _, item in df.iterrows()
-            ]
-            return dbc.Accordion(accordion_items, start_collapsed=True, flush=True)
+            view = views.get(('summary_accordion', selected_team),
+                             lambda: compute_view(data, selected_team),
+                             lambda view: (view['version'] is not None and
+                                           view['version'] == data.get_version(selected_team)))
+            return view['accordion']
 
         except Exception as e:
             logger.error("Error updating sentiment plot: %s", e)
@@ -0,0 +1,69 @@
+"""Defines a reader for the Parquet archive of aged Reddit comments."""
+
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+from urllib.parse import quote
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class CommentArchive:
+    """
+    Encapsulates the Parquet archive written by the archive Lambda. Files are laid out as
+    team=<team>/date=<YYYY-MM-DD>/part-*.parquet, so queries only list and open the files for
+    the requested team and days, and only the requested columns are read.
+    """
+
+    def __init__(self, uri: str, endpoint_override: Optional[str] = None):
+        """
+        Args:
+            uri: The archive location, a local path or an s3:// URI.
+            endpoint_override: Endpoint of an S3-compatible service to use instead of AWS.
+        """
+        if uri.startswith('s3://'):
+            self.filesystem = pafs.S3FileSystem(endpoint_override=endpoint_override,
+                                                region=os.getenv('AWS_REGION'))
+            self.base_path = uri.removeprefix('s3://').rstrip('/')
+        else:
+            self.filesystem, path = pafs.FileSystem.from_uri(
+                uri if '://' in uri else os.path.abspath(uri))
+            self.base_path = path.rstrip('/')
+
+    def query_comments(self, team_name: str, start_time: float, end_time: float,
+                       columns: Sequence[str] = ('id', 'timestamp', 'sentiment_id')
+                       ) -> pd.DataFrame:
+        """
+        Queries the archive for comments by team name and timeframe.
+
+        Args:
+            team_name: The name of the team to query.
+            start_time: The start of the time window, in epoch seconds.
+            end_time: The end of the time window, in epoch seconds.
+            columns: The columns to read.
+
+        Returns:
+            pd.DataFrame: Dataframe containing the result of the query.
+        """
+        team_path = f"{self.base_path}/team={quote(team_name, safe='')}"
+        if self.filesystem.get_file_info(team_path).type == pafs.FileType.NotFound:
+            return pd.DataFrame(columns=list(columns))
+
+        dataset = ds.dataset(team_path, filesystem=self.filesystem, format='parquet',
+                             partitioning='hive')
+        first_day = datetime.fromtimestamp(int(start_time), tz=timezone.utc).strftime('%Y-%m-%d')
+        last_day = datetime.fromtimestamp(int(end_time), tz=timezone.utc).strftime('%Y-%m-%d')
+        # The date filter prunes whole partitions; the timestamp filter is pushed down to the
+        # Parquet row group statistics.
+        predicate = ((ds.field('date') >= first_day) & (ds.field('date') <= last_day) &
+                     (ds.field('timestamp') >= int(start_time)) &
+                     (ds.field('timestamp') <= int(end_time)))
+        df = dataset.to_table(columns=list(columns), filter=predicate).to_pandas()
+        # A retried archive run can leave a comment in two files.
+        return df.drop_duplicates(subset='id') if 'id' in df else df
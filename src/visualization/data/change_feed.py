@@ -0,0 +1,176 @@
+"""
+Tells connected dashboards when a team has new data. One thread per process watches the teams that
+have subscribers, reading every team's change marker in one round trip, and notifies the team's
+subscribers only when its marker changes, so the cost of watching doesn't grow with the number of
+viewers.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class Subscription:
+    """A subscriber's queue of change notifications for one team."""
+
+    def __init__(self, team_name: str):
+        self.team_name = team_name
+        # Only the latest change matters, so at most one notification is kept.
+        self.changes: queue.Queue = queue.Queue(maxsize=1)
+
+    def notify(self, marker: str) -> None:
+        """Queues a change, replacing one that hasn't been sent yet."""
+        try:
+            self.changes.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self.changes.put_nowait(marker)
+        except queue.Full:
+            pass
+
+
+class ChangeFeed:
+    """
+    Watches teams for new data and notifies their subscribers.
+
+    Args:
+        read_markers: Reads the change marker of each of the given teams.
+        on_change: Called with a team's name when it changes, before its subscribers are
+            notified, e.g. to refresh what they will read.
+        interval: The seconds between checks.
+        min_notify_seconds: The least time between two events sent to a subscriber, so that a
+            busy team refreshes its viewers no more often than polling would. Changes in
+            between are sent together.
+        keepalive_seconds: How often an idle event stream sends a comment to keep the
+            connection open.
+    """
+
+    def __init__(self, read_markers: Callable[[list[str]], dict[str, Any]],
+                 on_change: Optional[Callable[[str], None]] = None, interval: float = 2.0,
+                 min_notify_seconds: float = 10.0, keepalive_seconds: float = 15.0):
+        self.read_markers = read_markers
+        self.on_change = on_change
+        self.interval = interval
+        self.min_notify_seconds = min_notify_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.subscriptions: dict[str, set[Subscription]] = {}
+        self.markers: dict[str, Any] = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.checks = 0
+        self.notifications = 0
+
+    @classmethod
+    def from_env(cls, read_markers: Callable[[list[str]], dict[str, Any]],
+                 on_change: Optional[Callable[[str], None]] = None) -> 'ChangeFeed':
+        """Builds a feed from PUSH_* environment variables, using defaults if unset."""
+        return cls(read_markers, on_change=on_change,
+                   interval=float(os.getenv('PUSH_CHECK_SECONDS', '2')),
+                   min_notify_seconds=float(os.getenv('PUSH_MIN_NOTIFY_SECONDS', '10')),
+                   keepalive_seconds=float(os.getenv('PUSH_KEEPALIVE_SECONDS', '15')))
+
+    def subscribe(self, team_name: str) -> Subscription:
+        """Subscribes to a team's changes, starting the watch thread if needed."""
+        self.start()
+        subscription = Subscription(team_name)
+        with self.lock:
+            self.subscriptions.setdefault(team_name, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stops notifying a subscriber."""
+        with self.lock:
+            subscribers = self.subscriptions.get(subscription.team_name, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.subscriptions.pop(subscription.team_name, None)
+                self.markers.pop(subscription.team_name, None)
+
+    def start(self) -> None:
+        """Starts the watch thread in this process if it isn't running."""
+        with self.lock:
+            if self.pid == os.getpid() and self.thread is not None and self.thread.is_alive():
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.run, name='change-feed', daemon=True)
+            self.thread.start()
+
+    def run(self) -> None:
+        """Checks for changes every interval."""
+        while True:
+            started = time.monotonic()
+            try:
+                self.check()
+            except Exception as e:
+                logger.error("Error checking for changes: %s", e)
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def check(self) -> None:
+        """Reads the watched teams' markers and notifies the subscribers of those changed."""
+        with self.lock:
+            team_names = list(self.subscriptions)
+        if not team_names:
+            return
+        markers = self.read_markers(team_names)
+        self.checks += 1
+        with self.lock:
+            changed = {team_name: marker for team_name, marker in markers.items()
+                       if self.markers.get(team_name, marker) != marker}
+            self.markers.update(markers)
+        for team_name, marker in changed.items():
+            if self.on_change is not None:
+                try:
+                    self.on_change(team_name)
+                except Exception as e:
+                    logger.error("Error handling a change to %s: %s", team_name, e)
+            with self.lock:
+                for subscription in self.subscriptions.get(team_name, ()):
+                    subscription.notify(marker)
+                    self.notifications += 1
+
+    def stream(self, team_name: str, stop: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Yields a team's changes as server-sent events until the client disconnects.
+
+        Args:
+            team_name: The team to stream changes of.
+            stop: Ends the stream when set.
+
+        Yields:
+            str: Server-sent event lines.
+        """
+        subscription = self.subscribe(team_name)
+        try:
+            yield 'retry: 5000\n\n'
+            while stop is None or not stop.is_set():
+                try:
+                    marker = subscription.changes.get(timeout=self.keepalive_seconds)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'event: change\ndata: {team_name}\nid: {hash(marker) & 0xffffffff}\n\n'
+                if stop is not None:
+                    stop.wait(self.min_notify_seconds)
+                else:
+                    time.sleep(self.min_notify_seconds)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict[str, int]:
+        """Returns the number of teams watched, subscribers, checks and notifications sent."""
+        with self.lock:
+            return {
+                'teams': len(self.subscriptions),
+                'subscribers': sum(len(subscribers)
+                                   for subscribers in self.subscriptions.values()),
+                'checks': self.checks,
+                'notifications': self.notifications,
+            }
@@ -0,0 +1,72 @@
+"""Defines a reader for the DynamoDB table of Reddit comments."""
+
+import logging
+from typing import Sequence
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Global secondary index keyed on (team_name, timestamp). See deployment_scripts/deploy_dynamodb.sh.
+TIME_INDEX_NAME = 'team_timestamp_index'
+
+
+class CommentTable:
+    """
+    Encapsulates read access to the DynamoDB comment table, used for comments that have aged out
+    of the Redis cache but have not been archived yet.
+    """
+
+    def __init__(self, table_name: str, dyn_resource=None):
+        """
+        Args:
+            table_name: The name of the DynamoDB comment table.
+            dyn_resource: A Boto3 DynamoDB resource. Created from the environment if not given.
+        """
+        dyn_resource = dyn_resource if dyn_resource is not None else boto3.resource('dynamodb')
+        self.table = dyn_resource.Table(table_name)
+
+    def query_comments(self, team_name: str, start_time: float, end_time: float,
+                       columns: Sequence[str] = ('id', 'timestamp', 'sentiment_id')
+                       ) -> pd.DataFrame:
+        """
+        Queries the time index for comments by team name and timeframe.
+
+        Args:
+            team_name: The name of the team to query.
+            start_time: The start of the time window, in epoch seconds.
+            end_time: The end of the time window, in epoch seconds.
+            columns: The attributes to read.
+
+        Returns:
+            pd.DataFrame: Dataframe containing the result of the query.
+        """
+        names = {f'#a{i}': column for i, column in enumerate(columns)}
+        params = {
+            'IndexName': TIME_INDEX_NAME,
+            'KeyConditionExpression': (Key('team_name').eq(team_name) &
+                                       Key('timestamp').between(int(start_time), int(end_time))),
+            'ProjectionExpression': ', '.join(names),
+            'ExpressionAttributeNames': names
+        }
+        items = []
+        try:
+            while True:
+                response = self.table.query(**params)
+                items.extend(response['Items'])
+                if 'LastEvaluatedKey' not in response:
+                    break
+                params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except ClientError as err:
+            logger.error("Couldn't query comments for %s: %s, %s", team_name,
+                         err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+
+        df = pd.DataFrame(items, columns=list(columns))
+        if 'timestamp' in df:
+            df['timestamp'] = df['timestamp'].astype(int)
+        return df
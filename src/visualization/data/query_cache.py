@@ -0,0 +1,100 @@
+"""
+Defines a shared, single-flight cache for dashboard queries. Every chart callback of every open
+browser tab asks for the same data on each refresh; the cache serves repeats from memory and
+collapses identical requests made at the same time into one fetch.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+from cachetools import TTLCache
+
+
+class SingleFlightCache:
+    """
+    A thread-safe cache with a short time to live and least recently used eviction. When a
+    value is missing, the first caller loads it while concurrent callers asking for the same
+    key wait for that load instead of starting their own.
+
+    Args:
+        maxsize: The maximum number of values kept.
+        ttl: How long a value is kept, in seconds.
+        timer: The clock used for expiry.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 10.0,
+                 timer: Callable[[], float] = time.monotonic):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+        self.lock = threading.Lock()
+        self.in_flight: dict[Hashable, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for a key, loading it if needed.
+
+        Args:
+            key: The key of the value.
+            loader: Loads the value. Its errors are raised to every caller waiting on the load,
+                and nothing is cached.
+
+        Returns:
+            The value, which is shared between callers and must not be modified.
+        """
+        with self.lock:
+            try:
+                value = self.cache[key]
+                self.hits += 1
+                return value
+            except KeyError:
+                pass
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+                self.errors += 1
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self.cache[key] = value
+            del self.in_flight[key]
+        future.set_result(value)
+        return value
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drops the cached values whose keys match, returning how many were dropped."""
+        with self.lock:
+            keys = [key for key in list(self.cache.keys()) if predicate(key)]
+            for key in keys:
+                self.cache.pop(key, None)
+            return len(keys)
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the number of hits, misses, coalesced requests and errors, the share of
+        requests served without a fetch of their own, and the number of values cached."""
+        with self.lock:
+            requests = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'hit_rate': (self.hits + self.coalesced) / requests if requests else 0.0,
+                'size': len(self.cache),
+            }
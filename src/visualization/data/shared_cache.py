@@ -0,0 +1,189 @@
+"""
+Defines a cache of computed results shared by the dashboard's server processes. Each worker of a
+pre-forked server keeps its own in-memory caches and views, so without it every worker would
+compute the same views; with it, the first worker to need a result computes it and stores it in
+Redis, and the others read it from there.
+
+Results are stored as JSON, so that what is read from Redis is only ever data: figures as their
+plotly JSON, data frames as their columns and dtypes, and everything else as plain values.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Hashable, Optional
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.basedatatypes import BaseFigure
+from plotly.utils import PlotlyJSONEncoder
+import redis
+import redis.exceptions
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class ResultEncoder(PlotlyJSONEncoder):
+    """Encodes results as JSON, tagging figures and data frames so they can be rebuilt."""
+
+    def default(self, obj: Any) -> Any:
+        if isinstance(obj, BaseFigure):
+            return {'__figure__': obj.to_plotly_json()}
+        if isinstance(obj, pd.DataFrame):
+            return {'__frame__': {
+                'columns': list(obj.columns),
+                'dtypes': [str(dtype) for dtype in obj.dtypes],
+                'data': [(column.astype('int64') if pd.api.types.is_datetime64_dtype(column)
+                          else column).tolist() for _, column in obj.items()],
+            }}
+        return super().default(obj)
+
+
+def decode_object(obj: dict[str, Any]) -> Any:
+    """Rebuilds the figures and data frames tagged by ResultEncoder."""
+    if '__figure__' in obj:
+        return go.Figure(obj['__figure__'])
+    if '__frame__' in obj:
+        frame = obj['__frame__']
+        return pd.DataFrame({column: pd.Series(values).astype(dtype) for column, dtype, values
+                             in zip(frame['columns'], frame['dtypes'], frame['data'])})
+    return obj
+
+
+def dumps(value: Any) -> str:
+    """Encodes a result as JSON."""
+    return json.dumps(value, cls=ResultEncoder)
+
+
+def loads(blob: bytes) -> Any:
+    """Decodes a result encoded by dumps."""
+    return json.loads(blob, object_hook=decode_object)
+
+
+class SharedResultCache:
+    """
+    A Redis-backed cache of results stored as JSON, shared between processes. While one process
+    computes a result, others asking for it wait for it to be stored rather than computing it
+    too. Keys should change whenever their result would, such as by including the team's
+    version, as entries are only dropped once they expire.
+
+    Args:
+        client: Returns the Redis client to use, so that a client recreated after its
+            credentials expire is picked up.
+        ttl: How long a result is kept, in seconds.
+        lock_seconds: How long other processes wait for a result being computed before
+            computing it themselves.
+        prefix: The prefix of the cache's Redis keys.
+    """
+
+    def __init__(self, client: Callable[[], redis.Redis], ttl: float = 60.0,
+                 lock_seconds: float = 5.0, prefix: str = 'dashboard_cache:'):
+        self.client = client
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, client: Callable[[], redis.Redis]) -> 'SharedResultCache':
+        """
+        Builds a cache from SHARED_CACHE_* environment variables, using defaults if unset. With
+        SHARED_CACHE_URL, results are kept in that Redis instead of the given one.
+        """
+        if os.getenv('SHARED_CACHE_URL'):
+            shared_client = redis.Redis.from_url(os.getenv('SHARED_CACHE_URL'))
+
+            def client() -> redis.Redis:
+                return shared_client
+
+        return cls(client, ttl=float(os.getenv('SHARED_CACHE_TTL_SECONDS', '60')),
+                   lock_seconds=float(os.getenv('SHARED_CACHE_LOCK_SECONDS', '5')))
+
+    def redis_key(self, key: Hashable) -> str:
+        """Returns the Redis key a result is stored under."""
+        return self.prefix + hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the shared result for a key, computing and storing it if no process has.
+        Redis errors and results that can't be decoded are logged, and the result is computed
+        locally.
+
+        Args:
+            key: The key of the result. Its repr must identify it across processes.
+            loader: Computes the result, which must be made of figures, data frames and values
+                JSON can hold. Tuples are read back as lists.
+
+        Returns:
+            The result.
+        """
+        name = self.redis_key(key)
+        try:
+            value = self.read(name)
+            if value is not None:
+                self.hits += 1
+                return value
+            if not self.client().set(name + ':lock', os.getpid(), nx=True,
+                                     px=int(self.lock_seconds * 1000)):
+                self.waits += 1
+                value = self.wait(name)
+                if value is not None:
+                    self.hits += 1
+                    return value
+        except Exception as e:
+            self.errors += 1
+            logger.error("Error reading shared result %s: %s", key, e)
+            return loader()
+
+        self.misses += 1
+        try:
+            value = loader()
+        except Exception:
+            # Let waiting processes compute the result themselves rather than wait it out.
+            try:
+                self.client().delete(name + ':lock')
+            except redis.exceptions.RedisError:
+                pass
+            raise
+        try:
+            pipeline = self.client().pipeline(transaction=False)
+            pipeline.set(name, dumps(value), px=int(self.ttl * 1000))
+            pipeline.delete(name + ':lock')
+            pipeline.execute()
+        except (redis.exceptions.RedisError, TypeError, ValueError) as e:
+            self.errors += 1
+            logger.error("Error storing shared result %s: %s", key, e)
+        return value
+
+    def read(self, name: str) -> Optional[Any]:
+        """Returns the result stored under a Redis key, or None."""
+        blob = self.client().get(name)
+        return loads(blob) if blob is not None else None
+
+    def wait(self, name: str) -> Optional[Any]:
+        """Waits for another process to store a result, returning None if it doesn't in time."""
+        deadline = time.monotonic() + self.lock_seconds
+        delay = 0.005
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            value = self.read(name)
+            if value is not None:
+                return value
+            delay = min(delay * 2, 0.1)
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the number of hits, misses, waits for other processes and errors."""
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'waits': self.waits,
+            'errors': self.errors,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
@@ -2,22 +2,34 @@
 
 import logging
 from urllib.parse import ParseResult, urlencode, urlunparse
-from typing import Tuple, Union
+from typing import Optional, Tuple, Union
 import json
 import os
 import re
+import time
 import redis
+import numpy as np
 import redis.exceptions
 import botocore.session
 from botocore.model import ServiceId
 from botocore.signers import RequestSigner
 from cachetools import TTLCache, cached
 import pandas as pd
+from data.archive import CommentArchive
+from data.comment_table import CommentTable
+from data.query_cache import SingleFlightCache
+from data.shared_cache import SharedResultCache
+from data.cache_schema import (COUNTER_RESOLUTIONS, SENTIMENT_CODES, SENTIMENT_LABELS,
+                               bucket_start, counter_field, counts_key, index_key, summary_key,
+                               topics_key, version_key)
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# The sentiment labels, in the order of the count columns of a sentiment series.
+SENTIMENTS = list(SENTIMENT_CODES)
+
 
 class ElastiCacheIAMProvider(redis.CredentialProvider):
     """Class which acts as a wrapper for elasticache IAM operations."""
@@ -66,11 +78,64 @@ class ElastiCacheIAMProvider(redis.CredentialProvider):
 
 
 
+def local_seconds(timestamps: np.ndarray, tz: str) -> np.ndarray:
+    """Converts epoch timestamps to the seconds since the epoch shown on a clock in a time zone."""
+    dates = pd.to_datetime(timestamps, unit='s', utc=True).tz_convert(tz).tz_localize(None)
+    return ((dates - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+
+
 class Comment:
     """Encapsulates a Redis cache of comment data"""
 
-    def __init__(self):
+    def __init__(self, redis_client: Optional[redis.Redis] = None,
+                 comment_table: Optional[CommentTable] = None,
+                 archive: Optional[CommentArchive] = None,
+                 query_cache: Optional[SingleFlightCache] = None):
+        """
+        Comments older than the cache retention horizon are read from slower stores: DynamoDB
+        when DYNAMODB_TABLE_NAME is set, and the archive, for comments older than the archive
+        age, when ARCHIVE_URI is set.
+
+        Query results are shared through a single-flight cache. Windows are rounded down to
+        QUERY_CACHE_QUANTUM_SECONDS so that callbacks computing the same window moments apart
+        share an entry; the newest comments then show up on the next refresh. A team's cached
+        queries are dropped as soon as a change to its version is seen.
+
+        With SHARED_CACHE set to TRUE, views are also shared between server processes through
+        Redis, so that each is computed by one worker rather than by all of them.
+
+        Args:
+            redis_client: The Redis client to use. Created from the environment if not given.
+            comment_table: The DynamoDB comment table reader. Created from the environment if
+                not given.
+            archive: The comment archive reader. Created from the environment if not given.
+            query_cache: The cache for query results. Created from the environment if not
+                given.
+        """
+        self.redis_client = redis_client if redis_client is not None else self.create_redis_client()
+        self.comment_table = (comment_table if comment_table is not None
+                              else self.create_comment_table())
+        self.archive = archive if archive is not None else self.create_archive()
+        self.cache_retention_days = float(os.getenv('CACHE_RETENTION_DAYS', '30'))
+        self.archive_after_days = float(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+        self.target_points = int(os.getenv('DASHBOARD_TARGET_POINTS', '200'))
+        self.query_quantum = int(os.getenv('QUERY_CACHE_QUANTUM_SECONDS', '10'))
+        self.query_cache = (query_cache if query_cache is not None else
+                            SingleFlightCache(maxsize=int(os.getenv('QUERY_CACHE_SIZE', '256')),
+                                              ttl=float(os.getenv('QUERY_CACHE_TTL_SECONDS',
+                                                                  '10'))))
+        self.shared_cache = (SharedResultCache.from_env(lambda: self.redis_client)
+                             if os.getenv('SHARED_CACHE') == 'TRUE' else None)
+        self.versions: dict[str, Optional[int]] = {}
+
+    def reset_connections(self) -> None:
+        """
+        Replaces the Redis client, so that a forked server worker opens its own connection pool
+        rather than sharing the parent's sockets.
+        """
         self.redis_client = self.create_redis_client()
+        if self.shared_cache is not None:
+            self.shared_cache = SharedResultCache.from_env(lambda: self.redis_client)
 
     def create_redis_client(self):
         """Creates a redis client using IAM credentials."""
@@ -91,47 +156,444 @@ class Comment:
                                         ssl_cert_reqs="none")
         return redis_client
 
-    def query_comments(self, team_name:str, start_time:int, end_time:int) -> pd.DataFrame:
+    def create_comment_table(self):
+        """Creates a reader for the DynamoDB comment table if DYNAMODB_TABLE_NAME is set."""
+        if not os.getenv('DYNAMODB_TABLE_NAME'):
+            return None
+        return CommentTable(table_name=os.getenv('DYNAMODB_TABLE_NAME'))
+
+    def create_archive(self):
+        """Creates a reader for the comment archive if ARCHIVE_URI is set."""
+        if not os.getenv('ARCHIVE_URI'):
+            return None
+        return CommentArchive(uri=os.getenv('ARCHIVE_URI'),
+                              endpoint_override=os.getenv('ARCHIVE_S3_ENDPOINT'))
+
+    def quantize(self, start_time: float, end_time: float) -> Tuple[int, int]:
+        """Rounds the end of a window down to the cache quantum, keeping its length."""
+        quantum = self.query_quantum
+        length = round((end_time - start_time) / quantum) * quantum
+        end_time = int(end_time // quantum * quantum)
+        return end_time - length, end_time
+
+    def cached(self, key: tuple, loader) -> pd.DataFrame:
+        """Returns a copy of a cached query result, loading it if needed."""
+        return self.query_cache.get(key, loader).copy()
+
+    def shared(self, key: tuple, loader):
         """
-        Queries for comments by team name and timeframe.
+        Returns a result shared between server processes, computing it if no process has. The
+        key must change whenever the result would. Without SHARED_CACHE, the result is computed.
+        """
+        if self.shared_cache is None:
+            return loader()
+        return self.shared_cache.get(key, loader)
+
+    def query_cold_storage(self, team_name: str, start_time: float,
+                           end_time: float) -> pd.DataFrame:
+        """
+        Queries the slower stores for comments that are no longer cached. Comments older than
+        the archive age come from the archive, and newer ones from DynamoDB.
 
         Args:
             team_name: The name of the team to query.
             start_time: The start of the time window to get comments from.
             end_time: The end of the time window to get comments from.
-        
+
         Returns:
-            pd.DataFrame: Dataframe containing the result of the query.
+            pd.DataFrame: Dataframe with id, timestamp and sentiment_id columns.
+        """
+        frames = [pd.DataFrame(columns=['id', 'timestamp', 'sentiment_id'])]
+        archive_cutoff = time.time() - self.archive_after_days * 86400
+        if self.archive is not None and start_time < archive_cutoff:
+            frames.append(self.archive.query_comments(team_name, start_time,
+                                                      min(end_time, archive_cutoff)))
+        if self.comment_table is not None:
+            table_start = max(start_time, archive_cutoff) if self.archive else start_time
+            if table_start <= end_time:
+                frames.append(self.comment_table.query_comments(team_name, table_start,
+                                                                end_time))
+        if len(frames) == 1:
+            logger.warning("No store configured for comments older than the cache horizon.")
+        return pd.concat(frames, ignore_index=True)
+
+    def choose_resolution(self, start_time: float, end_time: float) -> int:
+        """
+        Picks the finest counter resolution that keeps a window within the target number of
+        points, DASHBOARD_TARGET_POINTS. Windows too long for any resolution use the coarsest.
+
+        Args:
+            start_time: The start of the time window.
+            end_time: The end of the time window.
+
+        Returns:
+            int: The bucket width, in seconds.
+        """
+        for resolution in COUNTER_RESOLUTIONS:
+            if (end_time - start_time) / resolution <= self.target_points:
+                return resolution
+        return COUNTER_RESOLUTIONS[-1]
+
+    def query_sentiment_counts(self, team_name: str, start_time: int, end_time: int,
+                               resolution: Optional[int] = None) -> pd.DataFrame:
+        """
+        Queries a team's bucketed sentiment counts, which the cache Lambda keeps up to date as
+        comments arrive. Only one number per bucket and sentiment is read, so the cost depends
+        on the number of buckets rather than on the number of comments in the window. Buckets
+        are read whole, so the first may include comments from shortly before start_time. The
+        part of the window older than the cache retention horizon is counted from the slower
+        stores.
+
+        Args:
+            team_name: The name of the team to query.
+            start_time: The start of the time window to count comments in.
+            end_time: The end of the time window to count comments in.
+            resolution: The bucket width, one of COUNTER_RESOLUTIONS. Chosen to fit the target
+                number of points if not given.
+
+        Returns:
+            pd.DataFrame: Dataframe with timestamp (the bucket start), sentiment_id and count
+                columns, with a row for each bucket and sentiment that has comments.
+        """
+        if resolution is None:
+            resolution = self.choose_resolution(start_time, end_time)
+        start_time, end_time = self.quantize(start_time, end_time)
+        return self.cached(('counts', team_name, start_time, end_time, resolution),
+                           lambda: self._query_sentiment_counts(team_name, start_time, end_time,
+                                                                resolution))
+
+    def _query_sentiment_counts(self, team_name: str, start_time: int, end_time: int,
+                                resolution: int) -> pd.DataFrame:
+        """Reads sentiment counts from the cache and, past the retention horizon, counts the
+        comments in the slower stores."""
+        cache_cutoff = time.time() - self.cache_retention_days * 86400
+        first_bucket = bucket_start(max(start_time, cache_cutoff), resolution)
+        buckets = range(first_bucket, bucket_start(end_time, resolution) + 1, resolution)
+        keys = [(bucket, code) for bucket in buckets for code in SENTIMENT_LABELS]
+        fields = [counter_field(bucket, code) for bucket, code in keys]
+        values = []
+        if fields:
+            try:
+                values = self.redis_client.hmget(counts_key(team_name, resolution), fields)
+            except redis.exceptions.AuthenticationError:
+                # Reinitialize connection to cache if credentials have expired.
+                self.redis_client = self.create_redis_client()
+                values = self.redis_client.hmget(counts_key(team_name, resolution), fields)
+        df = pd.DataFrame([(bucket, SENTIMENT_LABELS[code], int(value))
+                           for (bucket, code), value in zip(keys, values) if value],
+                          columns=['timestamp', 'sentiment_id', 'count'])
+
+        if start_time < cache_cutoff:
+            older = self.query_cold_storage(team_name, start_time,
+                                            min(end_time, first_bucket - 1))
+            older['timestamp'] = older['timestamp'].astype(int) // resolution * resolution
+            older = older.groupby(['timestamp', 'sentiment_id']).size().reset_index(name='count')
+            df = pd.concat([older, df], ignore_index=True)
+        return df
+
+    def query_sentiment_series(self, team_name: str, start_time: int, end_time: int,
+                               bucket: Optional[int] = None, tz: str = 'US/Pacific',
+                               fill_empty: bool = False) -> pd.DataFrame:
         """
+        Queries a team's sentiment counts and net score per time bucket, ready to chart. Counts
+        are read at the coarsest counter resolution that divides the bucket and re-bucketed with
+        integer arithmetic, so no per-chart grouping is needed.
+
+        Buckets are aligned to the clock in the given time zone, so a day bucket runs from local
+        midnight to midnight. Counts are read at a resolution that also divides the zone's UTC
+        offset, e.g. hourly for a day in US/Pacific. If none does, buckets are aligned to UTC.
+
+        Args:
+            team_name: The name of the team to query.
+            start_time: The start of the time window.
+            end_time: The end of the time window.
+            bucket: The bucket width in seconds, a multiple of the finest counter resolution.
+                Chosen to fit the target number of points if not given.
+            tz: The time zone the buckets are aligned to and the date column is given in.
+            fill_empty: Whether buckets without comments get a row of zeros, so that every
+                bucket of the window has a row.
+
+        Returns:
+            pd.DataFrame: Dataframe with one row per bucket that has comments, in order, with
+                timestamp (the bucket start, in epoch seconds), date (the bucket start, in naive
+                local time), a count column per
+                sentiment, count (the total) and net_score (positive less negative) columns.
+        """
+        if bucket is None:
+            bucket = self.choose_resolution(start_time, end_time)
+        start_time, end_time = self.quantize(start_time, end_time)
+        resolution, aligned = self.series_alignment(start_time, end_time, bucket, tz)
+        return self.cached(('series', team_name, start_time, end_time, bucket, tz, fill_empty),
+                           lambda: self._query_sentiment_series(team_name, start_time, end_time,
+                                                                bucket, resolution, tz, aligned,
+                                                                fill_empty))
+
+    @staticmethod
+    def series_alignment(start_time: int, end_time: int, bucket: int,
+                         tz: str) -> Tuple[int, bool]:
+        """Returns the counter resolution a sentiment series is read at and whether its buckets
+        are aligned to the clock in tz, which they are if a resolution dividing the bucket also
+        divides the zone's UTC offset at both ends of the window."""
+        resolutions = [resolution for resolution in COUNTER_RESOLUTIONS if bucket % resolution == 0]
+        if not resolutions:
+            raise ValueError(f'Bucket of {bucket}s is not a multiple of a counter resolution.')
+        window = np.array([start_time, end_time], dtype=np.int64)
+        offsets = local_seconds(window, tz) - window
+        local = [resolution for resolution in resolutions
+                 if all(offset % resolution == 0 for offset in offsets)]
+        return (local or resolutions)[-1], bool(local)
+
+    def last_series_bucket(self, start_time: float, end_time: float,
+                           bucket: Optional[int] = None, tz: str = 'US/Pacific') -> int:
+        """
+        Returns the number of the last bucket of the sentiment series query_sentiment_series
+        returns for a window, counted on the clock its buckets are aligned to, so that callers
+        can tell when the window slides into a new bucket.
+
+        Args:
+            start_time: The start of the time window.
+            end_time: The end of the time window.
+            bucket: The bucket width in seconds. Chosen to fit the target number of points if
+                not given.
+            tz: The time zone the buckets are aligned to.
+
+        Returns:
+            int: The bucket number.
+        """
+        if bucket is None:
+            bucket = self.choose_resolution(start_time, end_time)
+        start_time, end_time = self.quantize(start_time, end_time)
+        _, aligned = self.series_alignment(start_time, end_time, bucket, tz)
+        if aligned:
+            end_time = int(local_seconds(np.array([end_time], dtype=np.int64), tz)[0])
+        return end_time // bucket
+
+    def _query_sentiment_series(self, team_name: str, start_time: int, end_time: int,
+                                bucket: int, resolution: int, tz: str, aligned: bool,
+                                fill_empty: bool) -> pd.DataFrame:
+        """Re-buckets sentiment counts into one row per bucket, aligned to the clock in tz if
+        aligned is set, or to UTC otherwise."""
+        def clock(timestamps: np.ndarray) -> np.ndarray:
+            return local_seconds(timestamps, tz) if aligned else timestamps
+
+        counts = self._query_sentiment_counts(team_name, start_time, end_time, resolution)
+        codes = pd.Categorical(counts['sentiment_id'], categories=SENTIMENTS).codes
+        known = codes >= 0
+        codes = codes[known]
+        values = counts['count'].to_numpy(dtype=np.int64)[known]
+        buckets = clock(counts['timestamp'].to_numpy(dtype=np.int64)[known]) // bucket * bucket
+        if fill_empty:
+            first, last = clock(np.array([start_time, end_time], dtype=np.int64)) // bucket * bucket
+            starts = np.arange(first, last + 1, bucket, dtype=np.int64)
+            rows = (buckets - starts[0]) // bucket
+            inside = (rows >= 0) & (rows < len(starts))
+            rows, codes, values = rows[inside], codes[inside], values[inside]
+        else:
+            starts, rows = np.unique(buckets, return_inverse=True)
+        totals = np.zeros((len(starts), len(SENTIMENTS)), dtype=np.int64)
+        np.add.at(totals, (rows, codes), values)
+
+        if aligned:
+            dates = pd.to_datetime(starts, unit='s')
+            # Bucket starts repeated by a change back from daylight saving time take the first.
+            timestamps = ((dates.tz_localize(tz, ambiguous=np.ones(len(starts), dtype=bool),
+                                             nonexistent='shift_forward')
+                           - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1))
+            timestamps = timestamps.to_numpy(dtype=np.int64)
+        else:
+            timestamps = starts
+            dates = pd.to_datetime(starts, unit='s', utc=True).tz_convert(tz).tz_localize(None)
+        df = pd.DataFrame(totals, columns=SENTIMENTS)
+        df.insert(0, 'timestamp', timestamps)
+        df.insert(1, 'date', dates)
+        df['count'] = totals.sum(axis=1)
+        df['net_score'] = df['positive'] - df['negative']
+        return df
+
+    def query_league_counts(self, team_names: list[str], start_time: float, end_time: float,
+                            resolution: Optional[int] = None,
+                            min_buckets: int = 24) -> pd.DataFrame:
+        """
+        Totals the sentiment counts of several teams over a window. Every team's counts are
+        read with an HMGET of the window's buckets, all sent in one pipelined round trip, so
+        comparing the whole league costs about as much as reading one team. Buckets are read
+        whole, and only the part of the window within the cache retention horizon is counted.
+
+        Args:
+            team_names: The names of the teams.
+            start_time: The start of the time window to count comments in.
+            end_time: The end of the time window to count comments in.
+            resolution: The bucket width, one of COUNTER_RESOLUTIONS. If not given, the
+                coarsest that splits the window into at least `min_buckets` buckets, so that
+                few fields are read while the whole first bucket stays a small part of the
+                total.
+            min_buckets: The least number of buckets the window is read in.
+
+        Returns:
+            pd.DataFrame: Dataframe with one row per team, in the given order, with team, a count
+                column per sentiment, count (the total) and net_score (positive less negative)
+                columns.
+        """
+        if resolution is None:
+            resolution = max([resolution for resolution in COUNTER_RESOLUTIONS
+                              if (end_time - start_time) / resolution >= min_buckets],
+                             default=COUNTER_RESOLUTIONS[0])
+        cache_cutoff = time.time() - self.cache_retention_days * 86400
+        buckets = range(bucket_start(max(start_time, cache_cutoff), resolution),
+                        bucket_start(end_time, resolution) + 1, resolution)
+        codes = list(SENTIMENT_LABELS)
+        fields = [counter_field(bucket, code) for bucket in buckets for code in codes]
+
+        def read():
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for team_name in team_names:
+                pipeline.hmget(counts_key(team_name, resolution), fields)
+            return pipeline.execute()
+
+        results = []
+        if fields and team_names:
+            try:
+                results = read()
+            except redis.exceptions.AuthenticationError:
+                # Reinitialize connection to cache if credentials have expired.
+                self.redis_client = self.create_redis_client()
+                results = read()
+        counts = np.zeros((len(team_names), len(fields)), dtype=np.int64)
+        for row, values in enumerate(results):
+            counts[row] = [int(value) if value else 0 for value in values]
+        counts = counts.reshape(len(team_names), len(buckets), len(codes)).sum(axis=1)
+        df = pd.DataFrame(counts, columns=[SENTIMENT_LABELS[code] for code in codes])
+        df.insert(0, 'team', team_names)
+        df['count'] = df[SENTIMENTS].sum(axis=1)
+        df['net_score'] = df['positive'] - df['negative']
+        return df
+
+    def get_versions(self, team_names: list[str]) -> dict[str, Optional[int]]:
+        """
+        Reads the version counters of the given teams with one MGET. The cache Lambda and the
+        summarizer bump a team's version whenever they write its comments or summary.
+
+        Args:
+            team_names: The names of the teams.
+
+        Returns:
+            dict: The version of each team, or None for teams without one, such as those last
+                written before versions were kept.
+        """
+        keys = [version_key(team_name) for team_name in team_names]
         try:
-            comments = self.redis_client.zrangebyscore(f'team:{team_name}', start_time, end_time)
+            values = self.redis_client.mget(keys) if keys else []
         except redis.exceptions.AuthenticationError:
             # Reinitialize connection to cache if credentials have expired.
             self.redis_client = self.create_redis_client()
-            comments = self.redis_client.zrangebyscore(f'team:{team_name}', start_time, end_time)
-        return pd.DataFrame([json.loads(comment) for comment in comments])
-    
+            values = self.redis_client.mget(keys) if keys else []
+        versions = {team_name: int(value) if value is not None else None
+                    for team_name, value in zip(team_names, values)}
+        for team_name, version in versions.items():
+            # Cached queries read before the change would otherwise be served with the new
+            # version's stamp.
+            if team_name in self.versions and self.versions[team_name] != version:
+                self.query_cache.invalidate(lambda key: key[1] == team_name)
+            self.versions[team_name] = version
+        return versions
+
+    def get_version(self, team_name: Optional[str]) -> Optional[int]:
+        """Returns a team's version counter, or None if it has none."""
+        if not team_name:
+            return None
+        return self.get_versions([team_name])[team_name]
+
+    def get_change_markers(self, team_names: list[str]) -> dict[str, str]:
+        """
+        Returns a marker for each team that changes whenever a comment or summary is added.
+        This is the team's version where it has one; otherwise the newest index member and
+        the start of the newest summary's window are read instead, in one more round trip.
+
+        Args:
+            team_names: The names of the teams.
+
+        Returns:
+            dict: The marker of each team.
+        """
+        versions = self.get_versions(team_names)
+        markers = {team_name: repr(version) for team_name, version in versions.items()
+                   if version is not None}
+        unversioned = [team_name for team_name in team_names if team_name not in markers]
+        if not unversioned:
+            return markers
+
+        def read():
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for team_name in unversioned:
+                pipeline.zrevrange(index_key(team_name), 0, 0, withscores=True)
+                pipeline.zrevrange(topics_key(team_name), 0, 0, withscores=True)
+            return pipeline.execute()
+
+        try:
+            results = read()
+        except redis.exceptions.AuthenticationError:
+            # Reinitialize connection to cache if credentials have expired.
+            self.redis_client = self.create_redis_client()
+            results = read()
+        for i, team_name in enumerate(unversioned):
+            comments, summaries = results[2 * i], results[2 * i + 1]
+            markers[team_name] = repr((comments[0] if comments else None,
+                                       summaries[0][1] if summaries else None))
+        return markers
 
     def get_most_recent_summary(self, team_name:str) -> pd.DataFrame:
         """
-        Returns the most recent summary the specified team.
+        Returns the topics of the most recent summary for the specified team. Summaries are
+        stored already parsed into topics, so only the newest entry is read. Teams with no
+        structured summary yet fall back to parsing the older text summaries.
+
+        Args:
+            team_name: The name of the team to query.
+        
+        Returns:
+            pd.DataFrame: Dataframe with Rank, Title, Description and timestamp columns.
+        """
+        return self.cached(('summary', team_name, int(time.time() // self.query_quantum)),
+                           lambda: self._get_most_recent_summary(team_name))
+
+    def _get_most_recent_summary(self, team_name: str) -> pd.DataFrame:
+        """Reads the newest structured summary, or the older text summaries."""
+        try:
+            entries = self.redis_client.zrevrange(topics_key(team_name), 0, 0)
+        except redis.exceptions.AuthenticationError:
+            # Reinitialize connection to cache if credentials have expired.
+            self.redis_client = self.create_redis_client()
+            entries = self.redis_client.zrevrange(topics_key(team_name), 0, 0)
+        if not entries:
+            return self.get_most_recent_text_summary(team_name)
+
+        entry = json.loads(entries[0])
+        topics = entry['topics'] or [{'rank': 1, 'title': 'Summary',
+                                      'description': entry.get('summary', '')}]
+        df = pd.DataFrame(topics[:6]).rename(columns={'rank': 'Rank', 'title': 'Title',
+                                                      'description': 'Description'})
+        df['timestamp'] = entry['window_start']
+        return df
+
+    def get_most_recent_text_summary(self, team_name:str) -> pd.DataFrame:
+        """
+        Returns the most recent summary the specified team, parsed from the text summaries
+        written before summaries were stored as topics.
 
         Args:
             team_name: The name of the team to query.
-            start_time: The start of the time window to get comments from.
-            end_time: The end of the time window to get comments from.
         
         Returns:
             pd.DataFrame: Dataframe containing the result of the query.
         """
         try:
-            summaries = self.redis_client.zrevrangebyscore(f'team_summary:{team_name}', 9027050936,
+            summaries = self.redis_client.zrevrangebyscore(summary_key(team_name), 9027050936,
                                                            1007052007, withscores=True,
                                                             start=0, num=3)
         except redis.exceptions.AuthenticationError:
             # Reinitialize connection to cache if credentials have expired.
             self.redis_client = self.create_redis_client()
-            summaries = self.redis_client.zrevrangebyscore(f'team_summary:{team_name}', 9027050936,
+            summaries = self.redis_client.zrevrangebyscore(summary_key(team_name), 9027050936,
                                                            1007052007, withscores=True,
                                                             start=0, num=3)
         df = pd.DataFrame()
@@ -148,6 +610,8 @@ class Comment:
             
             df = pd.concat([df, _df], axis=0)
 
+        if df.empty:
+            return df
         return df.reset_index().sort_values(by='timestamp', ascending=False).iloc[0:6]
 
 
@@ -0,0 +1,161 @@
+"""
+Precomputes dashboard views in the background. The dashboard has a fixed number of views, one per
+team, time window and plot type, so each view in use is recomputed on a schedule by one thread
+rather than by every viewer's callback; callbacks then read the latest result from memory.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class View:
+    """
+    The latest value of a view, how to compute it, and when it was last asked for. Its lock is
+    held while it's recomputed and stored, so that refreshes from different threads run one
+    after the other and an older computation can't overwrite a newer one.
+    """
+
+    def __init__(self, loader: Callable[[], Any], value: Any, now: float,
+                 is_current: Optional[Callable[[Any], bool]] = None):
+        self.loader = loader
+        self.is_current = is_current
+        self.value = value
+        self.computed_at = now
+        self.requested_at = now
+        self.lock = threading.Lock()
+
+
+class ViewRefresher:
+    """
+    Serves views from memory and recomputes those requested recently on a schedule.
+
+    A view is computed on the request that first asks for it, after which a background thread
+    recomputes it every `interval` seconds until nobody has asked for it for `active_seconds`.
+    Views that can tell cheaply whether their data changed, such as by the team's version, are
+    only recomputed when it did.
+    The thread is started on first use in each process, so it also runs in forked server
+    workers.
+
+    Args:
+        interval: The seconds between refreshes. With 0, views are computed on each request.
+        active_seconds: How long a view is kept up to date after it was last requested.
+        timer: The clock used for scheduling.
+    """
+
+    def __init__(self, interval: float = 10.0, active_seconds: float = 300.0,
+                 timer: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.active_seconds = active_seconds
+        self.timer = timer
+        self.views: dict[Hashable, View] = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.refreshes = 0
+        self.skipped = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> 'ViewRefresher':
+        """Builds a refresher from VIEW_* environment variables, using defaults if unset."""
+        return cls(interval=float(os.getenv('VIEW_REFRESH_SECONDS', '10')),
+                   active_seconds=float(os.getenv('VIEW_ACTIVE_SECONDS', '300')))
+
+    def get(self, key: Hashable, loader: Callable[[], Any],
+            is_current: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Returns the latest value of a view, computing it if it isn't being kept.
+
+        Args:
+            key: The key of the view, such as its chart, team and time window.
+            loader: Computes the view. It's called without arguments, so it should work out
+                the current time window itself.
+            is_current: Tells whether a computed value is still up to date, in which case a
+                refresh keeps it rather than calling the loader.
+
+        Returns:
+            The view, which is shared between callers and must not be modified.
+        """
+        if self.interval <= 0:
+            return loader()
+        self.start()
+        now = self.timer()
+        with self.lock:
+            view = self.views.get(key)
+            if view is not None:
+                view.requested_at = now
+                return view.value
+        value = loader()
+        with self.lock:
+            self.views.setdefault(key, View(loader, value, now, is_current))
+        return value
+
+    def start(self) -> None:
+        """Starts the refresh thread in this process if it isn't running."""
+        with self.lock:
+            if self.pid == os.getpid() and self.thread is not None and self.thread.is_alive():
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.run, name='view-refresher', daemon=True)
+            self.thread.start()
+
+    def run(self) -> None:
+        """Refreshes the active views every interval."""
+        while True:
+            started = self.timer()
+            self.refresh()
+            time.sleep(max(0.0, self.interval - (self.timer() - started)))
+
+    def refresh(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> None:
+        """
+        Recomputes the views requested recently, and stops keeping the others. It may be
+        called from several threads, such as the refresh thread and a change feed.
+
+        Args:
+            predicate: Limits the refresh to the views whose keys match, such as those of a
+                team that has new data.
+        """
+        now = self.timer()
+        with self.lock:
+            for key in [key for key, view in self.views.items()
+                        if now - view.requested_at > self.active_seconds]:
+                del self.views[key]
+            views = [(key, view) for key, view in self.views.items()
+                     if predicate is None or predicate(key)]
+        for key, view in views:
+            with view.lock:
+                try:
+                    if view.is_current is not None and view.is_current(view.value):
+                        view.computed_at = self.timer()
+                        self.skipped += 1
+                        continue
+                    value = view.loader()
+                except Exception as e:
+                    self.errors += 1
+                    logger.error("Error refreshing view %s: %s", key, e)
+                    continue
+                view.value = value
+                view.computed_at = self.timer()
+                self.refreshes += 1
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the number of views kept, refreshes, refreshes skipped as nothing changed and
+        errors, and the oldest view's age.
+        """
+        now = self.timer()
+        with self.lock:
+            return {
+                'views': len(self.views),
+                'refreshes': self.refreshes,
+                'skipped': self.skipped,
+                'errors': self.errors,
+                'oldest_seconds': max((now - view.computed_at for view in self.views.values()),
+                                      default=0.0),
+            }
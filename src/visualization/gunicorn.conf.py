@@ -0,0 +1,35 @@
+"""
+Serves the dashboard in production with gunicorn, from src/visualization:
+
+    gunicorn --config gunicorn.conf.py application:application
+
+The app is loaded once and forked into DASHBOARD_WORKERS processes, each serving requests on
+DASHBOARD_THREADS threads. Every worker opens its own Redis connection pool after the fork. Set
+SHARED_CACHE to TRUE so that workers share computed views through Redis instead of each computing
+them. Without it, workers answer a browser from views of different ages, and charts are then
+redrawn in full rather than patched. With DASHBOARD_PUSH, each open event stream holds a thread, so size DASHBOARD_THREADS for
+the viewers a worker serves.
+"""
+
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8050')}"
+workers = int(os.getenv('DASHBOARD_WORKERS', str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = 'gthread'
+threads = int(os.getenv('DASHBOARD_THREADS', '8'))
+preload_app = True
+# Workers that stop responding for this long are restarted. Event streams are not affected,
+# as gthread workers keep responding while requests run.
+timeout = int(os.getenv('DASHBOARD_WORKER_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.getenv('DASHBOARD_ACCESS_LOG')
+
+
+def post_fork(server, worker):
+    """Gives each worker its own Redis connections rather than the parent's."""
+    application = worker.app.wsgi()
+    comment_table = application.extensions.get('comment_table')
+    if comment_table is not None:
+        comment_table.reset_connections()
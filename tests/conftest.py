@@ -0,0 +1,11 @@
+"""
+Adds the Lambda and dashboard source directories to the import path. Both are deployed as flat
+directories, so their modules import each other by bare name.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in ('src/processing', 'src/visualization'):
+    sys.path.insert(0, os.path.join(ROOT, path))
@@ -0,0 +1,93 @@
+from decimal import Decimal
+from moto import mock_aws
+import boto3
+import fakeredis
+from src.processing.comment_table import Comment
+from archive_lambda_handler import archive_team, trim_cache
+from comment_archive import CommentArchive as ArchiveWriter
+from data.archive import CommentArchive as ArchiveReader
+
+DAY = 86400
+
+@mock_aws
+def test_archive_team(tmp_path):
+    """
+    Tests moving aged comments from DynamoDB and Redis into the archive and reading them back.
+    """
+    dynamodb = boto3.resource('dynamodb', region_name='us-west-1')
+    dynamodb.create_table(
+        TableName='comment_data',
+        KeySchema=[
+            {'AttributeName': 'team_name', 'KeyType': 'HASH'},
+            {'AttributeName': 'comment_id_timestamp', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'team_name', 'AttributeType': 'S'},
+            {'AttributeName': 'comment_id_timestamp', 'AttributeType': 'S'},
+            {'AttributeName': 'timestamp', 'AttributeType': 'N'}
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'team_timestamp_index',
+            'KeySchema': [
+                {'AttributeName': 'team_name', 'KeyType': 'HASH'},
+                {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+            'ProvisionedThroughput': {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+        }],
+        ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+    )
+    comment_table = Comment(dyn_resource=dynamodb)
+    comment_table.exists('comment_data')
+    redis_client = fakeredis.FakeRedis()
+
+    # Four comments over three days, the last of which is after the cutoff.
+    timestamps = [10 * DAY + 100, 10 * DAY + 200, 11 * DAY + 100, 13 * DAY]
+    for i, timestamp in enumerate(timestamps):
+        comment_table.add_comment(data={
+            'team': 'aston villa', 'timestamp': timestamp, 'label': 'positive',
+            'score': Decimal('0.75'), 'id': f'c{i}', 'name': 'n', 'author': 'a',
+            'body': f'body {i}', 'upvotes': i, 'downvotes': 0, 'subreddit': 'avfc'
+        })
+        redis_client.zadd('team:aston villa', {f'c{i}:p': timestamp})
+        redis_client.hset('team_comments:aston villa', f'c{i}', '{}')
+
+    archived = archive_team('aston villa', 12 * DAY, comment_table, ArchiveWriter(str(tmp_path)),
+                            redis_client)
+
+    assert archived == 3
+    assert [int(item['timestamp']) for item in comment_table.query_range(
+        'aston villa', 0, 20 * DAY)] == [13 * DAY]
+    assert redis_client.zrange('team:aston villa', 0, -1) == [b'c3:p']
+    assert redis_client.hkeys('team_comments:aston villa') == [b'c3']
+
+    reader = ArchiveReader(str(tmp_path))
+    df = reader.query_comments('aston villa', 10 * DAY + 150, 12 * DAY,
+                               columns=('id', 'timestamp', 'body'))
+    assert df['id'].tolist() == ['c1', 'c2']
+    assert df['body'].tolist() == ['body 1', 'body 2']
+    assert reader.query_comments('chelsea', 0, 20 * DAY).empty
+
+
+
+def test_trim_cache_removes_old_comments_in_batches():
+    """
+    Tests that the cache is trimmed a bounded batch at a time, until no comment older than the
+    cutoff is left.
+    """
+    redis_client = fakeredis.FakeRedis()
+    for i in range(7):
+        redis_client.zadd('team:arsenal', {f'c{i}:p': DAY + i})
+        redis_client.hset('team_comments:arsenal', f'c{i}', '{}')
+    commands = []
+    zrangebyscore = redis_client.zrangebyscore
+
+    def record(*args, **kwargs):
+        commands.append(kwargs.get('num'))
+        return zrangebyscore(*args, **kwargs)
+
+    redis_client.zrangebyscore = record
+    assert trim_cache(redis_client, 'arsenal', DAY + 5, batch=2) == 5
+    assert commands == [2, 2, 2]
+    assert redis_client.zrange('team:arsenal', 0, -1) == [b'c5:p', b'c6:p']
+    assert sorted(redis_client.hkeys('team_comments:arsenal')) == [b'c5', b'c6']
@@ -0,0 +1,195 @@
+import json
+import time
+import fakeredis
+from cache_lambda_handler import lambda_handler
+
+NOW = int(time.time())
+
+
+def make_record(team: str, comment_id: str, timestamp: int, sentiment: str = 'positive',
+                event_name: str = 'INSERT') -> dict:
+    """Builds a DynamoDB Stream record for a comment."""
+    return {
+        'eventID': f'{comment_id}-{event_name}',
+        'eventName': event_name,
+        'dynamodb': {
+            'Keys': {'team_name': {'S': team},
+                     'comment_id_timestamp': {'S': f'{comment_id}{timestamp}'}},
+            'NewImage': {
+                'sentiment_score': {'N': '0.9'}, 'sentiment_id': {'S': sentiment},
+                'upvotes': {'N': '3'}, 'author': {'S': 'author'}, 'name': {'S': 'name'},
+                'id': {'S': comment_id}, 'body': {'S': 'body'}, 'downvotes': {'N': '0'},
+                'subreddit': {'S': 'soccer'}, 'timestamp': {'N': str(timestamp)}
+            }
+        }
+    }
+
+
+def test_lambda_handler_pipelines_writes():
+    """
+    Tests that a batch is written to the per-team sorted sets with one round trip, plus one to
+    plan retention trimming.
+    """
+    redis_client = fakeredis.FakeRedis()
+    records = [make_record('arsenal', f'a{i}', NOW + i) for i in range(5)]
+    records += [make_record('chelsea', 'c0', NOW), make_record('chelsea', 'c0', NOW)]
+
+    commands = []
+    redis_client.pipeline = wrap_pipeline(redis_client.pipeline, commands)
+
+    result = lambda_handler({'Records': records}, {}, redis_client=redis_client)
+
+    assert result == {'written': 6, 'failed': 0}
+    assert len(commands) == 2
+    assert redis_client.zrange('team:arsenal', 0, -1) == [f'a{i}:p'.encode() for i in range(5)]
+    assert redis_client.zcard('team:chelsea') == 1
+    comment = json.loads(redis_client.hget('team_comments:arsenal', 'a3'))
+    assert comment['body'] == 'body'
+    assert comment['timestamp'] == str(NOW + 3)
+
+
+def test_lambda_handler_isolates_bad_records(monkeypatch):
+    """
+    Tests that malformed and REMOVE records don't prevent the rest of the batch from being
+    cached.
+    """
+    monkeypatch.setenv('CACHE_CHUNK_SIZE', '2')
+    redis_client = fakeredis.FakeRedis()
+    malformed = make_record('arsenal', 'bad', NOW)
+    del malformed['dynamodb']['NewImage']['body']
+    records = [make_record('arsenal', f'a{i}', NOW + i) for i in range(3)]
+    records += [malformed, make_record('arsenal', 'a0', NOW, event_name='REMOVE')]
+
+    result = lambda_handler({'Records': records}, {}, redis_client=redis_client)
+
+    assert result == {'written': 3, 'failed': 1}
+    assert redis_client.zcard('team:arsenal') == 3
+
+
+def test_lambda_handler_trims_incrementally(monkeypatch):
+    """
+    Tests that expired and excess comments are trimmed, a bounded number per invocation.
+    """
+    monkeypatch.setenv('CACHE_RETENTION_DAYS', '1')
+    monkeypatch.setenv('CACHE_RETENTION_MAX_COMMENTS', '6')
+    monkeypatch.setenv('CACHE_RETENTION_TRIM_BATCH', '3')
+    redis_client = fakeredis.FakeRedis()
+    for i in range(4):
+        redis_client.zadd('team:arsenal', {f'old{i}:p': NOW - 2 * 86400 + i})
+        redis_client.hset('team_comments:arsenal', f'old{i}', '{}')
+    for i in range(3):
+        redis_client.zadd('team:arsenal', {f'r{i}:p': NOW - 60 + i})
+
+    # A comment that is already past the horizon is not cached at all.
+    records = [make_record('arsenal', 'late', NOW - 3 * 86400),
+               make_record('arsenal', 'new', NOW)]
+    assert lambda_handler({'Records': records}, {}, redis_client=redis_client)['written'] == 1
+
+    # Only three of the four expired comments fit in this invocation's trim batch.
+    assert redis_client.zrange('team:arsenal', 0, -1) == [b'old3:p', b'r0:p', b'r1:p', b'r2:p',
+                                                          b'new:p']
+    assert sorted(redis_client.hkeys('team_comments:arsenal')) == [b'new', b'old3']
+
+    # The next invocation finishes the expired comments, then enforces the size cap.
+    records = [make_record('arsenal', f'n{i}', NOW + 1 + i) for i in range(3)]
+    lambda_handler({'Records': records}, {}, redis_client=redis_client)
+    assert redis_client.zrange('team:arsenal', 0, -1) == [b'r1:p', b'r2:p', b'new:p', b'n0:p',
+                                                          b'n1:p', b'n2:p']
+
+
+def test_lambda_handler_trims_counts_across_day_boundary(monkeypatch):
+    """
+    Tests that the counts of buckets wholly past the horizon are removed at every resolution,
+    including day buckets whose comments were all trimmed by earlier invocations.
+    """
+    monkeypatch.setenv('CACHE_RETENTION_DAYS', '1')
+    redis_client = fakeredis.FakeRedis()
+    day = NOW // 86400 * 86400
+    # Two comments on either side of a midnight, the earlier one already trimmed by the time
+    # its day bucket is wholly past the horizon.
+    first, second = day - 86400 - 60, day - 86400 + 60
+    monkeypatch.setattr(time, 'time', lambda: first + 86400 - 30)
+    lambda_handler({'Records': [make_record('arsenal', 'a0', first)]}, {},
+                   redis_client=redis_client)
+    monkeypatch.setattr(time, 'time', lambda: first + 86400 + 30)
+    lambda_handler({'Records': [make_record('arsenal', 'a1', second)]}, {},
+                   redis_client=redis_client)
+    assert redis_client.zrange('team:arsenal', 0, -1) == [b'a1:p']
+    assert redis_client.hget('team_counts:arsenal:86400', f'{day - 2 * 86400}:p') == b'1'
+
+    # Once the day before the midnight is wholly past the horizon, its counts go, even though
+    # no comment of it is left to trim; the day after keeps its counts.
+    monkeypatch.setattr(time, 'time', lambda: day)
+    lambda_handler({'Records': [make_record('arsenal', 'a2', day - 10)]}, {},
+                   redis_client=redis_client)
+    for resolution in (600, 3600, 21600, 86400):
+        buckets = {int(field.split(b':')[0]) for field in
+                   redis_client.hkeys(f'team_counts:arsenal:{resolution}')}
+        assert all(bucket + resolution > day - 86400 for bucket in buckets)
+        assert buckets == {int(bucket) for bucket in
+                           redis_client.zrange(f'team_buckets:arsenal:{resolution}', 0, -1)}
+    assert redis_client.hget('team_counts:arsenal:86400', f'{day - 86400}:p') == b'2'
+    assert redis_client.hget('team_counts:arsenal:86400', f'{day - 2 * 86400}:p') is None
+
+
+def test_lambda_handler_counts_sentiments_once():
+    """
+    Tests that sentiment counts are kept per bucket at each resolution, and that a retried
+    batch isn't counted twice or bump the team's version.
+    """
+    redis_client = fakeredis.FakeRedis()
+    bucket = NOW // 600 * 600
+    records = [make_record('arsenal', f'a{i}', bucket + i) for i in range(3)]
+    records += [make_record('arsenal', 'b0', bucket + 5, sentiment='negative'),
+                make_record('arsenal', 'c0', bucket + 600, sentiment='neutral')]
+
+    lambda_handler({'Records': records}, {}, redis_client=redis_client)
+    lambda_handler({'Records': records[2:]}, {}, redis_client=redis_client)
+
+    assert redis_client.hgetall('team_counts:arsenal:600') == {
+        f'{bucket}:p'.encode(): b'3',
+        f'{bucket}:n'.encode(): b'1',
+        f'{bucket + 600}:u'.encode(): b'1',
+    }
+    day = NOW // 86400 * 86400
+    day_counts = redis_client.hgetall('team_counts:arsenal:86400')
+    assert sum(int(count) for count in day_counts.values()) == 5
+    assert day_counts[f'{day}:p'.encode()] == b'3'
+    assert redis_client.get('team_version:arsenal') == b'1'
+
+
+def test_lambda_handler_replaces_changed_sentiment():
+    """
+    Tests that a comment whose sentiment changes keeps a single index member, and that its
+    counts move from the old sentiment to the new one.
+    """
+    redis_client = fakeredis.FakeRedis()
+    bucket = NOW // 600 * 600
+    records = [make_record('arsenal', 'a0', bucket), make_record('arsenal', 'a1', bucket + 1)]
+    lambda_handler({'Records': records}, {}, redis_client=redis_client)
+
+    records = [make_record('arsenal', 'a0', bucket, sentiment='negative', event_name='MODIFY'),
+               make_record('arsenal', 'a1', bucket + 1, sentiment='neutral',
+                           event_name='MODIFY'),
+               make_record('arsenal', 'a1', bucket + 1, sentiment='negative',
+                           event_name='MODIFY')]
+    lambda_handler({'Records': records}, {}, redis_client=redis_client)
+
+    assert redis_client.zrange('team:arsenal', 0, -1) == [b'a0:n', b'a1:n']
+    assert {field: int(count) for field, count in
+            redis_client.hgetall('team_counts:arsenal:600').items() if int(count)} == {
+        f'{bucket}:n'.encode(): 2}
+    assert redis_client.get('team_version:arsenal') == b'2'
+
+
+def wrap_pipeline(pipeline_factory, commands: list):
+    """Wraps a pipeline factory so each executed pipeline is recorded."""
+    def factory(*args, **kwargs):
+        pipeline = pipeline_factory(*args, **kwargs)
+        execute = pipeline.execute
+        def record_execute(*execute_args, **execute_kwargs):
+            commands.append(len(pipeline.command_stack))
+            return execute(*execute_args, **execute_kwargs)
+        pipeline.execute = record_execute
+        return pipeline
+    return factory
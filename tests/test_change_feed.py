@@ -0,0 +1,58 @@
+import fakeredis
+from data.change_feed import ChangeFeed
+from data.source import Comment
+
+
+def test_subscribers_are_notified_only_of_changes():
+    """
+    Tests that a team's subscribers are notified once its newest comment changes, after the
+    change handler has run, and that other teams' subscribers aren't.
+    """
+    redis_client = fakeredis.FakeRedis()
+    redis_client.zadd('team:arsenal', {'a1:p': 100})
+    comments = Comment(redis_client=redis_client)
+    handled = []
+    feed = ChangeFeed(comments.get_change_markers, on_change=handled.append)
+    feed.start = lambda: None
+    arsenal, chelsea = feed.subscribe('arsenal'), feed.subscribe('chelsea')
+
+    feed.check()
+    assert arsenal.changes.empty() and not handled
+
+    redis_client.zadd('team:arsenal', {'a2:n': 200})
+    feed.check()
+    feed.check()
+    assert handled == ['arsenal']
+    assert arsenal.changes.qsize() == 1 and chelsea.changes.empty()
+
+    redis_client.zadd('team_topics:chelsea', {'{}': 300})
+    feed.check()
+    assert handled == ['arsenal', 'chelsea']
+
+    # Once a team has a version, it alone marks changes.
+    redis_client.incr('team_version:arsenal')
+    feed.check()
+    redis_client.zadd('team:arsenal', {'a3:n': 300})
+    feed.check()
+    assert handled == ['arsenal', 'chelsea', 'arsenal']
+    redis_client.incr('team_version:arsenal')
+    feed.check()
+    assert handled == ['arsenal', 'chelsea', 'arsenal', 'arsenal']
+
+
+def test_stream_sends_changes_as_events():
+    """
+    Tests that the event stream sends a change as a server-sent event and unsubscribes when
+    the client goes away.
+    """
+    feed = ChangeFeed(lambda team_names: {}, min_notify_seconds=0, keepalive_seconds=0.01)
+    feed.start = lambda: None
+    stream = feed.stream('arsenal')
+
+    assert next(stream).startswith('retry:')
+    assert next(stream) == ': keepalive\n\n'
+    feed.subscriptions['arsenal'].copy().pop().notify('marker')
+    assert next(stream).startswith('event: change\ndata: arsenal\n')
+
+    stream.close()
+    assert feed.stats()['subscribers'] == 0
@@ -0,0 +1,37 @@
+from comment_selection import drop_near_duplicates, estimate_tokens, select_comments
+
+
+def test_drop_near_duplicates_keeps_first_copy():
+    """
+    Tests that near-duplicate texts are dropped in favour of the earliest copy.
+    """
+    texts = [
+        'Saka was brilliant on the right wing again tonight',
+        'saka was brilliant on the right wing again tonight!!',
+        'The referee had a shocker with that penalty decision',
+        'Saka was brilliant on the right wing again tonight, what a player',
+    ]
+
+    assert drop_near_duplicates(texts, threshold=0.7) == [0, 2, 3]
+
+
+def test_select_comments_respects_budget_and_prefers_upvoted_novel_comments():
+    """
+    Tests that selection drops duplicates, ranks by upvotes and novelty, and stays within the
+    token budget.
+    """
+    comments = [
+        {'body': 'What a goal from Odegaard in the first half', 'upvotes': 50},
+        {'body': 'what a goal from odegaard in the first half', 'upvotes': 2},
+        {'body': 'What a goal from Odegaard, in the first half!', 'upvotes': 1},
+        {'body': 'The midfield press completely fell apart after the break', 'upvotes': 10},
+        {'body': 'Injury news on Saliba is worrying before the derby', 'upvotes': 5},
+        {'body': '', 'upvotes': 100},
+    ]
+    budget = estimate_tokens(comments[0]['body']) + estimate_tokens(comments[3]['body'])
+
+    selected, stats = select_comments(comments, token_budget=budget)
+
+    assert selected == [comments[0]['body'], comments[3]['body']]
+    assert stats == {'considered': 5, 'duplicates': 2, 'over_budget': 1, 'kept': 2,
+                     'tokens': budget}
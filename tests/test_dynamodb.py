@@ -58,3 +58,56 @@ def test_add_comment():
     assert 'Item' in response
     assert response['Item']['sentiment_id'] == 'positive'
     assert response['Item']['sentiment_score'] == Decimal('0.9')
+
+
+@mock_aws
+def test_query_range():
+    """
+    Tests reading a team's comments back in time order through the time index.
+    """
+    dynamodb = boto3.resource('dynamodb', region_name='us-west-1')
+    table_name = 'comment_data'
+
+    dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {'AttributeName': 'team_name', 'KeyType': 'HASH'},
+            {'AttributeName': 'comment_id_timestamp', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'team_name', 'AttributeType': 'S'},
+            {'AttributeName': 'comment_id_timestamp', 'AttributeType': 'S'},
+            {'AttributeName': 'timestamp', 'AttributeType': 'N'}
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'team_timestamp_index',
+            'KeySchema': [
+                {'AttributeName': 'team_name', 'KeyType': 'HASH'},
+                {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+            'ProvisionedThroughput': {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+        }],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+
+    comment_table = Comment(dyn_resource=dynamodb)
+    comment_table.exists(table_name)
+
+    # Ids are added in reverse so that id order and time order disagree.
+    for i in reversed(range(20)):
+        for team in ('liverpool', 'arsenal'):
+            comment_table.add_comment(data={
+                'team': team, 'timestamp': 1000 + i * 10, 'label': 'neutral',
+                'score': Decimal('0.5'), 'id': f'c{19 - i:02d}', 'name': 'n', 'author': 'a',
+                'body': 'b', 'upvotes': 1, 'downvotes': 0, 'subreddit': 'soccer'
+            })
+
+    items = list(comment_table.query_range('liverpool', 1050, 1149, segments=3, page_size=2))
+
+    assert [int(item['timestamp']) for item in items] == list(range(1050, 1150, 10))
+    assert set(items[0]) == {'id', 'timestamp', 'sentiment_id', 'sentiment_score'}
+    assert list(comment_table.query_range('liverpool', 2000, 3000)) == []
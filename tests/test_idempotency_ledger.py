@@ -0,0 +1,127 @@
+import base64
+import json
+import time
+from moto import mock_aws
+import boto3
+from botocore.exceptions import ClientError
+import pytest
+from src.processing.idempotency_ledger import IdempotencyLedger
+from src.processing.rollup_table import SentimentRollup
+from lambda_handler import process_record
+
+
+def create_ledger(dynamodb, table_name: str = 'idempotency_ledger') -> IdempotencyLedger:
+    """Creates the ledger table and returns a ledger using it."""
+    dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[{'AttributeName': 'ledger_key', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'ledger_key', 'AttributeType': 'S'}],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    ledger = IdempotencyLedger(dyn_resource=dynamodb)
+    assert ledger.exists(table_name)
+    return ledger
+
+
+@mock_aws
+def test_claim_complete_and_release():
+    """
+    Tests that a comment can only be claimed once until its claim is released.
+    """
+    dynamodb = boto3.resource('dynamodb', region_name='us-west-1')
+    table_name = 'idempotency_ledger'
+    ledger = create_ledger(dynamodb, table_name)
+
+    assert ledger.claim('arsenal', 'abc')
+    # A live claim by another attempt fails the batch rather than skip a comment that may
+    # never be stored.
+    with pytest.raises(RuntimeError):
+        ledger.claim('arsenal', 'abc')
+    # The same comment streamed for another team is processed separately.
+    assert ledger.claim('chelsea', 'abc')
+
+    ledger.release('arsenal', 'abc')
+    assert ledger.claim('arsenal', 'abc')
+    ledger.complete('arsenal', 'abc')
+    assert not ledger.claim('arsenal', 'abc')
+
+    # A new container has no local state and relies on the table.
+    cold_ledger = IdempotencyLedger(dyn_resource=dynamodb)
+    cold_ledger.exists(table_name)
+    assert not cold_ledger.claim('arsenal', 'abc')
+    item = cold_ledger.table.get_item(Key={'ledger_key': 'arsenal#abc'})['Item']
+    assert item['status'] == 'COMPLETED'
+
+
+def create_rollup_table(dynamodb, table_name: str = 'sentiment_rollups') -> SentimentRollup:
+    """Creates the rollup table and returns a wrapper using it."""
+    dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {'AttributeName': 'team_name', 'KeyType': 'HASH'},
+            {'AttributeName': 'bucket_timestamp', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'team_name', 'AttributeType': 'S'},
+            {'AttributeName': 'bucket_timestamp', 'AttributeType': 'N'}
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    rollup_table = SentimentRollup(dyn_resource=dynamodb)
+    assert rollup_table.exists(table_name)
+    return rollup_table
+
+
+@mock_aws
+def test_expired_claim_is_counted_once(monkeypatch):
+    """
+    Tests that when an attempt outlives its claim and a retry takes the claim over, the stale
+    attempt neither adds the comment to the rollup nor releases the retry's claim, and later
+    retries skip the comment.
+    """
+    dynamodb = boto3.resource('dynamodb', region_name='us-west-1')
+    rollup_table = create_rollup_table(dynamodb)
+    # Each attempt runs in its own container.
+    first_ledger = create_ledger(dynamodb)
+    retry_ledger = IdempotencyLedger(dyn_resource=dynamodb)
+    retry_ledger.exists('idempotency_ledger')
+    clock = [1700000000]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    data = {'team': 'arsenal', 'id': 'abc', 'body': 'Great win', 'timestamp': 1700000000}
+    record = {'eventID': '1', 'kinesis': {'data': base64.b64encode(json.dumps(data).encode())}}
+
+    class Table:
+        def add_comment(self, data):
+            pass
+
+    class Sagemaker:
+        def __init__(self, stall=False):
+            self.stall = stall
+
+        def invoke_endpoint(self, **kwargs):
+            if self.stall:
+                # The first attempt stalls past its claim's expiry, and a retry takes the
+                # claim over meanwhile.
+                clock[0] += first_ledger.in_progress_seconds + 1
+                assert retry_ledger.claim('arsenal', 'abc')
+            body = json.dumps({'label': 'positive', 'score': 0.9}).encode()
+            return {'Body': type('Body', (), {'read': lambda self: body})()}
+
+    with pytest.raises(ClientError):
+        process_record(record, Sagemaker(stall=True), Table(), 'endpoint', rollup_table,
+                       first_ledger)
+    retry_ledger.complete('arsenal', 'abc',
+                          [rollup_table.increment_item('arsenal', 1700000000, 'positive')])
+    cold_ledger = IdempotencyLedger(dyn_resource=dynamodb)
+    cold_ledger.exists('idempotency_ledger')
+    assert not process_record(record, Sagemaker(), Table(), 'endpoint', rollup_table,
+                              cold_ledger)
+
+    rollups = rollup_table.query_rollups('arsenal', 1700000000, 1700000000)
+    assert rollups[0]['positive'] == 1
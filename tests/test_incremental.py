@@ -0,0 +1,114 @@
+import fakeredis
+import pandas as pd
+import plotly.express as px
+from components.incremental import is_unchanged, update_series_figure, window_stamp
+from data.source import Comment
+
+
+def series(first: int, counts: list[int]) -> pd.DataFrame:
+    """Builds a sentiment series of ten minute buckets."""
+    timestamps = [first + i * 600 for i in range(len(counts))]
+    return pd.DataFrame({'timestamp': timestamps, 'date': pd.to_datetime(timestamps, unit='s'),
+                         'count': counts})
+
+
+def build(df):
+    """Draws the full figure."""
+    return px.line(df, x='date', y='count')
+
+
+def test_refresh_patches_only_changed_points():
+    """
+    Tests that a refresh of the same selection drops the points that left the window, resends
+    the newest ones and appends the new bucket, and that a new selection is drawn in full.
+    """
+    figure, state = update_series_figure(series(0, [1, 2, 3]), None, ['arsenal', '1hour'], 600,
+                                         ['count'], build)
+    assert list(figure.data[0].y) == [1, 2, 3]
+
+    patch, state = update_series_figure(series(600, [2, 4, 5]), state, ['arsenal', '1hour'],
+                                        600, ['count'], build)
+    operations = [(op['operation'], op['location'], op['params'].get('value'))
+                  for op in patch.to_plotly_json()['operations']]
+    assert operations == [
+        ('Delete', ['data', 0, 'x', 0], None),
+        ('Delete', ['data', 0, 'y', 0], None),
+        ('Assign', ['data', 0, 'y', 0], 2),
+        ('Assign', ['data', 0, 'y', 1], 4),
+        ('Extend', ['data', 0, 'x'], ['1970-01-01T00:30:00']),
+        ('Extend', ['data', 0, 'y'], [5]),
+    ]
+    assert state == {'key': ['arsenal', '1hour'], 'stamp': None, 'bucket': 600, 'first': 600,
+                     'last': 1800}
+
+    figure, _ = update_series_figure(series(600, [2, 4, 5]), state, ['chelsea', '1hour'], 600,
+                                     ['count'], build)
+    assert list(figure.data[0].y) == [2, 4, 5]
+
+
+def test_older_series_than_the_browser_has_is_drawn_in_full():
+    """
+    Tests that a series older than the one the browser's figure was last updated from, as
+    computed by another server process, is drawn in full rather than patched, so that the next
+    patch doesn't append points the figure already has.
+    """
+    _, state = update_series_figure(series(600, [2, 4, 5, 6]), None, ['arsenal', '1hour'], 600,
+                                    ['count'], build)
+
+    figure, older_state = update_series_figure(series(600, [2, 4, 5]), state,
+                                               ['arsenal', '1hour'], 600, ['count'], build)
+    assert list(figure.data[0].y) == [2, 4, 5]
+
+    figure, _ = update_series_figure(series(600, [2, 4, 5, 6]), older_state,
+                                     ['arsenal', '1hour'], 600, ['count'], build)
+    extended = [op['params']['value'] for op in figure.to_plotly_json()['operations']
+                if op['operation'] == 'Extend']
+    assert extended == [['1970-01-01T00:40:00'], [6]]
+
+
+def test_unchanged_selection_is_skipped_until_a_write_or_new_bucket():
+    """
+    Tests that a chart is skipped while its team's version and window bucket stay the same,
+    and redrawn once the team is written to or the window slides into a new bucket. Teams
+    without a version are never skipped.
+    """
+    redis_client = fakeredis.FakeRedis()
+    comments = Comment(redis_client=redis_client, comment_table=None, archive=None)
+    assert window_stamp(comments, 'arsenal', '1hour', now=6000) is None
+
+    redis_client.incr('team_version:arsenal')
+    stamp = window_stamp(comments, 'arsenal', '1hour', now=6000)
+    _, state = update_series_figure(series(0, [1, 2, 3]), None, ['arsenal', '1hour'], 600,
+                                    ['count'], build, stamp)
+    assert is_unchanged(state, ['arsenal', '1hour'],
+                        window_stamp(comments, 'arsenal', '1hour', now=6599))
+    assert not is_unchanged(state, ['arsenal', '1day'],
+                            window_stamp(comments, 'arsenal', '1day', now=6599))
+    assert not is_unchanged(state, ['arsenal', '1hour'],
+                            window_stamp(comments, 'arsenal', '1hour', now=6600))
+
+    redis_client.incr('team_version:arsenal')
+    assert not is_unchanged(state, ['arsenal', '1hour'],
+                            window_stamp(comments, 'arsenal', '1hour', now=6000))
+
+
+def test_stamp_follows_the_local_buckets_of_the_series():
+    """
+    Tests that a chart's stamp changes when its series gains a bucket on the local clock, here
+    at 06:00 in US/Pacific for a 30 day window of 6 hour buckets, rather than at UTC boundaries.
+    """
+    redis_client = fakeredis.FakeRedis()
+    redis_client.incr('team_version:arsenal')
+    comments = Comment(redis_client=redis_client, comment_table=None, archive=None)
+    local_six = 1704117600  # 2024-01-01 06:00 PST, 14:00 UTC
+    utc_twelve = 1704110400  # 2024-01-01 12:00 UTC, 04:00 PST
+
+    def last_bucket(now):
+        df = comments.query_sentiment_series('arsenal', now - 30 * 86400, now, fill_empty=True)
+        return df['timestamp'].iloc[-1]
+
+    for boundary, changes in ((local_six, True), (utc_twelve, False)):
+        before = window_stamp(comments, 'arsenal', '30days', now=boundary - 60)
+        after = window_stamp(comments, 'arsenal', '30days', now=boundary + 60)
+        assert (before != after) == changes
+        assert (last_bucket(boundary - 60) != last_bucket(boundary + 60)) == changes
@@ -0,0 +1,43 @@
+import time
+from lambda_resources import ElastiCacheIAMProvider, ResourceRegistry, TOKEN_TTL_SECONDS
+
+
+def test_registry_reuses_resources_across_invocations():
+    """
+    Tests that resources are created on the cold start only and reused by warm invocations.
+    """
+    registry = ResourceRegistry()
+    created = []
+
+    def create_client():
+        created.append(object())
+        return created[-1]
+
+    for _ in range(3):
+        with registry.invocation():
+            registry.get('client', create_client)
+        if registry.invocations == 1:
+            assert registry.last_timings['cold_start']
+    assert len(created) == 1
+    assert not registry.last_timings['cold_start']
+
+    registry.reset('client')
+    assert registry.get('client', create_client) is created[1]
+
+
+def test_iam_token_refreshed_before_expiry(monkeypatch):
+    """
+    Tests that the IAM token is reused while fresh and regenerated ahead of its expiry.
+    """
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    provider = ElastiCacheIAMProvider(user='user', cache_name='cache', refresh_margin=60)
+
+    first = provider.get_credentials()
+    assert first[0] == 'user'
+    assert 'Action=connect' in first[1]
+    assert provider.get_credentials() is first
+
+    # Age the token into the refresh margin.
+    provider._issued_at = time.monotonic() - (TOKEN_TTL_SECONDS - 30)
+    assert provider.get_credentials() is not first
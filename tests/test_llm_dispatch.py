@@ -0,0 +1,75 @@
+import asyncio
+import time
+import pytest
+from llm_dispatch import Deadline, LLMDispatcher, TokenBucket, is_retryable
+
+
+class RateLimitError(Exception):
+    """Mimics a provider's rate limit error, with a Retry-After header."""
+
+    def __init__(self, retry_after: str):
+        super().__init__('rate limited')
+        self.status_code = 429
+        self.response = type('Response', (), {'headers': {'retry-after': retry_after}})()
+
+
+class FlakyChain:
+    """Fails with rate limit errors a number of times before answering."""
+
+    def __init__(self, failures: int, error: Exception):
+        self.failures = failures
+        self.error = error
+        self.calls = []
+
+    async def ainvoke(self, inputs):
+        self.calls.append(time.monotonic())
+        if len(self.calls) <= self.failures:
+            raise self.error
+        return 'summary'
+
+
+def test_dispatcher_retries_and_honours_retry_after():
+    """
+    Tests that rate limited calls are retried after at least the delay the provider asks for.
+    """
+    chain = FlakyChain(failures=2, error=RateLimitError('0.2'))
+    dispatcher = LLMDispatcher(base_delay=0.01, max_delay=0.01)
+
+    assert asyncio.run(dispatcher.invoke(chain, {'comment': 'text'})) == 'summary'
+    assert len(chain.calls) == 3
+    assert chain.calls[1] - chain.calls[0] >= 0.2
+
+
+def test_dispatcher_does_not_retry_client_errors_or_past_deadline():
+    """
+    Tests that errors that won't go away aren't retried, and neither are retries that would end
+    after the deadline.
+    """
+    bad_request = ValueError('bad request')
+    bad_request.status_code = 400
+    chain = FlakyChain(failures=1, error=bad_request)
+    with pytest.raises(ValueError):
+        asyncio.run(LLMDispatcher().invoke(chain, {'comment': 'text'}))
+    assert len(chain.calls) == 1
+
+    context = type('Context', (), {'get_remaining_time_in_millis': lambda self: 1500})()
+    chain = FlakyChain(failures=1, error=RateLimitError('60'))
+    dispatcher = LLMDispatcher(deadline=Deadline(context, margin_seconds=1))
+    with pytest.raises(RateLimitError):
+        asyncio.run(dispatcher.invoke(chain, {'comment': 'text'}))
+    assert len(chain.calls) == 1
+    assert is_retryable(RateLimitError('1')) and not is_retryable(bad_request)
+
+
+def test_token_bucket_limits_rate():
+    """
+    Tests that the token bucket only allows bursts up to its capacity.
+    """
+    async def spend():
+        bucket = TokenBucket(rate=20, capacity=2)
+        started = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(spend()) >= 0.09
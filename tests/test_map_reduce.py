@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+from map_reduce import MapReducePolicy, chunk_texts, map_reduce_summarize
+from summarize_lambda_handler import create_llm_chain, create_reduce_chain, summarize_comments
+
+
+class RecordingLLM:
+    """A fake chat model that records its prompts and answers with their sizes."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt) -> str:
+        text = prompt.to_messages()[-1].content
+        with self.lock:
+            self.prompts.append(text)
+        return f'{self.name} of {len(text.split())} words ' + 'x ' * 40
+
+
+def test_chunk_texts_fits_budget():
+    """
+    Tests that texts are chunked in order within the token budget.
+    """
+    texts = ['a' * 40, 'b' * 40, 'c' * 40, 'd' * 200]
+
+    assert chunk_texts(texts, chunk_tokens=25) == [['a' * 40, 'b' * 40], ['c' * 40], ['d' * 200]]
+
+
+def test_map_reduce_summarize_merges_chunks_in_rounds():
+    """
+    Tests that chunks are summarized separately, merged in intermediate rounds while the
+    partial summaries are too large, and that the chunk limit drops the trailing comments.
+    """
+    mapper, reducer = RecordingLLM('map'), RecordingLLM('reduce')
+    map_chain = create_llm_chain(RunnableLambda(mapper))
+    reduce_chain = create_reduce_chain(RunnableLambda(reducer))
+    comments = [f'comment {i} ' + 'word ' * 20 for i in range(40)]
+    policy = MapReducePolicy(chunk_tokens=100, max_chunks=8, max_depth=2, max_concurrency=3)
+
+    summary = asyncio.run(map_reduce_summarize(comments, map_chain, reduce_chain, policy))
+
+    assert len(mapper.prompts) == 8
+    assert not any('comment 39 ' in prompt for prompt in mapper.prompts)
+    # 8 partial summaries of ~25 tokens are merged in groups of 4, then reduced once more.
+    assert len(reducer.prompts) == 3
+    assert summary.startswith('reduce of')
+
+
+def test_map_reduce_summarize_without_texts_makes_no_calls():
+    """
+    Tests that an empty input, such as when every comment was dropped while selecting them, is
+    summarized as nothing rather than failing.
+    """
+    mapper, reducer = RecordingLLM('map'), RecordingLLM('reduce')
+
+    summary = asyncio.run(map_reduce_summarize([], create_llm_chain(RunnableLambda(mapper)),
+                                               create_reduce_chain(RunnableLambda(reducer)),
+                                               MapReducePolicy()))
+
+    assert summary == ''
+    assert not mapper.prompts and not reducer.prompts
+
+
+def test_summarize_comments_with_fake_chat_model():
+    """
+    Tests that the chains work end to end with a fake chat model, and that small inputs are
+    summarized with a single call.
+    """
+    chain = create_llm_chain(FakeListChatModel(responses=['1. **Goals** - Plenty of them.']))
+    reduce_chain = create_reduce_chain(FakeListChatModel(responses=['unused']))
+
+    summary = asyncio.run(summarize_comments(['What a goal', 'Another goal'], chain,
+                                             reduce_chain, MapReducePolicy(chunk_tokens=1000)))
+
+    assert summary == '1. **Goals** - Plenty of them.'
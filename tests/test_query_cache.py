@@ -0,0 +1,58 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from data.query_cache import SingleFlightCache
+
+
+def test_concurrent_requests_share_one_load():
+    """
+    Tests that identical requests made while a load is in flight wait for it instead of
+    loading again.
+    """
+    cache = SingleFlightCache()
+    loads = []
+    release = threading.Event()
+
+    def loader():
+        loads.append(1)
+        release.wait(5)
+        return 'value'
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.get, 'key', loader) for _ in range(8)]
+        while cache.stats()['coalesced'] < 7:
+            time.sleep(0.01)
+        release.set()
+        assert [future.result() for future in futures] == ['value'] * 8
+
+    assert len(loads) == 1
+    assert cache.get('key', loader) == 'value'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['coalesced']) == (1, 1, 7)
+    assert stats['hit_rate'] == pytest.approx(8 / 9)
+
+
+def test_values_expire_and_errors_are_not_cached():
+    """
+    Tests that values expire after the TTL, the least recently used value is evicted, and a
+    failed load is retried by the next request.
+    """
+    now = [0.0]
+    cache = SingleFlightCache(maxsize=2, ttl=10, timer=lambda: now[0])
+    cache.get('a', lambda: 1)
+    cache.get('b', lambda: 2)
+    cache.get('a', lambda: 0)
+    cache.get('c', lambda: 3)
+    assert cache.get('b', lambda: 'reloaded') == 'reloaded'
+
+    now[0] = 11
+    assert cache.get('a', lambda: 'expired') == 'expired'
+
+    def failing():
+        raise ConnectionError('redis down')
+
+    with pytest.raises(ConnectionError):
+        cache.get('d', failing)
+    assert cache.get('d', lambda: 4) == 4
+    assert cache.stats()['errors'] == 1
@@ -0,0 +1,43 @@
+from moto import mock_aws
+import boto3
+from src.processing.rollup_table import SentimentRollup
+
+@mock_aws
+def test_increment_and_query_rollups():
+    """
+    Tests incrementing sentiment counters and reading the bucketed rollups back.
+    """
+    dynamodb = boto3.resource('dynamodb', region_name='us-west-1')
+    table_name = 'sentiment_rollups'
+
+    dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {'AttributeName': 'team_name', 'KeyType': 'HASH'},
+            {'AttributeName': 'bucket_timestamp', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'team_name', 'AttributeType': 'S'},
+            {'AttributeName': 'bucket_timestamp', 'AttributeType': 'N'}
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+
+    rollup_table = SentimentRollup(dyn_resource=dynamodb)
+    assert rollup_table.exists(table_name)
+
+    rollup_table.increment('arsenal', 1200, 'positive')
+    rollup_table.increment('arsenal', 1799, 'positive')
+    rollup_table.increment('arsenal', 1500, 'negative')
+    rollup_table.increment('arsenal', 1800, 'neutral')
+    rollup_table.increment('chelsea', 1300, 'negative')
+
+    rollups = rollup_table.query_rollups('arsenal', 1250, 2000, page_size=1)
+
+    assert rollups == [
+        {'bucket_timestamp': 1200, 'comment_count': 3, 'positive': 2, 'negative': 1, 'neutral': 0},
+        {'bucket_timestamp': 1800, 'comment_count': 1, 'positive': 0, 'negative': 0, 'neutral': 1}
+    ]
@@ -0,0 +1,68 @@
+import pickle
+import threading
+import fakeredis
+import pandas as pd
+import plotly.express as px
+import redis.exceptions
+from data.shared_cache import SharedResultCache
+
+
+def test_result_is_computed_once_across_processes():
+    """
+    Tests that a result stored by one process is read by another, and that a process finding
+    the result being computed waits for it instead of computing it too.
+    """
+    server = fakeredis.FakeServer()
+    first = SharedResultCache(lambda: fakeredis.FakeRedis(server=server))
+    second = SharedResultCache(lambda: fakeredis.FakeRedis(server=server))
+    calls = []
+    computing, release = threading.Event(), threading.Event()
+    timestamps = [1700000000, 1700000600]
+    df = pd.DataFrame({'timestamp': timestamps, 'date': pd.to_datetime(timestamps, unit='s'),
+                       'count': [1, 2]})
+
+    def loader():
+        calls.append(1)
+        computing.set()
+        release.wait(1)
+        return {'df': df, 'figure': px.line(df, x='date', y='count'), 'stamp': [3, 2833333]}
+
+    thread = threading.Thread(target=first.get, args=(('view', 'arsenal', 1), loader))
+    thread.start()
+    computing.wait(1)
+    threading.Timer(0.05, release.set).start()
+    value = second.get(('view', 'arsenal', 1), loader)
+    thread.join()
+
+    assert calls == [1]
+    assert value['df'].equals(df)
+    assert list(value['figure'].data[0].y) == [1, 2]
+    assert value['stamp'] == [3, 2833333]
+    assert second.stats()['waits'] == 1 and second.stats()['hits'] == 1
+
+
+def test_redis_errors_fall_back_to_computing():
+    """
+    Tests that the result is computed locally when Redis can't be reached.
+    """
+    class Unreachable:
+        def get(self, name):
+            raise redis.exceptions.ConnectionError('unreachable')
+
+    cache = SharedResultCache(lambda: Unreachable())
+
+    assert cache.get(('view', 'arsenal', 1), lambda: 3) == 3
+    assert cache.stats()['errors'] == 1
+
+
+def test_undecodable_results_fall_back_to_computing():
+    """
+    Tests that a stored result that isn't JSON, such as a pickle written by an older version,
+    is never unpickled and the result is computed locally instead.
+    """
+    client = fakeredis.FakeRedis()
+    cache = SharedResultCache(lambda: client)
+    client.set(cache.redis_key(('view', 'arsenal', 1)), pickle.dumps({'stamp': [1]}))
+
+    assert cache.get(('view', 'arsenal', 1), lambda: {'stamp': [2]}) == {'stamp': [2]}
+    assert cache.stats()['errors'] == 1
@@ -0,0 +1,211 @@
+import json
+import time
+import fakeredis
+import pandas as pd
+from data.source import Comment
+
+
+NOW = int(time.time())
+
+
+def test_query_sentiment_counts_reads_buckets():
+    """
+    Tests that sentiment counts are read for the buckets covering the window only.
+    """
+    redis_client = fakeredis.FakeRedis()
+    bucket = NOW // 600 * 600
+    redis_client.hset('team_counts:arsenal:600', mapping={
+        f'{bucket - 1200}:p': 9, f'{bucket - 600}:p': 2, f'{bucket - 600}:n': 1, f'{bucket}:u': 4})
+
+    df = Comment(redis_client=redis_client).query_sentiment_counts('arsenal', bucket - 300,
+                                                                   bucket + 10, resolution=600)
+
+    assert df.to_dict('records') == [
+        {'timestamp': bucket - 600, 'sentiment_id': 'positive', 'count': 2},
+        {'timestamp': bucket - 600, 'sentiment_id': 'negative', 'count': 1},
+        {'timestamp': bucket, 'sentiment_id': 'neutral', 'count': 4},
+    ]
+
+
+def test_query_sentiment_series_rebuckets_counts():
+    """
+    Tests that counts are read at a resolution dividing the bucket, summed per bucket and
+    sentiment, and given a net score.
+    """
+    redis_client = fakeredis.FakeRedis()
+    day = NOW // 86400 * 86400
+    redis_client.hset('team_counts:arsenal:3600', mapping={
+        f'{day}:p': 3, f'{day + 3600}:p': 2, f'{day + 3600}:n': 4, f'{day + 7200}:u': 1})
+    comments = Comment(redis_client=redis_client)
+
+    df = comments.query_sentiment_series('arsenal', day, day + 86399, bucket=7200, tz='UTC')
+
+    assert df[['timestamp', 'positive', 'negative', 'neutral', 'count',
+               'net_score']].to_dict('records') == [
+        {'timestamp': day, 'positive': 5, 'negative': 4, 'neutral': 0, 'count': 9,
+         'net_score': 1},
+        {'timestamp': day + 7200, 'positive': 0, 'negative': 0, 'neutral': 1, 'count': 1,
+         'net_score': 0},
+    ]
+    assert df['date'].iloc[0] == pd.Timestamp(day, unit='s')
+
+
+def test_query_sentiment_series_aligns_days_to_local_time():
+    """
+    Tests that day buckets run from midnight to midnight in the display time zone, across a
+    change of daylight saving time.
+    """
+    redis_client = fakeredis.FakeRedis()
+    # Midnight of 2 November 2024 in US/Pacific, the day before clocks went back an hour.
+    midnight = int(pd.Timestamp('2024-11-02', tz='US/Pacific').timestamp())
+    redis_client.hset('team_counts:arsenal:3600', mapping={
+        f'{midnight - 3600}:p': 1, f'{midnight}:p': 2, f'{midnight + 23 * 3600}:n': 3,
+        f'{midnight + 24 * 3600}:n': 4, f'{midnight + 49 * 3600}:u': 5})
+    comments = Comment(redis_client=redis_client)
+    comments.cache_retention_days = 10000
+
+    df = comments.query_sentiment_series('arsenal', midnight - 3600, midnight + 50 * 3600,
+                                         bucket=86400, tz='US/Pacific', fill_empty=True)
+
+    assert df['date'].dt.strftime('%Y-%m-%d %H:%M').tolist() == [
+        '2024-11-01 00:00', '2024-11-02 00:00', '2024-11-03 00:00', '2024-11-04 00:00']
+    assert df['timestamp'].tolist() == [midnight - 86400, midnight, midnight + 86400,
+                                        midnight + 49 * 3600]
+    assert df['count'].tolist() == [1, 5, 4, 5]
+
+
+def test_queries_share_cached_results():
+    """
+    Tests that queries for the same window made moments apart are served from the query cache,
+    and that callers can't modify the cached result.
+    """
+    redis_client = fakeredis.FakeRedis()
+    end = NOW // 10 * 10 + 1
+    comments = Comment(redis_client=redis_client)
+
+    first = comments.query_sentiment_counts('arsenal', end - 3600, end)
+    first['date'] = 1
+    second = comments.query_sentiment_counts('arsenal', end - 3601, end + 1)
+
+    assert 'date' not in second
+    assert comments.query_cache.stats()['hits'] == 1
+
+
+def test_version_change_drops_cached_queries():
+    """
+    Tests that once a team's version is seen to change, its cached queries are read again,
+    while other teams' are kept.
+    """
+    redis_client = fakeredis.FakeRedis()
+    end = NOW // 10 * 10 + 1
+    comments = Comment(redis_client=redis_client)
+    redis_client.set('team_version:arsenal', 1)
+    comments.get_version('arsenal')
+    comments.query_sentiment_counts('arsenal', end - 3600, end)
+    comments.query_sentiment_counts('chelsea', end - 3600, end)
+
+    redis_client.incr('team_version:arsenal')
+    assert comments.get_versions(['arsenal', 'chelsea']) == {'arsenal': 2, 'chelsea': None}
+    comments.query_sentiment_counts('arsenal', end - 3600, end)
+    comments.query_sentiment_counts('chelsea', end - 3600, end)
+
+    assert comments.query_cache.stats()['hits'] == 1
+
+
+def test_query_league_counts_reads_every_team_in_one_round_trip():
+    """
+    Tests that the league's window totals are read in one pipeline, at the coarsest resolution
+    that still splits the window finely, with zeros for teams without comments.
+    """
+    redis_client = fakeredis.FakeRedis()
+    hour = NOW // 3600 * 3600
+    redis_client.hset('team_counts:arsenal:3600', mapping={f'{hour}:p': 3, f'{hour}:n': 1,
+                                                           f'{hour - 3600}:u': 2,
+                                                           f'{hour - 2 * 86400}:p': 9})
+    redis_client.hset('team_counts:chelsea:600', mapping={f'{NOW // 600 * 600}:n': 5})
+    comments = Comment(redis_client=redis_client)
+    pipelines = []
+    create_pipeline = redis_client.pipeline
+    redis_client.pipeline = lambda **kwargs: pipelines.append(1) or create_pipeline(**kwargs)
+
+    df = comments.query_league_counts(['arsenal', 'chelsea'], NOW - 86400, NOW)
+
+    assert len(pipelines) == 1
+    assert df.to_dict('records') == [
+        {'team': 'arsenal', 'positive': 3, 'negative': 1, 'neutral': 2, 'count': 6,
+         'net_score': 2},
+        {'team': 'chelsea', 'positive': 0, 'negative': 0, 'neutral': 0, 'count': 0,
+         'net_score': 0},
+    ]
+
+
+def test_choose_resolution_fits_target_points(monkeypatch):
+    """
+    Tests that the finest resolution within the target number of points is chosen.
+    """
+    monkeypatch.setenv('DASHBOARD_TARGET_POINTS', '200')
+    comments = Comment(redis_client=fakeredis.FakeRedis())
+
+    assert comments.choose_resolution(NOW - 3600, NOW) == 600
+    assert comments.choose_resolution(NOW - 7 * 86400, NOW) == 3600
+    assert comments.choose_resolution(NOW - 30 * 86400, NOW) == 21600
+    assert comments.choose_resolution(NOW - 365 * 86400, NOW) == 86400
+
+
+def test_get_most_recent_summary_reads_structured_topics():
+    """
+    Tests that the newest structured summary is read, and that teams without one fall back to
+    parsing text summaries.
+    """
+    redis_client = fakeredis.FakeRedis()
+    for start in (100, 200):
+        entry = {'window_start': start, 'window_end': start + 100,
+                 'topics': [{'rank': 1, 'title': f'Title {start}', 'description': 'Details'}]}
+        redis_client.zadd('team_topics:arsenal', {json.dumps(entry): start})
+    redis_client.zadd('team_summary:chelsea', {'1. **Old** - Text summary': 1700000000})
+    comments = Comment(redis_client=redis_client)
+
+    df = comments.get_most_recent_summary('arsenal')
+    assert df.to_dict('records') == [{'Rank': 1, 'Title': 'Title 200', 'Description': 'Details',
+                                      'timestamp': 200}]
+    assert comments.get_most_recent_summary('chelsea')['Title'].tolist() == ['Old']
+    assert comments.get_most_recent_summary('everton').empty
+
+
+class StubStore:
+    """Records the windows read from a slower store."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def query_comments(self, team_name, start_time, end_time):
+        self.calls.append((team_name, start_time, end_time))
+        return pd.DataFrame(self.rows, columns=['id', 'timestamp', 'sentiment_id'])
+
+
+def test_query_sentiment_counts_falls_back_beyond_cache_horizon(monkeypatch):
+    """
+    Tests that the part of the window older than the cache horizon is counted from DynamoDB and
+    the archive.
+    """
+    monkeypatch.setenv('CACHE_RETENTION_DAYS', '1')
+    monkeypatch.setenv('ARCHIVE_AFTER_DAYS', '2')
+    redis_client = fakeredis.FakeRedis()
+    bucket = NOW // 600 * 600
+    redis_client.hset('team_counts:arsenal:600', f'{bucket}:p', 1)
+    table = StubStore([('c0', NOW - 90000, 'neutral')])
+    archive = StubStore([('c-1', NOW - 200000, 'negative')])
+
+    comments = Comment(redis_client=redis_client, comment_table=table, archive=archive)
+    df = comments.query_sentiment_counts('arsenal', NOW - 3 * 86400, NOW, resolution=600)
+    now = time.time()
+
+    assert df.to_dict('records') == [
+        {'timestamp': (NOW - 200000) // 600 * 600, 'sentiment_id': 'negative', 'count': 1},
+        {'timestamp': (NOW - 90000) // 600 * 600, 'sentiment_id': 'neutral', 'count': 1},
+        {'timestamp': bucket, 'sentiment_id': 'positive', 'count': 1},
+    ]
+    assert archive.calls[0][2] <= now - 2 * 86400
+    assert table.calls[0][1] >= NOW - 2 * 86400
+    assert table.calls[0][2] <= now - 86400
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+import fakeredis
+from llm_dispatch import Deadline, LLMDispatcher
+from summarize_lambda_handler import parse_topics, process_team_comments, summarize_teams
+from summary_policy import SummaryPolicy
+
+
+TEAMS = ['arsenal', 'aston villa', 'bournemouth', 'brentford', 'brighton', 'chelsea',
+         'crystal palace', 'everton', 'fulham', 'ipswich town', 'leicester city', 'liverpool',
+         'manchester city', 'manchester united', 'newcastle', 'nottingham forest',
+         'southampton', 'tottenham', 'west ham', 'wolves']
+
+
+class CountingChain:
+    """Stands in for the LLM chain, recording what it is asked to summarize."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, inputs):
+        self.calls.append(inputs['comment'])
+        return f'summary {len(self.calls)}'
+
+
+def add_comments(redis_client, team, start, count, code='p'):
+    """Adds comments to a team's index and comment store."""
+    for i in range(count):
+        comment_id = f'{team}-{start}-{i}'
+        redis_client.zadd(f'team:{team}', {f'{comment_id}:{code}': start + i})
+        redis_client.hset(f'team_comments:{team}', comment_id,
+                          json.dumps({'id': comment_id, 'body': comment_id}))
+
+
+def test_summarize_teams_skips_teams_without_new_activity():
+    """
+    Tests that teams are only summarized again once enough new comments arrive or their
+    sentiment drifts, and that the existing summary is kept otherwise.
+    """
+    redis_client = fakeredis.FakeRedis()
+    chain = CountingChain()
+    policy = SummaryPolicy(min_new_comments=10, drift_threshold=0.5, min_drift_comments=3)
+    now = int(time.time())
+    add_comments(redis_client, 'arsenal', now - 600, 10)
+    add_comments(redis_client, 'chelsea', now - 600, 3)
+
+    result = summarize_teams(redis_client, chain, policy)
+
+    assert set(result.pop('latency_ms')) == set(TEAMS)
+    assert result == {'summarized': 2, 'skipped': 18, 'failed': 0, 'cancelled': 0,
+                      'comments_kept': 13, 'comments_dropped': 0}
+    assert redis_client.zcard('team_topics:arsenal') == 1
+
+    # A few more comments with the same sentiment don't warrant a new summary...
+    add_comments(redis_client, 'arsenal', now - 300, 4)
+    # ...but a swing in sentiment does, and only the new comments are sent.
+    add_comments(redis_client, 'chelsea', now - 300, 3, code='n')
+
+    result = summarize_teams(redis_client, chain, policy)
+
+    assert result['summarized'] == 1 and result['skipped'] == 19
+    assert len(chain.calls) == 3
+    assert sorted(chain.calls[-1].split()) == [f'chelsea-{now - 300}-{i}' for i in range(3)]
+    assert redis_client.zcard('team_topics:arsenal') == 1
+    assert redis_client.zcard('team_topics:chelsea') == 2
+
+
+class SlowChain:
+    """Stands in for an LLM chain that takes a while for one team."""
+
+    async def ainvoke(self, inputs):
+        if 'chelsea' in inputs['comment']:
+            await asyncio.sleep(10)
+        return 'summary'
+
+
+class FakeContext:
+    """Stands in for the Lambda context."""
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def test_summarize_teams_stops_before_deadline():
+    """
+    Tests that teams still waiting on the LLM at the deadline are cancelled, and that the
+    summaries already completed are kept.
+    """
+    redis_client = fakeredis.FakeRedis()
+    policy = SummaryPolicy(min_new_comments=1)
+    now = int(time.time())
+    add_comments(redis_client, 'arsenal', now - 600, 2)
+    add_comments(redis_client, 'chelsea', now - 600, 2)
+
+    started = time.monotonic()
+    result = summarize_teams(redis_client, SlowChain(), policy,
+                             deadline=Deadline(FakeContext(1500), margin_seconds=1))
+
+    assert time.monotonic() - started < 5
+    assert result['summarized'] == 1 and result['cancelled'] == 1
+    assert 'chelsea' not in result['latency_ms']
+    assert redis_client.zcard('team_topics:arsenal') == 1
+    assert not redis_client.exists('summary_state:chelsea')
+
+
+def test_summary_finished_after_deadline_is_not_stored():
+    """
+    Tests that a summary finished after the deadline is dropped, so that the summary, version
+    and state are written together or not at all.
+    """
+    redis_client = fakeredis.FakeRedis()
+    add_comments(redis_client, 'arsenal', int(time.time()) - 600, 2)
+    dispatcher = LLMDispatcher(deadline=Deadline(FakeContext(500), margin_seconds=1))
+
+    outcome, _ = asyncio.run(process_team_comments(
+        'arsenal', datetime.now(timezone.utc), redis_client, CountingChain(),
+        SummaryPolicy(min_new_comments=1), dispatcher))
+
+    assert outcome == 'cancelled'
+    assert not redis_client.exists('team_topics:arsenal')
+    assert not redis_client.exists('team_version:arsenal')
+    assert not redis_client.exists('summary_state:arsenal')
+
+
+def test_team_without_comments_to_summarize_is_skipped():
+    """
+    Tests that a team whose new comments are all dropped while selecting them, here for having
+    no body, is skipped without an LLM call and keeps its summary.
+    """
+    redis_client = fakeredis.FakeRedis()
+    now = int(time.time())
+    for i in range(3):
+        redis_client.zadd('team:arsenal', {f'a{i}:p': now - 600 + i})
+        redis_client.hset('team_comments:arsenal', f'a{i}', json.dumps({'id': f'a{i}',
+                                                                        'body': ' '}))
+    chain = CountingChain()
+
+    outcome, stats = asyncio.run(process_team_comments(
+        'arsenal', datetime.now(timezone.utc), redis_client, chain,
+        SummaryPolicy(min_new_comments=1), LLMDispatcher()))
+
+    assert outcome == 'skipped' and stats['kept'] == 0
+    assert not chain.calls
+    assert not redis_client.exists('team_topics:arsenal')
+
+
+def test_comment_cached_behind_the_watermark_is_summarized():
+    """
+    Tests that a comment cached after a summary, but posted before the newest comment it
+    covered, is summarized next time, and that the comments already covered aren't sent again.
+    """
+    redis_client = fakeredis.FakeRedis()
+    chain = CountingChain()
+    policy = SummaryPolicy(min_new_comments=1)
+    now = int(time.time())
+    add_comments(redis_client, 'arsenal', now - 600, 3)
+
+    asyncio.run(process_team_comments('arsenal', datetime.now(timezone.utc), redis_client,
+                                      chain, policy, LLMDispatcher()))
+    add_comments(redis_client, 'arsenal', now - 610, 1)
+    outcome, stats = asyncio.run(process_team_comments(
+        'arsenal', datetime.now(timezone.utc), redis_client, chain, policy, LLMDispatcher()))
+
+    assert outcome == 'summarized' and stats['kept'] == 1
+    assert chain.calls[-1] == f'arsenal-{now - 610}-0'
+    outcome, _ = asyncio.run(process_team_comments(
+        'arsenal', datetime.now(timezone.utc), redis_client, chain, policy, LLMDispatcher()))
+    assert outcome == 'skipped' and len(chain.calls) == 2
+
+
+def test_parse_topics():
+    """
+    Tests that summaries are parsed into ranked topics.
+    """
+    summary = ('1. **Transfers** - Talk of a January move.\n'
+               '2. **Injuries** - Worries about the\nback line.')
+
+    assert parse_topics(summary) == [
+        {'rank': 1, 'title': 'Transfers', 'description': 'Talk of a January move.'},
+        {'rank': 2, 'title': 'Injuries', 'description': 'Worries about the\nback line.'},
+    ]
@@ -0,0 +1,109 @@
+import threading
+from data.view_refresher import ViewRefresher
+
+
+class Clock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_views_are_served_from_memory_and_refreshed_while_active():
+    """
+    Tests that a view is computed once on request, recomputed by a refresh while it's being
+    requested, and no longer kept once nobody asks for it.
+    """
+    clock = Clock()
+    refresher = ViewRefresher(interval=10, active_seconds=60, timer=clock)
+    refresher.start = lambda: None
+    calls = []
+
+    def loader():
+        calls.append(clock.now)
+        return len(calls)
+
+    assert refresher.get('view', loader) == 1
+    assert refresher.get('view', loader) == 1
+    refresher.refresh()
+    assert refresher.get('view', loader) == 2
+
+    clock.now = 100
+    refresher.refresh()
+    assert refresher.stats()['views'] == 0
+    assert calls == [0, 0]
+
+
+def test_refresh_keeps_the_last_value_on_error():
+    """
+    Tests that a view whose refresh fails keeps serving its last value.
+    """
+    refresher = ViewRefresher(interval=10)
+    refresher.start = lambda: None
+    values = iter([1])
+
+    assert refresher.get('view', lambda: next(values)) == 1
+    refresher.refresh()
+
+    assert refresher.get('view', lambda: 3) == 1
+    assert refresher.stats()['errors'] == 1
+
+
+def test_refresh_skips_views_that_are_current():
+    """
+    Tests that a refresh keeps a view that is still current without recomputing it.
+    """
+    refresher = ViewRefresher(interval=10)
+    refresher.start = lambda: None
+    version = {'arsenal': 1}
+    calls = []
+
+    def loader():
+        calls.append(version['arsenal'])
+        return {'version': version['arsenal']}
+
+    refresher.get('view', loader, lambda view: view['version'] == version['arsenal'])
+    refresher.refresh()
+    assert calls == [1] and refresher.stats()['skipped'] == 1
+
+    version['arsenal'] = 2
+    refresher.refresh()
+    assert calls == [1, 2]
+    assert refresher.get('view', loader) == {'version': 2}
+
+
+def test_concurrent_refreshes_of_a_view_run_one_after_the_other():
+    """
+    Tests that a refresh started while another is computing the same view waits for it, so that
+    the older computation can't overwrite the newer one.
+    """
+    refresher = ViewRefresher(interval=10)
+    refresher.start = lambda: None
+    version = [0]
+    first_started, release = threading.Event(), threading.Event()
+
+    def loader():
+        computed = version[0]
+        if computed == 1:
+            first_started.set()
+            release.wait(1)
+        return computed
+
+    refresher.get('view', loader, lambda value: value == version[0])
+    version[0] = 1
+    thread = threading.Thread(target=refresher.refresh)
+    thread.start()
+    first_started.wait(1)
+    version[0] = 2
+    second = threading.Thread(target=refresher.refresh)
+    second.start()
+    # Without the view's lock, the second refresh would store its value in this time.
+    second.join(0.1)
+    release.set()
+    thread.join()
+    second.join()
+
+    assert refresher.get('view', loader) == 2